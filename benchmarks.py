@@ -0,0 +1,1207 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import resource
+import os
+import pickle
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+import database_functions
+from burnout_model_functions import (calculate_age, daily_score, job_stress_levels, predict_burnout_risk,
+                                     predict_burnout_risk_batch, profile_score)
+from burnout_predictions_functions import (HISTORY_WINDOWS, MAX_HISTORY_POINTS, get_burnout_history, get_burnout_series,
+                                           save_burnout_percentage)
+from dashboard_functions import history_figure
+from database_functions import migrate_database, unit_of_work
+import fitbit_functions
+import fitbit_store_functions
+import journal_analysis
+from fake_api_servers import FakeCalendarServer, FakeFitbitServer
+from fitbit_store_functions import IntradayStore, MISSING
+from journal_functions import (JOURNAL_PAGE_SIZE, SEARCH_ORDERS, delete_journal_entry, get_journal_content,
+                               list_journal_entries, save_journal_entry, search_journal_entries)
+from survey_functions import load_recent_survey_data
+from to_do_functions import get_todo_list
+
+# -------------------- Helpers --------------------
+
+def time_calls(fn, repeat=200, warmup=10):
+    """Runs fn repeatedly and returns the wall-clock duration of each call in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def report(name, samples):
+    """Prints mean, median and p95 latency for a list of millisecond samples."""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{name:<50} mean {statistics.mean(samples):8.3f} ms   "
+          f"median {statistics.median(samples):8.3f} ms   p95 {p95:8.3f} ms")
+
+def _migrate(path, target_version=None):
+    """Runs the schema migrations against the database at path."""
+    previous_path = database_functions.DB_PATH
+    database_functions.set_database_path(path)
+    try:
+        migrate_database(target_version)
+    finally:
+        database_functions.set_database_path(previous_path)
+
+def seed_database(path, num_users=1000, days=30, renders_per_day=5, todos_per_user=5, journals_per_user=5,
+                  schema_version=None):
+    """Creates a database at path and fills it with synthetic users and their history.
+
+    Rows are written in the original (version 1) layout, the way the app used to
+    write them, and then migrated up to schema_version (default: latest).
+    """
+    _migrate(path, 1)
+
+    rng = random.Random(42)
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    now = datetime.now()
+    cursor.executemany('INSERT INTO users (id, email, password) VALUES (?, ?, ?)',
+                       ((i, f'user{i}@example.com', 'x') for i in range(1, num_users + 1)))
+    cursor.executemany('''
+        INSERT INTO user_profile (user_id, dob, gender, family_size, num_pets, city, education, remote_percentage, job, name)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', ((i, f'{rng.randint(1960, 2004)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}', rng.choice(['Male', 'Female']),
+           rng.randint(0, 5), rng.randint(0, 3), rng.choice(['Small', 'Big']), rng.randint(1, 4),
+           rng.random(), 'Engineer', f'User {i}') for i in range(1, num_users + 1)))
+    cursor.executemany('''
+        INSERT INTO daily_stress_submissions (user_id, last_submission, mood, stress_level, work_hours, weekend_overtime, exercise_hours, sleep_hours)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', ((i, now.strftime('%Y-%m-%d %H:%M:%S.%f'), 'Happy', rng.randint(1, 10), 8.0, 0.0, 1.0, 7.0)
+          for i in range(1, num_users + 1)))
+    cursor.executemany('INSERT INTO burnout_history (user_id, date, risk_percentage) VALUES (?, ?, ?)',
+                       ((i, (now - timedelta(days=d, minutes=r)).strftime('%Y-%m-%d %H:%M:%S'), rng.uniform(0, 100))
+                        for i in range(1, num_users + 1) for d in range(days) for r in range(renders_per_day)))
+    cursor.executemany('INSERT INTO todo_list (user_id, task, completed) VALUES (?, ?, ?)',
+                       ((i, f'Task {t}', False) for i in range(1, num_users + 1) for t in range(todos_per_user)))
+    cursor.executemany('INSERT INTO journal_entries (user_id, title, date, content) VALUES (?, ?, ?, ?)',
+                       ((i, f'Entry {j}', (now - timedelta(days=j)).strftime('%Y-%m-%d'), 'Today I felt calm and focused. ' * 10)
+                        for i in range(1, num_users + 1) for j in range(journals_per_user)))
+    conn.commit()
+    conn.close()
+    _migrate(path, schema_version)
+
+# -------------------- Main Page Data Access --------------------
+
+def _legacy_main_page_render(path, user_id):
+    """Replays the queries of a main_page rerun the way they ran before the pooled access layer."""
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT mood, stress_level, work_hours, weekend_overtime, exercise_hours, sleep_hours
+        FROM daily_stress_submissions WHERE user_id = ? ORDER BY last_submission DESC LIMIT 1
+    ''', (user_id,))
+    cursor.fetchone()
+    conn.close()
+
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM user_profile WHERE user_id = ?', (user_id,))
+    cursor.fetchone()
+    conn.close()
+
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO burnout_history (user_id, date, risk_percentage) VALUES (?, DATETIME('now'), ?)", (user_id, 42.0))
+    conn.commit()
+    conn.close()
+
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT DATE(date) AS day, AVG(risk_percentage) AS avg_risk FROM burnout_history
+        WHERE user_id = ? GROUP BY day ORDER BY day DESC LIMIT 30
+    ''', (user_id,))
+    cursor.fetchall()
+    conn.close()
+
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute('SELECT id, task, completed FROM todo_list WHERE user_id = ?', (user_id,))
+    cursor.fetchall()
+    conn.close()
+
+def _pooled_main_page_render(user_id):
+    """Runs the data-access part of a main_page rerun through the shared unit of work."""
+    with unit_of_work() as conn:
+        load_recent_survey_data(user_id)
+        conn.execute('SELECT * FROM user_profile WHERE user_id = ?', (user_id,)).fetchone()
+        save_burnout_percentage(user_id, 42.0)
+        get_burnout_history(user_id)
+        get_todo_list(user_id)
+
+def benchmark_main_page(num_users=1000, repeat=200):
+    """Compares per-call connections with the pooled unit of work for one main_page rerun."""
+    workdir = tempfile.mkdtemp(prefix='exhale_bench_')
+    previous_path = database_functions.DB_PATH
+    try:
+        legacy_path = os.path.join(workdir, 'legacy.db')
+        pooled_path = os.path.join(workdir, 'pooled.db')
+        seed_database(legacy_path, num_users=num_users, schema_version=1)
+        conn = sqlite3.connect(legacy_path)
+        conn.execute('PRAGMA journal_mode=DELETE')  # the pre-pool default
+        conn.close()
+        shutil.copy(legacy_path, pooled_path)
+        _migrate(pooled_path)
+
+        rng = random.Random(7)
+        report('main_page data access (per-call connect)',
+               time_calls(lambda: _legacy_main_page_render(legacy_path, rng.randint(1, num_users)), repeat))
+
+        database_functions.set_database_path(pooled_path)
+        report('main_page data access (pooled unit of work)',
+               time_calls(lambda: _pooled_main_page_render(rng.randint(1, num_users)), repeat))
+    finally:
+        database_functions.set_database_path(previous_path)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# -------------------- Per-User Query Scaling --------------------
+
+PER_USER_INDEXES = ['idx_burnout_history_user_day', 'idx_todo_list_user', 'idx_journal_entries_listing']
+
+def _list_journal_entries(user_id):
+    """Runs the Journal tab listing query (its newest page)."""
+    return list_journal_entries(user_id)
+
+def benchmark_per_user_queries(user_counts=(1000, 10000, 100000), repeat=200):
+    """Shows per-user query latency as the user base grows, with and without the secondary indexes."""
+    queries = {
+        'get_burnout_history': get_burnout_history,
+        'get_todo_list': get_todo_list,
+        'journal listing': _list_journal_entries,
+    }
+    previous_path = database_functions.DB_PATH
+    for num_users in user_counts:
+        workdir = tempfile.mkdtemp(prefix='exhale_bench_')
+        try:
+            path = os.path.join(workdir, 'users.db')
+            seed_database(path, num_users=num_users, days=14, renders_per_day=1)
+            database_functions.set_database_path(path)
+            rng = random.Random(11)
+            for name, query in queries.items():
+                report(f'{num_users:>7} users  {name} (indexed)',
+                       time_calls(lambda: query(rng.randint(1, num_users)), repeat))
+            with unit_of_work() as conn:
+                for index in PER_USER_INDEXES:
+                    conn.execute(f'DROP INDEX {index}')
+            for name, query in queries.items():
+                report(f'{num_users:>7} users  {name} (no index)',
+                       time_calls(lambda: query(rng.randint(1, num_users)), min(repeat, 20), warmup=2))
+        finally:
+            database_functions.set_database_path(previous_path)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+# -------------------- Batch Scoring --------------------
+
+def synthetic_population(num_rows, seed=0):
+    """Returns a DataFrame of random model inputs shaped like the app's profiles and surveys."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'age': rng.integers(18, 70, num_rows),
+        'gender': rng.choice(['Male', 'Female'], num_rows),
+        'work_hours': rng.uniform(0, 16, num_rows),
+        'sleep_hours': rng.uniform(0, 12, num_rows),
+        'weekend_overtime': rng.uniform(0, 16, num_rows),
+        'stress_level': rng.integers(1, 11, num_rows),
+        'job_avg_stress': rng.choice(list(job_stress_levels.values()), num_rows),
+        'education': rng.integers(1, 5, num_rows),
+        'city': rng.choice(['Small', 'Big'], num_rows),
+        'family_size': rng.integers(0, 6, num_rows),
+        'num_pets': rng.integers(0, 4, num_rows),
+        'exercise_hours': rng.uniform(0, 5, num_rows),
+        'remote_percentage': rng.uniform(0, 1, num_rows),
+    })
+
+def _score_rows(population):
+    """Scores a population one row at a time with the scalar model."""
+    columns = [population[name].tolist() for name in population.columns]
+    return [predict_burnout_risk(*row) for row in zip(*columns)]
+
+def benchmark_batch_scoring(num_rows=1_000_000, scalar_rows=100_000):
+    """Compares scalar and vectorized scoring throughput and checks that both agree exactly."""
+    population = synthetic_population(num_rows)
+
+    start = time.perf_counter()
+    scalar = _score_rows(population.head(scalar_rows))
+    scalar_seconds = time.perf_counter() - start
+    print(f"scalar predict_burnout_risk: {scalar_rows:,} rows in {scalar_seconds:.2f} s "
+          f"({scalar_rows / scalar_seconds:,.0f} rows/s)")
+
+    start = time.perf_counter()
+    risk, score = predict_burnout_risk_batch(population)
+    batch_seconds = time.perf_counter() - start
+    print(f"predict_burnout_risk_batch: {num_rows:,} rows in {batch_seconds:.3f} s "
+          f"({num_rows / batch_seconds:,.0f} rows/s)")
+
+    assert np.array_equal(risk[:scalar_rows], [row[0] for row in scalar]), "batch risk differs from scalar risk"
+    assert np.array_equal(score[:scalar_rows], [row[1] for row in scalar]), "batch score differs from scalar score"
+    print("batch output identical to scalar output")
+
+# -------------------- Model Registry --------------------
+
+def benchmark_model_registry(num_rows=1_000_000, train_rows=50_000, repeat=2_000):
+    """Compares load time, size, single-row latency, throughput and peak memory of each model version."""
+    import tracemalloc
+    import model_registry_functions as registry
+
+    population = synthetic_population(num_rows, seed=4)
+    rng = np.random.default_rng(4)
+    population['daily_steps'] = np.where(rng.random(num_rows) < 0.3, np.nan, rng.gamma(4.0, 2000.0, num_rows))
+    # Labels: the rule's verdict with some noise, so the trained models have something to learn
+    risk = predict_burnout_risk_batch(population)[0] + rng.normal(0, 10, num_rows)
+    labels = (risk > 50).astype(int)
+
+    workdir = tempfile.mkdtemp(prefix='exhale_bench_')
+    try:
+        train = registry.feature_matrix(population.head(train_rows))
+        names = ['linear_rule']
+        for model_type, params in ((registry.LogisticRegressionModel, {}),
+                                   (registry.GradientBoostingModel, {'n_estimators': 100, 'max_depth': 3})):
+            start = time.perf_counter()
+            model = model_type.fit(train, labels[:train_rows], **params)
+            names.append(registry.save_model(model, workdir))
+            print(f"fit {model.name}: {time.perf_counter() - start:.2f} s on {train_rows:,} rows")
+
+        one_row = population.iloc[0].to_dict()
+        for name in names:
+            registry.clear_model_cache()
+            start = time.perf_counter()
+            model = registry.load_model(name, workdir)
+            load_ms = (time.perf_counter() - start) * 1000
+            path = os.path.join(workdir, model.kind, f'{model.version}.npz')
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            predicted = model.predict_batch(population)
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            accuracy = ((predicted > 50) == labels).mean()
+            print(f"{name:<24} load {load_ms:7.2f} ms   artifact {size / 1024:7.1f} KB   arrays {model.nbytes / 1024:7.1f} KB   "
+                  f"batch {num_rows / seconds:>12,.0f} rows/s   peak {peak / 2**20:6.1f} MB   accuracy {accuracy:.3f}")
+            report(f'{name} predict_one', time_calls(lambda: model.predict_one(**one_row), repeat))
+    finally:
+        registry.clear_model_cache()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# -------------------- Model Training --------------------
+
+def seed_training_history(path, num_users, days, fitbit_share=0.5):
+    """Adds days of survey history per user, and Fitbit features for a share of them, to a seeded database."""
+    rng = np.random.default_rng(17)
+    first_day = datetime.now().date() - timedelta(days=days)
+    conn = sqlite3.connect(path)
+    conn.execute('DELETE FROM survey_submissions')
+    for start in range(1, num_users + 1, 1_000):
+        users = np.arange(start, min(start + 1_000, num_users + 1))
+        # A slowly drifting workload per user drives hours, sleep and stress, so today's
+        # answers carry a signal about tomorrow's stress for the models to find
+        load = np.zeros((len(users), days))
+        load[:, 0] = rng.normal(0, 1, len(users))
+        for day in range(1, days):
+            load[:, day] = 0.8 * load[:, day - 1] + rng.normal(0, 0.6, len(users))
+        load = load.ravel()
+        user_ids = np.repeat(users, days)
+        day_offsets = np.tile(np.arange(days), len(users))
+        work_hours = np.round((8.5 + 1.2 * load + rng.normal(0, 1, len(load))).clip(0, 16), 1)
+        sleep_hours = np.round((7 - 0.5 * load + rng.normal(0, 0.8, len(load))).clip(3, 11), 1)
+        stress = np.clip(np.round(5 + 1.8 * load + rng.normal(0, 1.5, len(load))), 1, 10)
+        stamps = [f'{first_day + timedelta(days=int(d))} 20:00:00.000000' for d in day_offsets]
+        conn.executemany('''
+            INSERT INTO survey_submissions (user_id, submitted_at, mood, stress_level, work_hours,
+                                            weekend_overtime, exercise_hours, sleep_hours)
+            VALUES (?, ?, 'Happy', ?, ?, 0.0, 1.0, ?)
+        ''', zip(user_ids.tolist(), stamps, stress.astype(int).tolist(), work_hours.tolist(), sleep_hours.tolist()))
+        fitbit = rng.random(len(user_ids)) < fitbit_share
+        conn.executemany('INSERT INTO fitbit_daily_features (user_id, day, steps) VALUES (?, ?, ?)',
+                         zip(user_ids[fitbit].tolist(), [stamps[i][:10] for i in np.flatnonzero(fitbit)],
+                             rng.gamma(4.0, 2000.0, int(fitbit.sum())).astype(int).tolist()))
+    conn.commit()
+    conn.close()
+
+def _load_training_data_at(path):
+    """Builds the training matrix from the database at path (run in a fresh process by _measure)."""
+    import train_model
+
+    database_functions.set_database_path(path)
+    return train_model.load_training_data()[1]
+
+def benchmark_model_training(sizes=((1_000, 100), (5_000, 200), (10_000, 300)), train_size=(1_000, 100)):
+    """Measures chunked training-matrix loading as history grows, then a full cross-validated training run."""
+    import model_registry_functions
+    import train_model
+
+    for num_users, days in sizes:
+        workdir = tempfile.mkdtemp(prefix='exhale_bench_')
+        try:
+            path = os.path.join(workdir, 'training.db')
+            seed_database(path, num_users=num_users, days=1, renders_per_day=1, todos_per_user=0, journals_per_user=0)
+            seed_training_history(path, num_users, days)
+            rows, seconds, peak = _measure(_load_training_data_at, path)
+            print(f"{num_users:>6} users x {days} days: {rows:,} training rows in {seconds:.2f} s "
+                  f"({rows / seconds:,.0f} rows/s), peak RSS {peak:,.0f} MB")
+
+            if (num_users, days) == train_size:
+                previous = (database_functions.DB_PATH, model_registry_functions.MODEL_DIR)
+                database_functions.set_database_path(path)
+                model_registry_functions.MODEL_DIR = os.path.join(workdir, 'models')
+                try:
+                    for workers in sorted({1, os.cpu_count() or 1}):
+                        start = time.perf_counter()
+                        train_model.train_models(workers=workers)
+                        print(f"train_models with {workers} CV workers: {time.perf_counter() - start:.2f} s")
+                finally:
+                    database_functions.set_database_path(previous[0])
+                    model_registry_functions.MODEL_DIR = previous[1]
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+# -------------------- Profile Score --------------------
+
+def benchmark_profile_score(repeat=20_000, num_users=100_000):
+    """Compares the per-render scoring work before and after storing the profile score."""
+    from user_profile_functions import refresh_profile_scores
+
+    profile = {'dob': '1988-06-15', 'gender': 'Female', 'family_size': 3, 'num_pets': 1, 'city': 'Big',
+               'education': 3, 'remote_percentage': 0.4, 'job': 'Nurse'}
+    survey = (9.5, 6.0, 2.0, 7, 0.5, 8200)
+
+    def full_rescore():
+        age = calculate_age(datetime.strptime(profile['dob'], '%Y-%m-%d').date())
+        predict_burnout_risk(age, profile['gender'], *survey[:4], job_stress_levels.get(profile['job'], 5),
+                             profile['education'], profile['city'], profile['family_size'], profile['num_pets'],
+                             survey[4], profile['remote_percentage'], survey[5])
+
+    stored = profile_score(calculate_age(date(1988, 6, 15)), profile['gender'], job_stress_levels[profile['job']],
+                           profile['education'], profile['city'], profile['family_size'], profile['num_pets'],
+                           profile['remote_percentage'])
+    report('per render: parse dob, age and full model', time_calls(full_rescore, repeat))
+    report('per render: stored profile score + daily terms', time_calls(lambda: daily_score(stored, *survey), repeat))
+
+    workdir = tempfile.mkdtemp(prefix='exhale_bench_')
+    previous_path = database_functions.DB_PATH
+    try:
+        path = os.path.join(workdir, 'profiles.db')
+        seed_database(path, num_users=num_users, days=1, renders_per_day=1, todos_per_user=0, journals_per_user=0)
+        database_functions.set_database_path(path)
+        for label, today in (('all users (first run)', date.today()),
+                             ('birthdays only (next day)', date.today() + timedelta(days=1))):
+            start = time.perf_counter()
+            refreshed = refresh_profile_scores(today)
+            print(f"refresh_profile_scores, {label}: {refreshed:,} scores in {time.perf_counter() - start:.3f} s")
+    finally:
+        database_functions.set_database_path(previous_path)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# -------------------- Nightly Rescoring --------------------
+
+def benchmark_nightly_rescoring(num_users=100_000, worker_counts=(1, os.cpu_count() or 1)):
+    """Runs the nightly rescoring job over a seeded database with different worker counts."""
+    from nightly_rescoring import run_rescoring
+
+    workdir = tempfile.mkdtemp(prefix='exhale_bench_')
+    previous_path = database_functions.DB_PATH
+    try:
+        path = os.path.join(workdir, 'nightly.db')
+        seed_database(path, num_users=num_users, days=1, renders_per_day=1, todos_per_user=0, journals_per_user=0)
+        database_functions.set_database_path(path)
+        for workers in dict.fromkeys(worker_counts):
+            run_rescoring(chunk_size=10_000, workers=workers, restart=True)
+    finally:
+        database_functions.set_database_path(previous_path)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# -------------------- Google Calendar --------------------
+
+def synthetic_calendar_events(count, start=None, spacing_hours=7):
+    """Returns Calendar API event bodies starting spacing_hours apart from now on."""
+    start = start or datetime.utcnow()
+    events = []
+    for i in range(count):
+        begin = start + timedelta(hours=spacing_hours * i + 1)
+        events.append({
+            'summary': f'Event {i}',
+            'start': {'dateTime': begin.isoformat() + 'Z'},
+            'end': {'dateTime': (begin + timedelta(minutes=45)).isoformat() + 'Z'},
+        })
+    return events
+
+def _write_stub_token(path):
+    """Stores never-expiring stub credentials where get_calendar_service expects token.pickle."""
+    from google.oauth2.credentials import Credentials
+
+    with open(path, 'wb') as token:
+        pickle.dump(Credentials(token='stub-token'), token)
+
+def _weekly_window():
+    """Returns the timeMin/timeMax arguments of a 7-day events listing."""
+    now = datetime.utcnow()
+    return {'timeMin': now.isoformat() + 'Z', 'timeMax': (now + timedelta(days=7)).isoformat() + 'Z'}
+
+def benchmark_calendar_service(repeat=50, latency=0.005):
+    """Measures Calendar service construction and a weekly events listing against a local stub."""
+    import google_API_functions as calendar
+
+    workdir = tempfile.mkdtemp(prefix='exhale_bench_')
+    previous = (calendar.CALENDAR_API_ENDPOINT, calendar.TOKEN_PATH)
+    try:
+        calendar.TOKEN_PATH = os.path.join(workdir, 'token.pickle')
+        _write_stub_token(calendar.TOKEN_PATH)
+        with FakeCalendarServer(synthetic_calendar_events(20), latency=latency) as server:
+            calendar.CALENDAR_API_ENDPOINT = server.url
+
+            def rebuilt_service():
+                calendar.clear_calendar_service_cache()
+                return calendar.get_calendar_service(1)
+
+            def weekly_listing():
+                return calendar._list_events(calendar.get_calendar_service(1), **_weekly_window())
+
+            def rebuilt_listing():
+                calendar.clear_calendar_service_cache()
+                return weekly_listing()
+
+            report('get_calendar_service (rebuilt every call)', time_calls(rebuilt_service, repeat, warmup=2))
+            report('get_calendar_service (cached)', time_calls(lambda: calendar.get_calendar_service(1), repeat))
+            report('weekly events listing (rebuilt service)', time_calls(rebuilt_listing, repeat, warmup=2))
+            report('weekly events listing (cached service)', time_calls(weekly_listing, repeat, warmup=2))
+    finally:
+        calendar.CALENDAR_API_ENDPOINT, calendar.TOKEN_PATH = previous
+        calendar.clear_calendar_service_cache()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def benchmark_calendar_events(num_events=500, repeat=50, latency=0.005):
+    """Compares listing events from the API on every rerun with the SQLite events cache and its syncs."""
+    import google_API_functions as calendar
+
+    workdir = tempfile.mkdtemp(prefix='exhale_bench_')
+    previous = (calendar.CALENDAR_API_ENDPOINT, calendar.TOKEN_PATH, database_functions.DB_PATH)
+    try:
+        _migrate(os.path.join(workdir, 'calendar.db'))
+        database_functions.set_database_path(os.path.join(workdir, 'calendar.db'))
+        calendar.TOKEN_PATH = os.path.join(workdir, 'token.pickle')
+        _write_stub_token(calendar.TOKEN_PATH)
+        # Spread the events over the 28-day window a full sync loads
+        events = synthetic_calendar_events(num_events, spacing_hours=27 * 24 / num_events)
+        with FakeCalendarServer(events, latency=latency) as server:
+            calendar.CALENDAR_API_ENDPOINT = server.url
+            service = calendar.get_calendar_service(1)
+            event_ids = list(server.events)
+            rng = random.Random(3)
+
+            def edit_and_sync():
+                server.update_event(rng.choice(event_ids), summary='Edited elsewhere')
+                calendar.sync_calendar_events(1)
+
+            report(f'{num_events} events  API listing every rerun',
+                   time_calls(lambda: calendar._list_events(service, **_weekly_window()), repeat, warmup=2))
+            report(f'{num_events} events  full sync into SQLite',
+                   time_calls(lambda: calendar.sync_calendar_events(1, full=True), repeat, warmup=2))
+            report(f'{num_events} events  incremental sync, 1 change',
+                   time_calls(edit_and_sync, repeat, warmup=2))
+            requests_before = server.request_count
+            report(f'{num_events} events  cached rerun (within TTL)',
+                   time_calls(lambda: calendar.get_weekly_calendar_events(1), repeat))
+            print(f"API requests during cached reruns: {server.request_count - requests_before}")
+    finally:
+        calendar.CALENDAR_API_ENDPOINT, calendar.TOKEN_PATH = previous[:2]
+        database_functions.set_database_path(previous[2])
+        calendar.clear_calendar_service_cache()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# -------------------- Intraday Heart Rate Store --------------------
+
+def synthetic_heart_rate_day(rng, coverage=0.95):
+    """Returns one day of 1-minute heart rate in the API's intraday dataset shape."""
+    minutes = np.flatnonzero(rng.random(24 * 60) < coverage)
+    values = np.clip(rng.normal(72, 12, len(minutes)), 40, 190).round().astype(int)
+    return [{'time': f'{minute // 60:02d}:{minute % 60:02d}:00', 'value': int(value)}
+            for minute, value in zip(minutes, values)]
+
+def benchmark_intraday_store(num_users=100, days=90, repeat=200):
+    """Measures ingest, disk footprint and 4-week range reads of the intraday heart rate store."""
+    workdir = tempfile.mkdtemp(prefix='exhale_bench_')
+    try:
+        store = IntradayStore(workdir)
+        rng = np.random.default_rng(5)
+        sample_days = [synthetic_heart_rate_day(rng) for _ in range(10)]
+        first_day = datetime(2024, 1, 1).date()
+
+        start = time.perf_counter()
+        for user_id in range(1, num_users + 1):
+            store.append_days(user_id, {first_day + timedelta(days=d): sample_days[d % len(sample_days)]
+                                        for d in range(days)})
+        seconds = time.perf_counter() - start
+        print(f"ingest: {num_users * days:,} user-days in {seconds:.2f} s ({num_users * days / seconds:,.0f} days/s)")
+
+        stored = sum(os.path.getsize(os.path.join(root, name))
+                     for root, _, names in os.walk(workdir) for name in names)
+        api_bytes = len(json.dumps({'dataset': sample_days[0]}))
+        print(f"disk per user-day: {stored / (num_users * days):,.0f} bytes (API payload ~{api_bytes:,} bytes)")
+
+        query_rng = random.Random(9)
+
+        def four_weeks():
+            begin = first_day + timedelta(days=query_rng.randint(0, days - 28))
+            return query_rng.randint(1, num_users), begin, begin + timedelta(days=27)
+
+        def resting_rate():
+            days_read, values = store.read_blocks(*four_weeks())
+            readings = np.where(values == MISSING, np.iinfo(np.int16).max, values)
+            return np.percentile(readings, 5, axis=1)  # a cheap resting heart rate per day
+
+        report('28-day read_blocks', time_calls(lambda: store.read_blocks(*four_weeks()), repeat))
+        report('28-day read_series (DataFrame)', time_calls(lambda: store.read_series(*four_weeks()), repeat))
+        report('28-day daily resting rate from the store', time_calls(resting_rate, repeat))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# -------------------- Fitbit Sync --------------------
+
+def connect_fitbit_users(server, num_users):
+    """Creates num_users users in the current database, each connected to the fake Fitbit server."""
+    with unit_of_work() as conn:
+        conn.executemany('INSERT INTO users (id, email, password) VALUES (?, ?, ?)',
+                         ((i, f'user{i}@example.com', 'x') for i in range(1, num_users + 1)))
+    for user_id in range(1, num_users + 1):
+        token = server.add_user(user_id)
+        fitbit_functions.save_fitbit_tokens(f'user{user_id}@example.com', token['access_token'],
+                                            token['refresh_token'], token['expires_in'])
+
+def benchmark_fitbit_sync(num_users=30, worker_counts=(1, 8, 32), latency=0.01, error_rate=0.01):
+    """Runs initial Fitbit syncs with different worker counts, then an incremental one, against the fake server."""
+    from fitbit_sync import reset_rate_limiters, run_fitbit_sync
+
+    # The stub speaks plain HTTP on localhost
+    os.environ.setdefault('OAUTHLIB_INSECURE_TRANSPORT', '1')
+    previous = (database_functions.DB_PATH, fitbit_store_functions.FITBIT_STORE_PATH, fitbit_functions.FITBIT_API_ENDPOINT)
+    try:
+        for workers in worker_counts:
+            workdir = tempfile.mkdtemp(prefix='exhale_bench_')
+            try:
+                _migrate(os.path.join(workdir, 'fitbit.db'))
+                database_functions.set_database_path(os.path.join(workdir, 'fitbit.db'))
+                fitbit_store_functions.set_store_path(os.path.join(workdir, 'store'))
+                with FakeFitbitServer(error_rate=error_rate, latency=latency) as server:
+                    # Fresh users on a fresh server: drop clients and quotas from the previous round
+                    fitbit_functions.clear_client_registries()
+                    reset_rate_limiters()
+                    fitbit_functions.FITBIT_API_ENDPOINT = server.url
+                    connect_fitbit_users(server, num_users)
+                    print(f"initial sync, {workers} workers:")
+                    run_fitbit_sync('bench-client', 'bench-secret', workers=workers)
+                    if workers == worker_counts[-1]:
+                        print(f"incremental sync, {workers} workers:")
+                        run_fitbit_sync('bench-client', 'bench-secret', workers=workers)
+            finally:
+                database_functions.set_database_path(previous[0])
+                shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        fitbit_store_functions.set_store_path(previous[1])
+        fitbit_functions.FITBIT_API_ENDPOINT = previous[2]
+        fitbit_functions.clear_client_registries()
+
+# -------------------- Fitbit Daily Features --------------------
+
+def benchmark_fitbit_features(num_users=200, days=60, repeat=500):
+    """Measures computing the daily feature table from stored Fitbit data and reading it at render time."""
+    from fitbit_features_functions import get_daily_features, refresh_daily_features
+
+    previous = (database_functions.DB_PATH, fitbit_store_functions.FITBIT_STORE_PATH)
+    workdir = tempfile.mkdtemp(prefix='exhale_bench_')
+    try:
+        _migrate(os.path.join(workdir, 'features.db'))
+        database_functions.set_database_path(os.path.join(workdir, 'features.db'))
+        fitbit_store_functions.set_store_path(os.path.join(workdir, 'store'))
+        store = fitbit_store_functions.get_intraday_store('heart')
+        rng = np.random.default_rng(13)
+        sample_days = [synthetic_heart_rate_day(rng) for _ in range(10)]
+        today = datetime.now().date()
+        calendar = [today - timedelta(days=days - d) for d in range(days)]
+        with unit_of_work() as conn:
+            conn.executemany('INSERT INTO users (id, email, password) VALUES (?, ?, ?)',
+                             ((i, f'user{i}@example.com', 'x') for i in range(1, num_users + 1)))
+            for user_id in range(1, num_users + 1):
+                store.append_days(user_id, {day: sample_days[d % len(sample_days)] for d, day in enumerate(calendar)})
+                conn.executemany('INSERT INTO fitbit_daily_summaries (user_id, resource, day, summary) VALUES (?, ?, ?, ?)', [
+                    row for day in calendar for row in (
+                        (user_id, 'heart', day.isoformat(), json.dumps({'restingHeartRate': int(rng.integers(55, 80))})),
+                        (user_id, 'sleep', day.isoformat(), json.dumps({'totalMinutesAsleep': int(rng.integers(240, 540))})),
+                        (user_id, 'activity', day.isoformat(), json.dumps({'steps': int(rng.gamma(4.0, 2000.0))})))])
+
+        start = time.perf_counter()
+        computed = sum(refresh_daily_features(user_id) for user_id in range(1, num_users + 1))
+        seconds = time.perf_counter() - start
+        print(f"compute: {computed:,} user-days in {seconds:.2f} s ({computed / seconds:,.0f} days/s)")
+
+        # A re-synced day is invalidated by the trigger and recomputed on its own
+        with unit_of_work() as conn:
+            conn.execute("INSERT OR REPLACE INTO fitbit_daily_summaries VALUES (1, 'activity', ?, ?)",
+                         (calendar[-1].isoformat(), json.dumps({'steps': 12345})))
+        start = time.perf_counter()
+        recomputed = refresh_daily_features(1)
+        print(f"incremental refresh: {recomputed} stale day in {(time.perf_counter() - start) * 1000:.2f} ms, "
+              f"steps now {get_daily_features(1)['steps']:,}")
+
+        query_rng = random.Random(3)
+        report("render-time read of yesterday's features",
+               time_calls(lambda: get_daily_features(query_rng.randint(1, num_users)), repeat))
+    finally:
+        database_functions.set_database_path(previous[0])
+        fitbit_store_functions.set_store_path(previous[1])
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# -------------------- Fitbit Export Ingest --------------------
+
+def write_synthetic_fitbit_export(directory, num_users, days, chunk_users=500):
+    """Writes dailyActivity/sleepDay/weightLogInfo CSVs shaped like a Fitbit export, a block of users at a time."""
+    from fitbit_data import EXPORT_FILES
+
+    rng = np.random.default_rng(21)
+    calendar = pd.Timestamp('2016-04-12') + pd.to_timedelta(np.arange(days), unit='D')
+    paths = {name: os.path.join(directory, spec['file']) for name, spec in EXPORT_FILES.items()}
+    for start in range(0, num_users, chunk_users):
+        ids = np.repeat(np.arange(start, min(start + chunk_users, num_users)) + 1_503_960_366, days)
+        dates = np.tile(calendar.strftime('%-m/%-d/%Y').to_numpy(), len(ids) // days)
+        n = len(ids)
+        activity = pd.DataFrame({'Id': ids, 'ActivityDate': dates,
+                                 'TotalSteps': rng.integers(0, 20_000, n), 'TotalDistance': rng.uniform(0, 15, n).round(2),
+                                 'SedentaryMinutes': rng.integers(300, 1_200, n), 'Calories': rng.integers(1_200, 4_000, n)})
+        asleep = rng.random(n) < 0.6
+        sleep = pd.DataFrame({'Id': ids[asleep], 'SleepDay': dates[asleep] + ' 12:00:00 AM',
+                              'TotalSleepRecords': 1, 'TotalMinutesAsleep': rng.integers(60, 700, asleep.sum()),
+                              'TotalTimeInBed': rng.integers(700, 900, asleep.sum())})
+        weighed = rng.random(n) < 0.1
+        weight = pd.DataFrame({'Id': ids[weighed], 'Date': dates[weighed] + ' 11:59:59 PM',
+                               'WeightKg': rng.uniform(50, 110, weighed.sum()).round(1), 'IsManualReport': 'True'})
+        for name, frame in (('activity', activity), ('sleep', sleep), ('weight', weight)):
+            frame.to_csv(paths[name], mode='a' if start else 'w', header=not start, index=False)
+    return sum(os.path.getsize(path) for path in paths.values())
+
+def _legacy_export_merge(directory):
+    """The original fitbit_data.main merge: full loads joined on the date alone."""
+    from fitbit_data import EXPORT_FILES
+
+    activity, sleep, weight = (pd.read_csv(os.path.join(directory, spec['file'])) for spec in EXPORT_FILES.values())
+    activity['ActivityDate'] = pd.to_datetime(activity['ActivityDate'])
+    sleep['SleepDay'] = pd.to_datetime(sleep['SleepDay'])
+    weight['Date'] = pd.to_datetime(weight['Date'])
+    df = pd.merge(activity, sleep, left_on='ActivityDate', right_on='SleepDay', how='left')
+    return pd.merge(df, weight, left_on='ActivityDate', right_on='Date', how='left')
+
+def _timed_call(fn, args):
+    """Runs fn(*args) and returns (rows, seconds, peak resident memory of this process in MB)."""
+    start = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - start
+    rows = len(result) if hasattr(result, '__len__') else result
+    return rows, seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _measure(fn, *args):
+    """Runs fn(*args) in a fresh process so its peak memory is not hidden by earlier work."""
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(_timed_call, (fn, args))
+
+def benchmark_fitbit_export_ingest(sizes=((50, 30), (1_000, 365), (5_000, 365)), legacy_max_users=50):
+    """Ingests synthetic Fitbit exports of growing size and compares with the original date-only merge."""
+    from fitbit_data import ingest_fitbit_export
+
+    for num_users, days in sizes:
+        workdir = tempfile.mkdtemp(prefix='exhale_bench_')
+        try:
+            size = write_synthetic_fitbit_export(workdir, num_users, days)
+            label = f'{num_users:>5} users x {days} days ({size / 1e6:,.0f} MB CSV)'
+            if num_users <= legacy_max_users:
+                rows, seconds, peak = _measure(_legacy_export_merge, workdir)
+                print(f"{label}  legacy merge on date: {rows:,} rows, {seconds:.2f} s, peak RSS {peak:,.0f} MB")
+            for output in ('features.db', 'features.parquet'):
+                path = os.path.join(workdir, output)
+                rows, seconds, peak = _measure(ingest_fitbit_export, workdir, path)
+                print(f"{label}  ingest -> {output.split('.')[1]:<7}: {rows:,} rows, {seconds:.2f} s, peak RSS {peak:,.0f} MB")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+# -------------------- Burnout History Chart --------------------
+
+def _legacy_history_chart(user_id, days):
+    """Builds the history chart the way main_page did: newest-first rows, a quadratic dedup and a new figure."""
+    with unit_of_work() as conn:
+        history = conn.execute(
+            'SELECT day, risk_percentage FROM burnout_history WHERE user_id = ? ORDER BY day DESC LIMIT ?',
+            (user_id, days)).fetchall()
+    dates = [row[0] for row in history]
+    percentages = [row[1] for row in history]
+    unique_dates = list(dict.fromkeys(dates))
+    unique_percentages = [percentages[dates.index(d)] for d in unique_dates]
+    fig = px.line(x=unique_dates[::-1], y=unique_percentages[::-1], labels={'x': 'Date', 'y': 'Burnout Risk (%)'})
+    fig.update_traces(mode='lines+markers', line=dict(color='#d8bfd8'))
+    return fig
+
+def _history_chart(user_id, days=30):
+    """Builds the history chart the way main_page does: the SQL series and the memoized figure spec."""
+    return history_figure(user_id, get_burnout_series(user_id, days))
+
+def benchmark_history_chart(day_counts=(30, 365, 3650), repeat=50):
+    """Compares the old per-rerun dedup and figure build with the series API and memoized spec."""
+    previous_path = database_functions.DB_PATH
+    for days in day_counts:
+        workdir = tempfile.mkdtemp(prefix='exhale_bench_')
+        try:
+            path = os.path.join(workdir, 'history.db')
+            seed_database(path, num_users=10, days=days, renders_per_day=1, todos_per_user=0, journals_per_user=0)
+            database_functions.set_database_path(path)
+            history = get_burnout_series(1, days)
+            legacy = _legacy_history_chart(1, days)
+            if days <= MAX_HISTORY_POINTS:
+                print(f"{days:>5} days  same points as before: {list(legacy.data[0].x) == list(history[0])}")
+            else:
+                print(f"{days:>5} days  {len(legacy.data[0].x)} points before, {len(history[0])} downsampled now")
+            report(f'{days:>5} days  dedup + new figure every rerun',
+                   time_calls(lambda: _legacy_history_chart(1, days), repeat, warmup=2))
+            report(f'{days:>5} days  series only', time_calls(lambda: get_burnout_series(1, days), repeat))
+            report(f'{days:>5} days  series + memoized spec', time_calls(lambda: _history_chart(1, days), repeat))
+        finally:
+            database_functions.set_database_path(previous_path)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def _daily_window(user_id, days):
+    """Reads every daily value of a window, without downsampling."""
+    with unit_of_work() as conn:
+        return conn.execute('''
+            SELECT day, risk_percentage FROM burnout_history
+            WHERE user_id = ? AND day >= DATE((SELECT MAX(day) FROM burnout_history WHERE user_id = ?), ?)
+            ORDER BY day
+        ''', (user_id, user_id, f'-{days - 1} days')).fetchall()
+
+def _weekly_window_on_the_fly(user_id, days):
+    """Averages a window's daily values per week at query time instead of reading the rollup."""
+    with unit_of_work() as conn:
+        return conn.execute('''
+            SELECT DATE(day, 'weekday 0', '-6 days') AS week, AVG(risk_percentage) FROM burnout_history
+            WHERE user_id = ? AND day >= DATE((SELECT MAX(day) FROM burnout_history WHERE user_id = ?), ?)
+            GROUP BY week ORDER BY week
+        ''', (user_id, user_id, f'-{days - 1} days')).fetchall()
+
+def benchmark_history_windows(num_users=100, days=3650, repeat=200):
+    """Times each history window with bucket and LTTB downsampling against reading every daily value."""
+    workdir = tempfile.mkdtemp(prefix='exhale_bench_')
+    previous_path = database_functions.DB_PATH
+    try:
+        path = os.path.join(workdir, 'history.db')
+        seed_database(path, num_users=num_users, days=days, renders_per_day=1, todos_per_user=0, journals_per_user=0)
+        database_functions.set_database_path(path)
+        rng = random.Random(13)
+        for window, window_days in HISTORY_WINDOWS.items():
+            window_days = window_days or days
+            for method in ('buckets', 'lttb'):
+                points = len(get_burnout_series(1, window_days, method=method)[0])
+                report(f'{window:<8}  {method:<7} -> {points:>3} points',
+                       time_calls(lambda: get_burnout_series(rng.randint(1, num_users), window_days, method=method),
+                                  repeat))
+            report(f'{window:<8}  every daily value -> {len(_daily_window(1, window_days)):>4} points',
+                   time_calls(lambda: _daily_window(rng.randint(1, num_users), window_days), repeat))
+            if window_days > 30:
+                report(f'{window:<8}  weekly GROUP BY at query time',
+                       time_calls(lambda: _weekly_window_on_the_fly(rng.randint(1, num_users), window_days), repeat))
+    finally:
+        database_functions.set_database_path(previous_path)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# -------------------- Hot Path Suite --------------------
+# Times what a signed-in user hits on every rerun, up to a whole headless main_page
+# render, against databases of growing size. Medians and p95s are written to
+# BENCHMARK_RESULTS_DIR/<commit>.json and compared with the most recent results stored
+# for another commit, so a slowdown shows up in the output of the commit that caused it.
+
+HOT_PATH_SIZES = (1_000, 100_000, 1_000_000)    # burnout_history rows
+HOT_PATH_DAYS = 100                              # history days per user, so size // 100 users
+BENCHMARK_RESULTS_DIR = os.environ.get('EXHALE_BENCHMARK_RESULTS', 'benchmark_results')
+REGRESSION_RATIO = 1.25                          # median slowdown reported as a regression
+
+def _current_commit():
+    """Returns the short hash of the checked-out commit, or 'unknown' outside a git checkout."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def _previous_results(commit):
+    """Returns the most recently stored results of another commit, or None."""
+    if not os.path.isdir(BENCHMARK_RESULTS_DIR):
+        return None
+    paths = [os.path.join(BENCHMARK_RESULTS_DIR, name) for name in os.listdir(BENCHMARK_RESULTS_DIR)
+             if name.endswith('.json') and name != f'{commit}.json']
+    if not paths:
+        return None
+    with open(max(paths, key=os.path.getmtime)) as file:
+        return json.load(file)
+
+def _store_results(results):
+    """Writes this run's results for the current commit and prints the changes against the previous run."""
+    commit = _current_commit()
+    previous = _previous_results(commit)
+    os.makedirs(BENCHMARK_RESULTS_DIR, exist_ok=True)
+    path = os.path.join(BENCHMARK_RESULTS_DIR, f'{commit}.json')
+    with open(path, 'w') as file:
+        json.dump({'commit': commit, 'recorded_at': datetime.now().isoformat(timespec='seconds'),
+                   'results': results}, file, indent=2)
+    print(f"\nResults stored in {path}")
+    if previous is None:
+        return
+    print(f"Compared with {previous['commit']} ({previous['recorded_at']}):")
+    for name, result in results.items():
+        before = previous['results'].get(name)
+        if before:
+            ratio = result['median_ms'] / before['median_ms']
+            flag = '  REGRESSION' if ratio > REGRESSION_RATIO else ''
+            print(f"{name:<50} {before['median_ms']:10.3f} -> {result['median_ms']:10.3f} ms  ({ratio:5.2f}x){flag}")
+
+@contextmanager
+def _headless_calendar(workdir):
+    """Points Google Calendar at a local stub with a stub token, so main_page renders headless."""
+    import google_API_functions as calendar
+
+    # AppTest reruns log a deprecation warning per chart and bare-mode notices; keep the report readable
+    for logger in ('streamlit.deprecation_util', 'streamlit.runtime.scriptrunner_utils.script_run_context'):
+        logging.getLogger(logger).disabled = True
+    previous = (calendar.CALENDAR_API_ENDPOINT, calendar.TOKEN_PATH)
+    try:
+        calendar.TOKEN_PATH = os.path.join(workdir, 'token.pickle')
+        _write_stub_token(calendar.TOKEN_PATH)
+        with FakeCalendarServer(synthetic_calendar_events(20)) as server:
+            calendar.CALENDAR_API_ENDPOINT = server.url
+            yield
+    finally:
+        calendar.CALENDAR_API_ENDPOINT, calendar.TOKEN_PATH = previous
+        calendar.clear_calendar_service_cache()
+
+def _headless_main_page(num_users):
+    """Returns a function rendering main_page for a random user with streamlit's AppTest."""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main_code.py'),
+                            default_timeout=60)
+    rng = random.Random(5)
+
+    def render():
+        user_id = rng.randint(1, num_users)
+        app.session_state['page'] = 'main'
+        app.session_state['user_id'] = user_id
+        app.session_state['email'] = f'user{user_id}@example.com'
+        app.run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+    return render
+
+def benchmark_hot_paths(sizes=HOT_PATH_SIZES, repeat=200, render_repeat=20):
+    """Times the per-rerun hot paths at each database size and stores the results for this commit."""
+    results = {}
+    previous_path = database_functions.DB_PATH
+    for size in sizes:
+        workdir = tempfile.mkdtemp(prefix='exhale_bench_')
+        try:
+            num_users = max(1, size // HOT_PATH_DAYS)
+            path = os.path.join(workdir, 'hot_paths.db')
+            seed_database(path, num_users=num_users, days=HOT_PATH_DAYS, renders_per_day=1, journals_per_user=10)
+            database_functions.set_database_path(path)
+            population = synthetic_population(size)
+            single = population.iloc[0].tolist()
+            rng = random.Random(11)
+            paths = {
+                'predict_burnout_risk': (lambda: predict_burnout_risk(*single), repeat),
+                'predict_burnout_risk_batch': (lambda: predict_burnout_risk_batch(population),
+                                               max(5, min(repeat, 10_000_000 // size))),
+                'get_burnout_history': (lambda: get_burnout_history(rng.randint(1, num_users)), repeat),
+                'get_todo_list': (lambda: get_todo_list(rng.randint(1, num_users)), repeat),
+                'journal listing': (lambda: _list_journal_entries(rng.randint(1, num_users)), repeat),
+                'main_page history chart (rerun)': (lambda: _history_chart(1), repeat),
+            }
+            with _headless_calendar(workdir):
+                paths['main_page render (AppTest)'] = (_headless_main_page(num_users), render_repeat)
+                for name, (fn, calls) in paths.items():
+                    samples = time_calls(fn, calls, warmup=min(10, calls))
+                    label = f'{size:>9,} rows  {name}'
+                    report(label, samples)
+                    results[label] = {'median_ms': statistics.median(samples),
+                                      'p95_ms': sorted(samples)[min(len(samples) - 1, int(len(samples) * 0.95))]}
+        finally:
+            database_functions.set_database_path(previous_path)
+            shutil.rmtree(workdir, ignore_errors=True)
+    _store_results(results)
+
+# -------------------- Journal Listing --------------------
+
+JOURNAL_WORDS = ('today', 'work', 'tired', 'calm', 'meeting', 'deadline', 'walk', 'sleep', 'friends', 'focused',
+                 'anxious', 'grateful', 'coffee', 'project', 'weekend', 'family', 'run', 'late', 'quiet', 'busy')
+
+def seed_journal_entries(path, num_users, entries_per_user, seed=21, vocabulary=JOURNAL_WORDS, length=(20, 500)):
+    """Adds entries_per_user journal entries (two a day, going back) to each user.
+
+    Entries are length[0]-length[1] words drawn from vocabulary, with the word at rank r
+    drawn about 1/r as often as the most common one, as in natural text.
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    cum_weights = np.cumsum(1 / np.arange(1, len(vocabulary) + 1)).tolist()
+    conn = sqlite3.connect(path)
+    for user_id in range(1, num_users + 1):
+        conn.executemany('INSERT INTO journal_entries (user_id, title, date, content) VALUES (?, ?, ?, ?)', (
+            (user_id, f'Entry {i}', (today - timedelta(days=i // 2)).isoformat(),
+             ' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(*length))).capitalize() + '.')
+            for i in range(entries_per_user)))
+    conn.commit()
+    conn.close()
+
+def _legacy_journal_tab(user_id):
+    """Reads and formats every entry with its full content, the way the Journal tab did before paging."""
+    with unit_of_work() as conn:
+        entries = conn.execute('SELECT title, date, content FROM journal_entries WHERE user_id = ? ORDER BY date DESC',
+                               (user_id,)).fetchall()
+    return [f'<h4>{title}</h4><p>{journal_date}</p><p>{content}</p>' for title, journal_date, content in entries]
+
+def _journal_page(user_id, before=None):
+    """Reads and formats one page of titles and previews, the way the Journal tab does now."""
+    entries, _ = list_journal_entries(user_id, before)
+    return [f'<h4>{title}</h4><p>{journal_date}</p><p>{preview}</p>' for _, title, journal_date, preview in entries]
+
+def benchmark_journal_listing(num_users=20, entries_per_user=10_000, repeat=200, render_repeat=10):
+    """Compares reading a whole journal with reading one page of previews, for users with years of entries."""
+    workdir = tempfile.mkdtemp(prefix='exhale_bench_')
+    previous_path = database_functions.DB_PATH
+    try:
+        path = os.path.join(workdir, 'journal.db')
+        seed_database(path, num_users=num_users, days=30, renders_per_day=1, journals_per_user=0)
+        seed_journal_entries(path, num_users, entries_per_user)
+        database_functions.set_database_path(path)
+        rng = random.Random(17)
+        user_ids = list(range(1, num_users + 1))
+        # Cursor of the page halfway through each journal
+        middle_page = entries_per_user // 2 // JOURNAL_PAGE_SIZE
+        with unit_of_work() as conn:
+            middle = {user_id: conn.execute(
+                'SELECT date, id FROM journal_entries WHERE user_id = ? ORDER BY date DESC, id DESC LIMIT 1 OFFSET ?',
+                (user_id, middle_page * JOURNAL_PAGE_SIZE - 1)).fetchone() for user_id in user_ids}
+        newest = {user_id: list_journal_entries(user_id)[0][0][0] for user_id in user_ids}
+
+        def middle_of_journal():
+            user_id = rng.choice(user_ids)
+            return _journal_page(user_id, middle[user_id])
+
+        def open_entry():
+            user_id = rng.choice(user_ids)
+            return get_journal_content(user_id, newest[user_id])
+
+        label = f'{entries_per_user:,} entries/user'
+        report(f'{label}  whole journal, full content (before)',
+               time_calls(lambda: _legacy_journal_tab(rng.choice(user_ids)), min(repeat, 20), warmup=2))
+        report(f'{label}  newest page of previews', time_calls(lambda: _journal_page(rng.choice(user_ids)), repeat))
+        report(f'{label}  page {middle_page + 1} of previews', time_calls(middle_of_journal, repeat))
+        report(f'{label}  open one entry', time_calls(open_entry, repeat))
+        with _headless_calendar(workdir):
+            report(f'{label}  main_page render (AppTest)',
+                   time_calls(_headless_main_page(num_users), render_repeat, warmup=2))
+    finally:
+        database_functions.set_database_path(previous_path)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# -------------------- Journal Search --------------------
+
+def synthetic_vocabulary(size, seed=23):
+    """Returns size distinct made-up words of 3-9 letters."""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(3, 9))))
+    return sorted(words, key=lambda word: rng.random())
+
+def _legacy_journal_search(user_id, text):
+    """Finds the user's entries containing every word of text by scanning their content in Python."""
+    words = text.lower().split()
+    with unit_of_work() as conn:
+        entries = conn.execute('SELECT id, title, date, content FROM journal_entries WHERE user_id = ?',
+                               (user_id,)).fetchall()
+    return [entry[:3] for entry in entries if all(word in entry[3].lower() for word in words)]
+
+def _edit_journal_entry(entry_id):
+    """Rewrites one entry's content."""
+    with unit_of_work() as conn:
+        conn.execute("UPDATE journal_entries SET content = 'An edited entry about calm evenings.' WHERE id = ?",
+                     (entry_id,))
+
+def _journal_writes(user_id, repeat):
+    """Times saving, editing and deleting one journal entry, repeat times each."""
+    save = time_calls(lambda: save_journal_entry(user_id, 'Benchmark', date.today().isoformat(),
+                                                 'A new entry about work and sleep. ' * 20), repeat, warmup=0)
+    with unit_of_work() as conn:
+        ids = [row[0] for row in conn.execute(
+            "SELECT id FROM journal_entries WHERE user_id = ? AND title = 'Benchmark'", (user_id,))]
+    pending = iter(ids)
+    edit = time_calls(lambda: _edit_journal_entry(next(pending)), repeat, warmup=0)
+    pending = iter(ids)
+    delete = time_calls(lambda: delete_journal_entry(user_id, next(pending)), repeat, warmup=0)
+    return save, edit, delete
+
+def benchmark_journal_search(num_users=1_000, entries_per_user=2_000, repeat=100, write_repeat=200):
+    """Times building the journal search index, keeping it up to date, and searching millions of entries."""
+    workdir = tempfile.mkdtemp(prefix='exhale_bench_')
+    previous_path = database_functions.DB_PATH
+    try:
+        path = os.path.join(workdir, 'journal.db')
+        vocabulary = synthetic_vocabulary(20_000)
+        started = time.perf_counter()
+        seed_database(path, num_users=num_users, days=1, renders_per_day=1, journals_per_user=0,
+                      schema_version=11)
+        seed_journal_entries(path, num_users, entries_per_user, vocabulary=vocabulary, length=(30, 90))
+        total = num_users * entries_per_user
+        print(f"Seeded {total:,} entries in {time.perf_counter() - started:.1f} s")
+        database_functions.set_database_path(path)
+        rng = random.Random(29)
+
+        # Writes without the index, then the one-off build, then writes keeping it up to date
+        writes = {'without index': _journal_writes(1, write_repeat)}
+        size = os.path.getsize(path)
+        started = time.perf_counter()
+        migrate_database()
+        print(f"Index build over {total:,} entries: {time.perf_counter() - started:.1f} s, "
+              f"{(os.path.getsize(path) - size) / 2**20:,.0f} MB")
+        writes['with index'] = _journal_writes(1, write_repeat)
+        for label, (save, edit, delete) in writes.items():
+            report(f'save entry ({label})', save)
+            report(f'edit entry ({label})', edit)
+            report(f'delete entry ({label})', delete)
+
+        # Words from the most common one (in most entries) to ones found in a few entries per user
+        queries = {f'word ranked {rank + 1}': vocabulary[rank] for rank in (0, 10, 100, 1_000)}
+        queries['two words'] = f'{vocabulary[10]} {vocabulary[100]}'
+        since = (date.today() - timedelta(days=90)).isoformat()
+        for name, text in queries.items():
+            report(f'{name:<16} Python scan of content (before)',
+                   time_calls(lambda: _legacy_journal_search(rng.randint(1, num_users), text), 20, warmup=2))
+            for order in SEARCH_ORDERS:
+                report(f'{name:<16} {order}',
+                       time_calls(lambda: search_journal_entries(rng.randint(1, num_users), text, order=order), repeat))
+            report(f'{name:<16} relevance, last 90 days',
+                   time_calls(lambda: search_journal_entries(rng.randint(1, num_users), text, start=since), repeat))
+    finally:
+        database_functions.set_database_path(previous_path)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# -------------------- Journal Analysis --------------------
+
+def journal_analysis_vocabulary(size=5_000):
+    """Returns English stopwords and emotion words followed by made-up words, most common first."""
+    emotion_words = [word for words in journal_analysis.EMOTION_WORDS.values() for word in words.split()]
+    return sorted(journal_analysis.STOPWORDS) + emotion_words + synthetic_vocabulary(size)
+
+def _reset_journal_analysis():
+    """Forgets every stored analysis, so the next run starts from the first entry."""
+    with unit_of_work() as conn:
+        conn.execute('DELETE FROM journal_emotions')
+        conn.execute('UPDATE journal_analysis_state SET last_entry_id = 0, entries_analysed = 0')
+
+def benchmark_journal_analysis(num_users=200, entries_per_user=1_000, worker_counts=(1, os.cpu_count() or 1),
+                               batch_size=1_000, new_entries=100):
+    """Measures journal emotion and keyword extraction throughput, alone and as full runs over a process pool."""
+    workdir = tempfile.mkdtemp(prefix='exhale_bench_')
+    previous_path = database_functions.DB_PATH
+    try:
+        path = os.path.join(workdir, 'journal.db')
+        seed_database(path, num_users=num_users, days=1, renders_per_day=1, journals_per_user=0)
+        seed_journal_entries(path, num_users, entries_per_user, vocabulary=journal_analysis_vocabulary(),
+                             length=(30, 300))
+        database_functions.set_database_path(path)
+        total = num_users * entries_per_user
+
+        with unit_of_work() as conn:
+            rows = conn.execute('SELECT id, user_id, date, title, content, NULL FROM journal_entries LIMIT ?',
+                                (batch_size * 10,)).fetchall()
+        words = sum(len(row[4].split()) for row in rows)
+        started = time.perf_counter()
+        journal_analysis.analyse_batch(rows)
+        elapsed = time.perf_counter() - started
+        print(f"analyse_batch, one process: {len(rows) / elapsed:,.0f} entries/s ({words / elapsed:,.0f} words/s)")
+
+        for workers in worker_counts:
+            _reset_journal_analysis()
+            started = time.perf_counter()
+            journal_analysis.run_journal_analysis(batch_size, workers)
+            elapsed = time.perf_counter() - started
+            print(f"run_journal_analysis over {total:,} entries with {workers} workers: {elapsed:.2f} s "
+                  f"({total / elapsed:,.0f} entries/s)")
+
+        # Catching up with a few new entries and edits, as a cron or --watch run does
+        rng = random.Random(31)
+        for _ in range(new_entries):
+            save_journal_entry(rng.randint(1, num_users), 'New entry', date.today().isoformat(),
+                               'A long day of meetings, tired but grateful for a calm evening walk.')
+        with unit_of_work() as conn:
+            conn.executemany("UPDATE journal_entries SET content = content || ' Not worried anymore.' WHERE id = ?",
+                             ((rng.randint(1, total),) for _ in range(new_entries)))
+        started = time.perf_counter()
+        analysed = journal_analysis.run_journal_analysis(batch_size, 1)
+        print(f"Incremental run: {analysed} new and edited entries in {(time.perf_counter() - started) * 1000:.1f} ms")
+    finally:
+        database_functions.set_database_path(previous_path)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# -------------------- Entry Point --------------------
+
+BENCHMARKS = {
+    'hot_paths': benchmark_hot_paths,
+    'journal_listing': benchmark_journal_listing,
+    'journal_search': benchmark_journal_search,
+    'journal_analysis': benchmark_journal_analysis,
+    'history_chart': benchmark_history_chart,
+    'history_windows': benchmark_history_windows,
+    'main_page': benchmark_main_page,
+    'per_user_queries': benchmark_per_user_queries,
+    'batch_scoring': benchmark_batch_scoring,
+    'profile_score': benchmark_profile_score,
+    'model_registry': benchmark_model_registry,
+    'model_training': benchmark_model_training,
+    'nightly_rescoring': benchmark_nightly_rescoring,
+    'calendar_service': benchmark_calendar_service,
+    'calendar_events': benchmark_calendar_events,
+    'intraday_store': benchmark_intraday_store,
+    'fitbit_sync': benchmark_fitbit_sync,
+    'fitbit_features': benchmark_fitbit_features,
+    'fitbit_export_ingest': benchmark_fitbit_export_ingest,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Exhale performance benchmarks.")
+    parser.add_argument('names', nargs='*', help=f"Benchmarks to run (default: all). Available: {', '.join(BENCHMARKS)}")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    for name in args.names or BENCHMARKS:
+        print(f"\n--- {name} ---")
+        BENCHMARKS[name]()
+
+if __name__ == "__main__":
+    main()
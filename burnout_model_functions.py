@@ -0,0 +1,260 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+
+# -------------------- Model Definition --------------------
+
+# Work hours up to the baseline count at a lower weight than overtime
+BASELINE_HOURS = 8
+# Raw scores in [MIN_SCORE, MAX_SCORE] map linearly onto 0-100%
+MIN_SCORE = -10
+MAX_SCORE = 20
+# Positional arguments of predict_burnout_risk, in order
+MODEL_INPUTS = ['age', 'gender', 'work_hours', 'sleep_hours', 'weekend_overtime', 'stress_level',
+                'job_avg_stress', 'education', 'city', 'family_size', 'num_pets', 'exercise_hours',
+                'remote_percentage', 'daily_steps']
+# The score splits into a profile part, which only changes on profile edits and birthdays
+# (and is stored, see user_profile_functions), and the daily part added on every render
+PROFILE_INPUTS = ['age', 'gender', 'job_avg_stress', 'education', 'city', 'family_size', 'num_pets',
+                  'remote_percentage']
+DAILY_INPUTS = ['work_hours', 'sleep_hours', 'weekend_overtime', 'stress_level', 'exercise_hours', 'daily_steps']
+
+def profile_score(age, gender, job_avg_stress=5, education=1, city='Small', family_size=0, num_pets=0,
+                  remote_percentage=0.5):
+    """Returns the profile-dependent part of the raw burnout score."""
+    score = 0
+    # Age: older age reduces burnout risk
+    score += -0.2 * age
+    # Gender: female workers have a higher risk
+    score += 0.7 if gender.lower() == 'female' else 0
+    # Job: the typical stress of the job increases risk
+    score += 0.8 * job_avg_stress
+
+    # Education: higher education increases risk
+    score += 0.2 * education
+    # City: living in a big city adds a modest risk
+    score += 0.3 if city.lower() == 'big' else 0
+
+    # Family size: larger family responsibilities might increase risk
+    score += 0.1 * family_size
+    # Pets: presence of pets might help reduce stress
+    score += -0.2 * num_pets
+    # Remote work: higher remote percentage might increase risk (but effect is moderated)
+    score += 0.4 * remote_percentage
+    return score
+
+def daily_score(profile_component, work_hours=8.0, sleep_hours=7.0, weekend_overtime=0.0, stress_level=5,
+                exercise_hours=1.0, daily_steps=None):
+    """Adds the daily survey and Fitbit terms to a profile_score and returns (risk_percentage, score)."""
+    score = profile_component
+    # Work hours: baseline for first 8 hours and extra for overtime
+    score += 0.3 * min(work_hours, BASELINE_HOURS)
+    score += 0.5 * max(0, work_hours - BASELINE_HOURS)
+
+    # Sleep: more sleep reduces risk
+    score += -0.4 * sleep_hours
+    # Overtime: increased weekend overtime increases risk
+    score += 0.6 * weekend_overtime
+
+    # Stress: higher stress strongly increases burnout risk
+    score += 1.0 * stress_level
+    # Exercise: more exercise reduces burnout risk
+    score += -0.3 * exercise_hours
+
+    # Daily steps: more steps are linked with lower burnout risk
+    # Here, we subtract 0.0002 per step (i.e., ~2 points reduction for 10,000 steps)
+    # Users without synced Fitbit data (daily_steps=None) get no step term at all
+    if daily_steps is not None:
+        score += -0.0002 * daily_steps
+    # ------------------------------
+    # Scale score to percentage (0-100%)
+    # ------------------------------
+    risk_percentage = (score - MIN_SCORE) / (MAX_SCORE - MIN_SCORE) * 100
+    risk_percentage = max(0, min(100, risk_percentage)) 
+
+    return risk_percentage, score
+
+def predict_burnout_risk(age, gender, work_hours=8.0, sleep_hours=7.0, weekend_overtime=0.0,
+                         stress_level=5, job_avg_stress=5, education=1, city='Small',
+                         family_size=0, num_pets=0, exercise_hours=1.0, remote_percentage=0.5,
+                         daily_steps=None):
+    """Returns (risk_percentage, raw score) for one user's profile and daily answers."""
+    profile_component = profile_score(age, gender, job_avg_stress, education, city, family_size, num_pets,
+                                      remote_percentage)
+    return daily_score(profile_component, work_hours, sleep_hours, weekend_overtime, stress_level,
+                       exercise_hours, daily_steps)
+
+# -------------------- Job Stress Dictionary --------------------
+
+job_stress_levels = {
+    "Air Traffic Controller": 9,
+    "Surgeon": 9,
+    "Firefighter": 8,
+    "Commercial Airline Pilot": 8,
+    "Police Officer": 8,
+    "Corporate Executive": 7,
+    "Journalist": 7,
+    "Emergency Medical Technician (EMT)": 7,
+    "Stockbroker": 7,
+    "Event Coordinator": 6,
+    "Teacher": 6,
+    "Nurse": 6,
+    "IT Manager": 6,
+    "Sales Manager": 6,
+    "Social Worker": 6,
+    "Engineer": 5,
+    "Accountant": 5,
+    "Architect": 5,
+    "Electrician": 5,
+    "Customer Service Representative": 5,
+    "Administrative Assistant": 4,
+    "Graphic Designer": 4,
+    "Librarian": 3,
+    "Data Entry Clerk": 3,
+    "Translator": 3,
+    "Receptionist": 3,
+    "Florist": 2,
+    "Tailor": 2,
+    "Student": 7,
+    "Stay-at-Home Parent": 7
+}
+
+# -------------------- Age Calculation Function --------------------
+def calculate_age(dob, today=None):
+    """Calculates the age based on the date of birth."""
+    today = today or date.today()
+    return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+
+def calculate_age_batch(dobs, today=None):
+    """Vectorized calculate_age for an array-like of dates of birth (dates or 'YYYY-MM-DD' strings).
+
+    today is one date for every row, or an array-like with each row's own reference date.
+    """
+    if today is None:
+        today = date.today()
+    dobs = pd.to_datetime(pd.Series(dobs).reset_index(drop=True), errors='coerce')
+    if isinstance(today, date):
+        year, month, day = today.year, today.month, today.day
+    else:
+        today = pd.to_datetime(pd.Series(today).reset_index(drop=True), errors='coerce')
+        year, month, day = today.dt.year, today.dt.month, today.dt.day
+    before_birthday = (dobs.dt.month > month) | ((dobs.dt.month == month) & (dobs.dt.day > day))
+    return (year - dobs.dt.year - before_birthday.astype(int)).to_numpy(dtype=np.float64)
+
+# -------------------- Batch Scoring --------------------
+# Column defaults mirror the keyword defaults of predict_burnout_risk
+BATCH_DEFAULTS = {
+    'work_hours': 8.0,
+    'sleep_hours': 7.0,
+    'weekend_overtime': 0.0,
+    'stress_level': 5,
+    'job_avg_stress': 5,
+    'education': 1,
+    'family_size': 0,
+    'num_pets': 0,
+    'exercise_hours': 1.0,
+    'remote_percentage': 0.5,
+}
+
+def _equals_ignoring_case(values, target):
+    """Returns a boolean array marking the values equal to target, case-insensitively.
+
+    Only the distinct values are lowercased, so a million-row column with a handful
+    of categories costs one hash pass instead of a million string operations.
+    """
+    codes, uniques = pd.factorize(pd.Series(values, copy=False))
+    matches = np.array([str(value).lower() == target for value in uniques] + [False], dtype=bool)
+    return matches[codes]  # code -1 (missing) picks the trailing False
+
+def _feature_count(features):
+    return len(features) if isinstance(features, pd.DataFrame) else len(next(iter(features.values())))
+
+def _column(features, name, n):
+    """Returns a float64 feature column, or the column's default when it is missing."""
+    if name in features:
+        return np.asarray(features[name], dtype=np.float64)
+    return np.full(n, BATCH_DEFAULTS[name], dtype=np.float64)
+
+def profile_score_batch(features):
+    """Vectorized profile_score; 'job_avg_stress' may be replaced by a 'job' column."""
+    n = _feature_count(features)
+    age = np.asarray(features['age'], dtype=np.float64)
+    is_female = _equals_ignoring_case(features['gender'], 'female')
+    is_big_city = _equals_ignoring_case(features['city'], 'big') if 'city' in features else np.zeros(n, dtype=bool)
+    if 'job_avg_stress' not in features and 'job' in features:
+        job_avg_stress = pd.Series(features['job'], copy=False).map(job_stress_levels).fillna(5).to_numpy(dtype=np.float64)
+    else:
+        job_avg_stress = _column(features, 'job_avg_stress', n)
+
+    # Same terms, in the same order, as profile_score so rounding matches exactly
+    score = -0.2 * age
+    score += np.where(is_female, 0.7, 0.0)
+    score += 0.8 * job_avg_stress
+    score += 0.2 * _column(features, 'education', n)
+    score += np.where(is_big_city, 0.3, 0.0)
+    score += 0.1 * _column(features, 'family_size', n)
+    score += -0.2 * _column(features, 'num_pets', n)
+    score += 0.4 * _column(features, 'remote_percentage', n)
+    return score
+
+def daily_score_batch(profile_components, features):
+    """Vectorized daily_score over an array of profile scores; returns (risk_percentages, scores)."""
+    n = len(profile_components)
+    work_hours = _column(features, 'work_hours', n)
+
+    # Same terms, in the same order, as daily_score so rounding matches exactly
+    score = np.array(profile_components, dtype=np.float64)
+    score += 0.3 * np.minimum(work_hours, BASELINE_HOURS)
+    score += 0.5 * np.maximum(0, work_hours - BASELINE_HOURS)
+    score += -0.4 * _column(features, 'sleep_hours', n)
+    score += 0.6 * _column(features, 'weekend_overtime', n)
+    score += 1.0 * _column(features, 'stress_level', n)
+    score += -0.3 * _column(features, 'exercise_hours', n)
+    if 'daily_steps' in features:
+        daily_steps = np.asarray(features['daily_steps'], dtype=np.float64)  # None becomes NaN
+        score += np.where(np.isnan(daily_steps), 0.0, -0.0002 * daily_steps)
+
+    risk_percentage = (score - MIN_SCORE) / (MAX_SCORE - MIN_SCORE) * 100
+    np.clip(risk_percentage, 0, 100, out=risk_percentage)
+    return risk_percentage, score
+
+def predict_burnout_risk_batch(features):
+    """Scores a whole population in one vectorized pass.
+
+    features is a pandas DataFrame or a dict of equal-length arrays with the same
+    names as the predict_burnout_risk arguments; missing optional columns use the
+    same defaults. 'job_avg_stress' may be replaced by a 'job' column, which is
+    looked up in job_stress_levels. Returns (risk_percentages, scores) as float64
+    arrays that are numerically identical to scoring each row with
+    predict_burnout_risk.
+    """
+    return daily_score_batch(profile_score_batch(features), features)
+
+# -------------------- Feature Matrix --------------------
+# Numeric encoding of the model inputs used by the trained models (model_registry_functions)
+FEATURE_NAMES = ['age', 'is_female', 'work_hours', 'sleep_hours', 'weekend_overtime', 'stress_level',
+                 'job_avg_stress', 'education', 'is_big_city', 'family_size', 'num_pets', 'exercise_hours',
+                 'remote_percentage', 'daily_steps']
+
+def feature_matrix(features):
+    """Returns an (n, len(FEATURE_NAMES)) float64 matrix for the same inputs predict_burnout_risk_batch takes.
+
+    Missing optional columns use the batch defaults, except daily_steps, which stays NaN
+    when unknown so each model can decide how to treat it.
+    """
+    n = _feature_count(features)
+    matrix = np.empty((n, len(FEATURE_NAMES)), dtype=np.float64)
+    for i, name in enumerate(FEATURE_NAMES):
+        if name == 'age':
+            matrix[:, i] = np.asarray(features['age'], dtype=np.float64)
+        elif name == 'is_female':
+            matrix[:, i] = _equals_ignoring_case(features['gender'], 'female')
+        elif name == 'is_big_city':
+            matrix[:, i] = _equals_ignoring_case(features['city'], 'big') if 'city' in features else 0.0
+        elif name == 'job_avg_stress' and 'job_avg_stress' not in features and 'job' in features:
+            matrix[:, i] = pd.Series(features['job'], copy=False).map(job_stress_levels).fillna(5).to_numpy(dtype=np.float64)
+        elif name == 'daily_steps':
+            matrix[:, i] = np.asarray(features['daily_steps'], dtype=np.float64) if 'daily_steps' in features else np.nan
+        else:
+            matrix[:, i] = _column(features, name, n)
+    return matrix
@@ -1,30 +1,180 @@
-import sqlite3
+import hashlib
+from datetime import date, timedelta
+import numpy as np
+from database_functions import unit_of_work
 
 # -------------------- Burnout Predictions --------------------
 
-def save_burnout_percentage(user_id, risk_percentage):
-    """Saves the burnout risk percentage to the database."""
-    conn = sqlite3.connect('user_data.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO burnout_history (user_id, date, risk_percentage)
-        VALUES (?, DATETIME('now'), ?)
-    ''', (user_id, risk_percentage))
-    conn.commit()
-    conn.close()
+def compute_inputs_hash(*inputs):
+    """Returns a short fingerprint of the model inputs a burnout score was computed from."""
+    return hashlib.sha1(repr(inputs).encode()).hexdigest()[:16]
+
+def get_todays_burnout(user_id):
+    """Returns today's stored (risk_percentage, inputs_hash) for the given user, or None."""
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT risk_percentage, inputs_hash
+            FROM burnout_history
+            WHERE user_id = ? AND day = DATE('now')
+        ''', (user_id,))
+        return cursor.fetchone()
+
+# Upsert keyed on (user_id, day); rows whose inputs and result are unchanged are left alone
+UPSERT_BURNOUT_SQL = '''
+    INSERT INTO burnout_history (user_id, day, date, risk_percentage, inputs_hash, updated_at)
+    VALUES (?, DATE('now'), DATETIME('now'), ?, ?, DATETIME('now'))
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        date = excluded.date,
+        risk_percentage = excluded.risk_percentage,
+        inputs_hash = excluded.inputs_hash,
+        updated_at = excluded.updated_at
+    WHERE burnout_history.inputs_hash IS NOT excluded.inputs_hash
+       OR burnout_history.risk_percentage IS NOT excluded.risk_percentage
+'''
+
+def save_burnout_percentage(user_id, risk_percentage, inputs_hash=None):
+    """Upserts today's burnout risk percentage, keeping a single row per user and day.
+
+    Returns True when the stored row changed and False when it already held the
+    same result, so reruns with unchanged inputs never rewrite the history.
+    """
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        cursor.execute(UPSERT_BURNOUT_SQL, (user_id, risk_percentage, inputs_hash))
+        return cursor.rowcount > 0
+
+def save_burnout_percentages(rows):
+    """Upserts today's burnout risk for many users at once from (user_id, risk_percentage, inputs_hash) rows."""
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(UPSERT_BURNOUT_SQL, rows)
+        return cursor.rowcount
 
 def get_burnout_history(user_id):
     """Fetches the burnout history for the given user with daily granularity."""
-    conn = sqlite3.connect('user_data.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT DATE(date) AS day, AVG(risk_percentage) AS avg_risk
-        FROM burnout_history
-        WHERE user_id = ?
-        GROUP BY day
-        ORDER BY day DESC
-        LIMIT 30
-    ''', (user_id,))
-    data = cursor.fetchall()
-    conn.close()
-    return data
\ No newline at end of file
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT day, risk_percentage
+            FROM burnout_history
+            WHERE user_id = ?
+            ORDER BY day DESC
+            LIMIT 30
+        ''', (user_id,))
+        data = cursor.fetchall()
+    return data
+
+def get_weekly_burnout_history(user_id, weeks=26):
+    """Fetches the average burnout risk per week (weeks start on Monday) from the rollup table."""
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT period_start, risk_sum / day_count AS avg_risk
+            FROM burnout_rollup
+            WHERE user_id = ? AND granularity = 'week'
+            ORDER BY period_start DESC
+            LIMIT ?
+        ''', (user_id, weeks))
+        data = cursor.fetchall()
+    return data
+
+# -------------------- Burnout History Series --------------------
+# Chart data for any history window. The window ends on the user's newest stored day;
+# windows with more days than max_points are downsampled on the server, either to the
+# weekly or monthly averages kept in burnout_rollup or, with method='lttb', by
+# Largest-Triangle-Three-Buckets over the daily values (which keeps the peaks that an
+# average flattens). A chart never receives more than max_points points.
+
+HISTORY_WINDOWS = {'30 days': 30, '1 year': 365, 'All time': None}
+MAX_HISTORY_POINTS = 120
+GRANULARITY_DAYS = {'day': 1, 'week': 7, 'month': 365.25 / 12}
+
+def history_granularity(span_days, max_points=MAX_HISTORY_POINTS):
+    """Returns the finest of 'day', 'week' and 'month' that covers span_days in at most max_points points."""
+    for granularity, days in GRANULARITY_DAYS.items():
+        if span_days / days <= max_points:
+            return granularity
+    return 'month'
+
+def _period_start(day, granularity):
+    """Returns the start of the rollup period day falls in (see ROLLUP_PERIODS)."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+def lttb(x, y, threshold):
+    """Returns the indices of the threshold points that Largest-Triangle-Three-Buckets keeps from (x, y).
+
+    The first and last points are always kept; in between, each bucket keeps the point
+    forming the largest triangle with the point kept before it and the next bucket's mean.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.intp) + 1
+    edges[-1] = n - 1
+    # Mean of the bucket after each bucket (the last point for the last one)
+    counts = np.diff(edges)
+    mean_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / counts, x[-1])[1:].tolist()
+    mean_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / counts, y[-1])[1:].tolist()
+    # Buckets hold a few points each, so the sequential part runs on plain floats
+    x, y, edges = x.tolist(), y.tolist(), edges.tolist()
+    kept = [0]
+    for bucket in range(threshold - 2):
+        a = kept[-1]
+        ax, ay, mx, my = x[a], y[a], mean_x[bucket], mean_y[bucket]
+        best, best_area = edges[bucket], -1.0
+        for i in range(edges[bucket], edges[bucket + 1]):
+            area = abs((ax - mx) * (y[i] - ay) - (ax - x[i]) * (my - ay))
+            if area > best_area:
+                best, best_area = i, area
+        kept.append(best)
+    kept.append(n - 1)
+    return np.array(kept, dtype=np.intp)
+
+def get_burnout_series(user_id, days=30, max_points=MAX_HISTORY_POINTS, method='buckets'):
+    """Returns the user's burnout history over the last days (None: all of it) as chart-ready
+    (periods, risk_percentages), oldest first.
+
+    Daily values are returned while they fit in max_points; otherwise method='buckets'
+    returns weekly or monthly averages (periods are then the Monday or the first of the
+    month) and method='lttb' a subset of the daily values.
+    """
+    with unit_of_work() as conn:
+        newest, oldest = conn.execute('''
+            SELECT (SELECT MAX(day) FROM burnout_history WHERE user_id = ?),
+                   (SELECT MIN(day) FROM burnout_history WHERE user_id = ?)
+        ''', (user_id, user_id)).fetchone()
+        if newest is None:
+            return (), ()
+        newest = date.fromisoformat(newest)
+        start = date.fromisoformat(oldest)
+        if days is not None:
+            start = max(start, newest - timedelta(days=days - 1))
+        granularity = 'day' if method == 'lttb' else history_granularity((newest - start).days + 1, max_points)
+        if granularity == 'day':
+            rows = conn.execute('''
+                SELECT day, risk_percentage
+                FROM burnout_history
+                WHERE user_id = ? AND day >= ?
+                ORDER BY day
+            ''', (user_id, start.isoformat())).fetchall()
+        else:
+            rows = conn.execute('''
+                SELECT period_start, risk_sum / day_count
+                FROM burnout_rollup
+                WHERE user_id = ? AND granularity = ? AND period_start >= ?
+                ORDER BY period_start
+            ''', (user_id, granularity, _period_start(start, granularity).isoformat())).fetchall()
+    periods, risks = zip(*rows) if rows else ((), ())
+    if len(periods) > max_points:
+        # Only reached for lttb, or for more than max_points months of history
+        ordinals = [date.fromisoformat(period).toordinal() for period in periods]
+        kept = lttb(ordinals, risks, max_points)
+        periods, risks = tuple(periods[i] for i in kept), tuple(risks[i] for i in kept)
+    return periods, risks
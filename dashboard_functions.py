@@ -0,0 +1,146 @@
+import time
+from dataclasses import dataclass, field
+from datetime import date
+import plotly.express as px
+import streamlit as st
+from burnout_predictions_functions import HISTORY_WINDOWS, get_burnout_series
+from database_functions import unit_of_work
+from fitbit_features_functions import FEATURE_COLUMNS
+from survey_functions import SURVEY_DEFAULTS
+
+# -------------------- Dashboard Snapshot --------------------
+
+SNAPSHOT_KEY = 'dashboard_snapshot'
+# Reload at least this often so writes from other sessions or the nightly job show up
+SNAPSHOT_MAX_AGE_SECONDS = 300
+
+PROFILE_COLUMNS = ['dob', 'gender', 'family_size', 'num_pets', 'city', 'education', 'remote_percentage', 'job', 'name']
+
+@dataclass
+class DashboardSnapshot:
+    """Everything main_page reads from the database for one user."""
+    user_id: int
+    profile: dict = None           # user_profile columns, None if onboarding is not finished
+    survey: dict = None            # latest survey answers with defaults applied, None if never submitted
+    todays_burnout: tuple = None   # (risk_percentage, inputs_hash) stored for today, if any
+    fitbit_features: dict = None   # yesterday's fitbit_daily_features row, None without synced Fitbit data
+    profile_score: tuple = None    # stored (profile_score, valid_until, age), None if never computed or invalidated
+    history: tuple = ((), ())      # (days, risk_percentages) of the last 30 days, oldest first
+    todos: list = field(default_factory=list)    # [(id, task, completed)]
+    loaded_on: date = None
+    loaded_at: float = 0.0
+    timings: dict = field(default_factory=dict)  # stage -> milliseconds
+    history_windows: dict = field(default_factory=dict)  # window label -> series, loaded on first use
+
+def load_dashboard_snapshot(user_id):
+    """Loads the dashboard data for the user with three statements on one connection."""
+    timings = {}
+    start = time.perf_counter()
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        timings['acquire_connection'] = (time.perf_counter() - start) * 1000
+
+        stage = time.perf_counter()
+        row = cursor.execute('''
+            SELECT p.user_id, p.dob, p.gender, p.family_size, p.num_pets, p.city, p.education,
+                   p.remote_percentage, p.job, p.name,
+                   s.user_id, s.mood, s.stress_level, s.work_hours, s.weekend_overtime, s.exercise_hours, s.sleep_hours,
+                   b.risk_percentage, b.inputs_hash,
+                   f.user_id, f.steps, f.minutes_asleep, f.resting_hr, f.hr_variability,
+                   ps.profile_score, ps.valid_until, ps.age
+            FROM (SELECT ? AS user_id) u
+            LEFT JOIN user_profile p ON p.user_id = u.user_id
+            LEFT JOIN daily_stress_submissions s ON s.user_id = u.user_id
+            LEFT JOIN burnout_history b ON b.user_id = u.user_id AND b.day = DATE('now')
+            LEFT JOIN fitbit_daily_features f ON f.user_id = u.user_id AND f.day = DATE('now', '-1 day')
+            LEFT JOIN user_profile_scores ps ON ps.user_id = u.user_id
+        ''', (user_id,)).fetchone()
+        timings['profile_survey_burnout'] = (time.perf_counter() - stage) * 1000
+
+        stage = time.perf_counter()
+        history = get_burnout_series(user_id)
+        timings['history'] = (time.perf_counter() - stage) * 1000
+
+        stage = time.perf_counter()
+        todos = cursor.execute('SELECT id, task, completed FROM todo_list WHERE user_id = ?', (user_id,)).fetchall()
+        timings['todos'] = (time.perf_counter() - stage) * 1000
+    timings['total'] = (time.perf_counter() - start) * 1000
+
+    profile = dict(zip(PROFILE_COLUMNS, row[1:10])) if row[0] is not None else None
+    survey = None
+    if row[10] is not None:
+        survey = {name: value if value is not None else SURVEY_DEFAULTS[name]
+                  for name, value in zip(SURVEY_DEFAULTS, row[11:17])}
+    todays_burnout = (row[17], row[18]) if row[17] is not None else None
+    fitbit_features = dict(zip(FEATURE_COLUMNS, row[20:24])) if row[19] is not None else None
+    profile_score = tuple(row[24:27]) if row[24] is not None else None
+    return DashboardSnapshot(user_id, profile, survey, todays_burnout, fitbit_features, profile_score, history, todos,
+                             loaded_on=date.today(), loaded_at=time.time(), timings=timings)
+
+def get_dashboard_snapshot(user_id):
+    """Returns the user's snapshot from st.session_state, loading it when missing or stale."""
+    start = time.perf_counter()
+    snapshot = st.session_state.get(SNAPSHOT_KEY)
+    if (snapshot is None or snapshot.user_id != user_id or snapshot.loaded_on != date.today()
+            or time.time() - snapshot.loaded_at > SNAPSHOT_MAX_AGE_SECONDS):
+        snapshot = load_dashboard_snapshot(user_id)
+        st.session_state[SNAPSHOT_KEY] = snapshot
+    else:
+        snapshot.timings = {'cache_hit': (time.perf_counter() - start) * 1000}
+    return snapshot
+
+def invalidate_dashboard_snapshot():
+    """Drops the cached snapshot; call after any write to data shown on the dashboard."""
+    st.session_state.pop(SNAPSHOT_KEY, None)
+
+# -------------------- History Chart --------------------
+
+def get_history_window(snapshot, window):
+    """Returns the snapshot user's burnout series for a HISTORY_WINDOWS label, at most MAX_HISTORY_POINTS points."""
+    days = HISTORY_WINDOWS[window]
+    if days == 30:
+        return snapshot.history
+    if window not in snapshot.history_windows:
+        snapshot.history_windows[window] = get_burnout_series(snapshot.user_id, days)
+    return snapshot.history_windows[window]
+
+def history_figure(user_id, history):
+    """Returns the Plotly figure spec of the user's burnout history chart for (periods, risk_percentages).
+
+    Past days are never rewritten, only today's row is, so the first and last period,
+    the last value and the number of points identify the series; the spec is rebuilt
+    only when they change.
+    """
+    periods, risks = history
+    return _history_figure(user_id, (periods[0], periods[-1], risks[-1], len(periods)), periods, risks)
+
+@st.cache_data(max_entries=1000, show_spinner=False)
+def _history_figure(user_id, last_change, _days, _risks):
+    # _days and _risks are left out of the cache key (last_change stands for them)
+    fig = px.line(
+        x=_days,
+        y=_risks,
+        labels={'x': 'Date', 'y': 'Burnout Risk (%)'},
+        title=None  # Remove the default title
+    )
+    fig.update_traces(mode='lines+markers', line=dict(color='#d8bfd8'))
+    fig.update_layout(
+        xaxis=dict(
+            title=None,
+            showgrid=True,
+            zeroline=True,
+            zerolinecolor='darkgray',
+            zerolinewidth=1,
+            tickformat='%Y-%m-%d',
+            tickangle=45
+        ),
+        yaxis=dict(
+            title='Burnout Risk (%)',
+            showgrid=True,
+            zeroline=True,
+            zerolinecolor='darkgray',
+            zerolinewidth=1
+        ),
+        plot_bgcolor='white'
+    )
+    return fig.to_dict()
@@ -1,11 +1,147 @@
+import os
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 
-# -------------------- Database Functions --------------------
-def create_database():
-    """Creates the SQLite database and required tables."""
-    conn = sqlite3.connect('user_data.db')
-    cursor = conn.cursor()
-    
+# -------------------- Connection Pool --------------------
+DB_PATH = os.environ.get('EXHALE_DB_PATH', 'user_data.db')
+POOL_SIZE = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+def _open_connection(path):
+    """Opens a SQLite connection configured with the pragmas shared by the whole app."""
+    # isolation_level=None hands transaction control to unit_of_work()
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')  # readers never block the writer
+    conn.execute('PRAGMA synchronous=NORMAL')  # safe with WAL, avoids an fsync per commit
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-16000')  # ~16 MB page cache per connection
+    conn.execute('PRAGMA mmap_size=268435456')  # 256 MB memory-mapped reads
+    return conn
+
+class ConnectionPool:
+    """A small per-process pool of SQLite connections to a single database file."""
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Returns an idle connection, opening a new one while below the pool size."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._created < self.size
+            if can_open:
+                self._created += 1
+        if can_open:
+            return _open_connection(self.path)
+        return self._idle.get()
+
+    def release(self, conn):
+        """Returns a connection to the pool, discarding any unfinished transaction."""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close(self):
+        """Closes every idle connection held by the pool."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+def get_pool():
+    """Returns the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+def set_database_path(path):
+    """Points the data-access layer at another database file (used by scripts and benchmarks)."""
+    global DB_PATH, _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        DB_PATH = path
+        _pool = None
+
+@contextmanager
+def unit_of_work(immediate=False):
+    """Yields a pooled connection wrapped in one transaction.
+
+    Nested calls on the same thread reuse the outer connection inside a savepoint, so
+    a block of helper calls shares one connection and commits once. Errors roll the
+    work back; Streamlit's st.rerun()/st.stop() do not derive from Exception and
+    therefore commit what was written before them. immediate=True takes the write
+    lock up front, for read-then-write work that must not race other writers.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        savepoint = f'uow_{_local.depth}'
+        _local.depth += 1
+        conn.execute(f'SAVEPOINT {savepoint}')
+        failed = False
+        try:
+            yield conn
+        except Exception:
+            failed = True
+            conn.execute(f'ROLLBACK TO {savepoint}')
+            conn.execute(f'RELEASE {savepoint}')
+            raise
+        finally:
+            _local.depth -= 1
+            if not failed:
+                conn.execute(f'RELEASE {savepoint}')
+        return
+
+    pool = get_pool()
+    conn = pool.acquire()
+    _local.conn = conn
+    _local.depth = 1
+    failed = False
+    try:
+        conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+        yield conn
+    except Exception:
+        failed = True
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        try:
+            if not failed:
+                conn.commit()
+        finally:
+            _local.conn = None
+            pool.release(conn)
+
+# -------------------- Schema Migrations --------------------
+# Each migration takes a cursor and moves the schema forward by one version. The
+# applied version is stored in PRAGMA user_version, so only pending steps ever run.
+
+def _add_missing_columns(cursor, table, columns):
+    """Adds the given (name, type) columns to table when they are not there yet."""
+    existing = {row[1] for row in cursor.execute(f'PRAGMA table_info({table})')}
+    for name, column_type in columns:
+        if name not in existing:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {column_type}')
+
+def _migration_001_initial_schema(cursor):
+    """Creates the original tables and upgrades databases that predate the survey columns."""
     # Users table for authentication
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -14,7 +150,7 @@ def create_database():
             password TEXT
         )
     ''')
-    
+
     # User profile table linked to users
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS user_profile (
@@ -31,7 +167,7 @@ def create_database():
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
-    
+
     # Burnout history table linked to users
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS burnout_history (
@@ -42,7 +178,7 @@ def create_database():
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
-    
+
     # To-do list table linked to users
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS todo_list (
@@ -87,43 +223,488 @@ def create_database():
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
-    conn.commit()
-    conn.close()
 
-def update_database_schema():
-    """Updates the database schema to include missing columns."""
-    conn = sqlite3.connect('user_data.db')
-    cursor = conn.cursor()
+    # Older databases created the survey table before these columns existed
+    _add_missing_columns(cursor, 'daily_stress_submissions', [
+        ('mood', 'TEXT'),
+        ('stress_level', 'INTEGER'),
+        ('work_hours', 'FLOAT'),
+        ('weekend_overtime', 'FLOAT'),
+        ('exercise_hours', 'FLOAT'),
+        ('sleep_hours', 'FLOAT'),
+    ])
 
-    # Add missing columns to the daily_stress_submissions table
-    try:
-        cursor.execute("ALTER TABLE daily_stress_submissions ADD COLUMN mood TEXT")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-    try:
-        cursor.execute("ALTER TABLE daily_stress_submissions ADD COLUMN stress_level INTEGER")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
+    # Journal table (previously created by the Journal tab on every render)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS journal_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            title TEXT,
+            date DATE,
+            content TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
 
-    try:
-        cursor.execute("ALTER TABLE daily_stress_submissions ADD COLUMN work_hours FLOAT")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
+def _migration_002_per_user_indexes(cursor):
+    """Adds secondary indexes so per-user reads are range scans instead of full table scans."""
+    # Covers get_burnout_history: filter on user_id, group and sort on DATE(date)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_burnout_history_user_date
+        ON burnout_history (user_id, date, risk_percentage)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_todo_list_user ON todo_list (user_id)')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_journal_entries_user_date
+        ON journal_entries (user_id, date DESC)
+    ''')
 
-    try:
-        cursor.execute("ALTER TABLE daily_stress_submissions ADD COLUMN weekend_overtime FLOAT")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
+def _migration_003_daily_burnout_and_rollup(cursor):
+    """Keeps one burnout_history row per user and day and adds an incrementally maintained weekly rollup."""
+    _add_missing_columns(cursor, 'burnout_history', [
+        ('day', 'DATE'),
+        ('inputs_hash', 'TEXT'),
+        ('updated_at', 'TIMESTAMP'),
+    ])
 
-    try:
-        cursor.execute("ALTER TABLE daily_stress_submissions ADD COLUMN exercise_hours FLOAT")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
+    # Collapse the rows written on every rerun into one daily average per user
+    cursor.execute('''
+        CREATE TEMP TABLE burnout_daily AS
+        SELECT user_id, DATE(date) AS day, MAX(date) AS last_date, AVG(risk_percentage) AS risk_percentage
+        FROM burnout_history
+        GROUP BY user_id, DATE(date)
+    ''')
+    cursor.execute('DELETE FROM burnout_history')
+    cursor.execute('''
+        INSERT INTO burnout_history (user_id, day, date, risk_percentage, updated_at)
+        SELECT user_id, day, last_date, risk_percentage, last_date FROM burnout_daily
+    ''')
+    cursor.execute('DROP TABLE temp.burnout_daily')
 
-    try:
-        cursor.execute("ALTER TABLE daily_stress_submissions ADD COLUMN sleep_hours FLOAT")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
+    cursor.execute('DROP INDEX IF EXISTS idx_burnout_history_user_date')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_burnout_history_user_day
+        ON burnout_history (user_id, day)
+    ''')
+
+    # Weekly averages kept as running sums; weeks start on Monday
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS burnout_rollup (
+            user_id INTEGER,
+            granularity TEXT,
+            period_start DATE,
+            risk_sum FLOAT,
+            day_count INTEGER,
+            PRIMARY KEY (user_id, granularity, period_start)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        INSERT INTO burnout_rollup (user_id, granularity, period_start, risk_sum, day_count)
+        SELECT user_id, 'week', DATE(day, 'weekday 0', '-6 days'), SUM(risk_percentage), COUNT(*)
+        FROM burnout_history
+        GROUP BY user_id, DATE(day, 'weekday 0', '-6 days')
+    ''')
+
+    # Triggers keep the rollup in step with every write to burnout_history
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS burnout_rollup_after_insert
+        AFTER INSERT ON burnout_history
+        BEGIN
+            INSERT INTO burnout_rollup (user_id, granularity, period_start, risk_sum, day_count)
+            VALUES (NEW.user_id, 'week', DATE(NEW.day, 'weekday 0', '-6 days'), NEW.risk_percentage, 1)
+            ON CONFLICT (user_id, granularity, period_start) DO UPDATE SET
+                risk_sum = risk_sum + excluded.risk_sum,
+                day_count = day_count + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS burnout_rollup_after_update
+        AFTER UPDATE OF risk_percentage ON burnout_history
+        BEGIN
+            UPDATE burnout_rollup
+            SET risk_sum = risk_sum - OLD.risk_percentage + NEW.risk_percentage
+            WHERE user_id = NEW.user_id AND granularity = 'week'
+              AND period_start = DATE(NEW.day, 'weekday 0', '-6 days');
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS burnout_rollup_after_delete
+        AFTER DELETE ON burnout_history
+        BEGIN
+            UPDATE burnout_rollup
+            SET risk_sum = risk_sum - OLD.risk_percentage, day_count = day_count - 1
+            WHERE user_id = OLD.user_id AND granularity = 'week'
+              AND period_start = DATE(OLD.day, 'weekday 0', '-6 days');
+            DELETE FROM burnout_rollup WHERE day_count <= 0 AND user_id = OLD.user_id;
+        END
+    ''')
+
+def _migration_004_rescoring_checkpoints(cursor):
+    """Adds the checkpoint table that lets the nightly rescoring job resume an interrupted run."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rescoring_runs (
+            run_date DATE PRIMARY KEY,
+            last_user_id INTEGER,
+            rows_scored INTEGER,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+
+def _migration_005_survey_history(cursor):
+    """Adds an append-only survey history; daily_stress_submissions stays as the per-user latest row."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS survey_submissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            submitted_at TIMESTAMP,
+            mood TEXT,
+            stress_level INTEGER,
+            work_hours FLOAT,
+            weekend_overtime FLOAT,
+            exercise_hours FLOAT,
+            sleep_hours FLOAT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_survey_submissions_user_time
+        ON survey_submissions (user_id, submitted_at)
+    ''')
+
+    # The latest answers are the only history that survived the old INSERT OR REPLACE
+    cursor.execute('''
+        INSERT INTO survey_submissions (user_id, submitted_at, mood, stress_level, work_hours,
+                                        weekend_overtime, exercise_hours, sleep_hours)
+        SELECT user_id, last_submission, mood, stress_level, work_hours,
+               weekend_overtime, exercise_hours, sleep_hours
+        FROM daily_stress_submissions
+        WHERE last_submission IS NOT NULL
+    ''')
+
+    # Every appended submission refreshes the latest row unless it is older than it
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS survey_submissions_update_latest
+        AFTER INSERT ON survey_submissions
+        BEGIN
+            INSERT INTO daily_stress_submissions (user_id, last_submission, mood, stress_level, work_hours,
+                                                  weekend_overtime, exercise_hours, sleep_hours)
+            VALUES (NEW.user_id, NEW.submitted_at, NEW.mood, NEW.stress_level, NEW.work_hours,
+                    NEW.weekend_overtime, NEW.exercise_hours, NEW.sleep_hours)
+            ON CONFLICT (user_id) DO UPDATE SET
+                last_submission = excluded.last_submission,
+                mood = excluded.mood,
+                stress_level = excluded.stress_level,
+                work_hours = excluded.work_hours,
+                weekend_overtime = excluded.weekend_overtime,
+                exercise_hours = excluded.exercise_hours,
+                sleep_hours = excluded.sleep_hours
+            WHERE daily_stress_submissions.last_submission IS NULL
+               OR excluded.last_submission >= daily_stress_submissions.last_submission;
+        END
+    ''')
+
+def _migration_006_calendar_events_cache(cursor):
+    """Adds the per-user Google Calendar events cache and its sync state."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS calendar_events (
+            user_id INTEGER NOT NULL,
+            event_id TEXT NOT NULL,
+            summary TEXT,
+            start TEXT,
+            end TEXT,
+            start_utc TEXT,
+            end_utc TEXT,
+            PRIMARY KEY (user_id, event_id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_calendar_events_user_start
+        ON calendar_events (user_id, start_utc)
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS calendar_sync_state (
+            user_id INTEGER PRIMARY KEY,
+            sync_token TEXT,
+            window_end TEXT,
+            synced_at REAL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+def _migration_007_fitbit_sync(cursor):
+    """Adds per-user, per-resource Fitbit sync high-water marks and the synced daily summaries."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS fitbit_sync_state (
+            user_id INTEGER NOT NULL,
+            resource TEXT NOT NULL,
+            last_synced_day DATE,
+            synced_at TIMESTAMP,
+            PRIMARY KEY (user_id, resource),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS fitbit_daily_summaries (
+            user_id INTEGER NOT NULL,
+            resource TEXT NOT NULL,
+            day DATE NOT NULL,
+            summary TEXT,
+            PRIMARY KEY (user_id, resource, day),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        ) WITHOUT ROWID
+    ''')
+
+def _migration_008_fitbit_daily_features(cursor):
+    """Adds the per-user, per-day Fitbit feature table read by scoring."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS fitbit_daily_features (
+            user_id INTEGER NOT NULL,
+            day DATE NOT NULL,
+            steps INTEGER,
+            minutes_asleep INTEGER,
+            resting_hr REAL,
+            hr_variability REAL,
+            computed_at TIMESTAMP,
+            PRIMARY KEY (user_id, day),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        ) WITHOUT ROWID
+    ''')
+    # New data for a day invalidates its features until they are recomputed
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS fitbit_daily_features_invalidate
+        AFTER INSERT ON fitbit_daily_summaries
+        BEGIN
+            DELETE FROM fitbit_daily_features WHERE user_id = NEW.user_id AND day = NEW.day;
+        END
+    ''')
+
+def _migration_009_profile_scores(cursor):
+    """Adds the stored profile part of the burnout score, valid until the user's next birthday."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_profile_scores (
+            user_id INTEGER PRIMARY KEY,
+            profile_score REAL NOT NULL,
+            age INTEGER NOT NULL,
+            valid_until DATE NOT NULL,
+            computed_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    # Profile edits that do not go through store_profile_score drop the stale score
+    for event in ('UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS user_profile_scores_after_{event.lower()}
+            AFTER {event} ON user_profile
+            BEGIN
+                DELETE FROM user_profile_scores WHERE user_id = OLD.user_id;
+            END
+        ''')
+
+# Start of the rollup period a burnout_history day falls in, per granularity
+ROLLUP_PERIODS = {
+    'week': "DATE({day}, 'weekday 0', '-6 days')",  # weeks start on Monday
+    'month': "DATE({day}, 'start of month')",
+}
+
+def _migration_010_monthly_rollup(cursor):
+    """Adds monthly averages to burnout_rollup, so long history windows read one row per month."""
+    cursor.execute(f'''
+        INSERT OR IGNORE INTO burnout_rollup (user_id, granularity, period_start, risk_sum, day_count)
+        SELECT user_id, 'month', {ROLLUP_PERIODS['month'].format(day='day')}, SUM(risk_percentage), COUNT(*)
+        FROM burnout_history
+        GROUP BY user_id, {ROLLUP_PERIODS['month'].format(day='day')}
+    ''')
+
+    # Replace the weekly-only triggers with ones that maintain every granularity
+    for trigger in ('after_insert', 'after_update', 'after_delete'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS burnout_rollup_{trigger}')
+    insert = update = delete = ''
+    for granularity, period in ROLLUP_PERIODS.items():
+        insert += f'''
+            INSERT INTO burnout_rollup (user_id, granularity, period_start, risk_sum, day_count)
+            VALUES (NEW.user_id, '{granularity}', {period.format(day='NEW.day')}, NEW.risk_percentage, 1)
+            ON CONFLICT (user_id, granularity, period_start) DO UPDATE SET
+                risk_sum = risk_sum + excluded.risk_sum,
+                day_count = day_count + 1;'''
+        update += f'''
+            UPDATE burnout_rollup
+            SET risk_sum = risk_sum - OLD.risk_percentage + NEW.risk_percentage
+            WHERE user_id = NEW.user_id AND granularity = '{granularity}'
+              AND period_start = {period.format(day='NEW.day')};'''
+        delete += f'''
+            UPDATE burnout_rollup
+            SET risk_sum = risk_sum - OLD.risk_percentage, day_count = day_count - 1
+            WHERE user_id = OLD.user_id AND granularity = '{granularity}'
+              AND period_start = {period.format(day='OLD.day')};'''
+    cursor.execute(f'CREATE TRIGGER burnout_rollup_after_insert AFTER INSERT ON burnout_history BEGIN {insert} END')
+    cursor.execute(f'''
+        CREATE TRIGGER burnout_rollup_after_update AFTER UPDATE OF risk_percentage ON burnout_history
+        BEGIN {update} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER burnout_rollup_after_delete AFTER DELETE ON burnout_history
+        BEGIN {delete}
+            DELETE FROM burnout_rollup WHERE day_count <= 0 AND user_id = OLD.user_id;
+        END
+    ''')
+
+def _migration_011_journal_listing(cursor):
+    """Adds stored previews and a covering index so journal pages are read without the entries' content."""
+    _add_missing_columns(cursor, 'journal_entries', [('preview', 'TEXT')])
+    # The first 200 characters, with an ellipsis when the entry is longer
+    preview = "CASE WHEN LENGTH({content}) > 200 THEN SUBSTR({content}, 1, 200) || '…' ELSE {content} END"
+    cursor.execute(f"UPDATE journal_entries SET preview = {preview.format(content='content')}")
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS journal_entries_preview_after_insert
+        AFTER INSERT ON journal_entries
+        BEGIN
+            UPDATE journal_entries SET preview = {preview.format(content='NEW.content')} WHERE id = NEW.id;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS journal_entries_preview_after_update
+        AFTER UPDATE OF content ON journal_entries
+        BEGIN
+            UPDATE journal_entries SET preview = {preview.format(content='NEW.content')} WHERE id = NEW.id;
+        END
+    ''')
+    # Keyset pages walk (date, id) newest first straight from the index
+    cursor.execute('DROP INDEX IF EXISTS idx_journal_entries_user_date')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_journal_entries_listing
+        ON journal_entries (user_id, date, id, title, preview)
+    ''')
+
+def _migration_012_journal_search(cursor):
+    """Adds an FTS5 index over journal titles and content, kept in sync with journal_entries by triggers."""
+    # External content index: journal_entries keeps the only copy of the text. The owner
+    # column holds one 'u<user_id>' token per entry, so a search is scoped to its user
+    # inside the index instead of filtering every user's matches afterwards.
+    cursor.execute('''
+        CREATE VIEW IF NOT EXISTS journal_search_source AS
+        SELECT id, title, content, 'u' || user_id AS owner FROM journal_entries
+    ''')
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS journal_search USING fts5(
+            title, content, owner,
+            content = 'journal_search_source', content_rowid = 'id',
+            tokenize = 'porter unicode61 remove_diacritics 2'
+        )
+    ''')
+    cursor.execute("INSERT INTO journal_search (journal_search) VALUES ('rebuild')")
+    insert = '''
+        INSERT INTO journal_search (rowid, title, content, owner)
+        VALUES (NEW.id, NEW.title, NEW.content, 'u' || NEW.user_id);'''
+    delete = '''
+        INSERT INTO journal_search (journal_search, rowid, title, content, owner)
+        VALUES ('delete', OLD.id, OLD.title, OLD.content, 'u' || OLD.user_id);'''
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS journal_search_after_insert AFTER INSERT ON journal_entries
+        BEGIN {insert} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS journal_search_after_update
+        AFTER UPDATE OF user_id, title, content ON journal_entries
+        BEGIN {delete} {insert} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS journal_search_after_delete AFTER DELETE ON journal_entries
+        BEGIN {delete} END
+    ''')
+
+# Emotions scored per journal entry by journal_analysis.py
+JOURNAL_EMOTIONS = ('joy', 'calm', 'sadness', 'anger', 'fear', 'stress')
+
+def _migration_013_journal_emotions(cursor):
+    """Adds per-entry emotion scores and keywords, and the bookkeeping of the offline journal analysis."""
+    emotion_columns = ''.join(f'{emotion} REAL NOT NULL, ' for emotion in JOURNAL_EMOTIONS)
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS journal_emotions (
+            entry_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            date DATE,
+            word_count INTEGER NOT NULL,
+            {emotion_columns}
+            keywords TEXT,
+            analysed_at TIMESTAMP,
+            FOREIGN KEY (entry_id) REFERENCES journal_entries (id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_journal_emotions_user_date ON journal_emotions (user_id, date)')
+    # Single row: new entries are analysed in id order after last_entry_id
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS journal_analysis_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_entry_id INTEGER NOT NULL,
+            entries_analysed INTEGER NOT NULL,
+            updated_at TIMESTAMP
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO journal_analysis_state VALUES (1, 0, 0, NULL)')
+    # Edited entries are queued to be analysed again (version counts the edits, so one made
+    # while an earlier version is being analysed stays queued); deleted ones lose their scores
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS journal_analysis_queue (
+            entry_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS journal_analysis_after_update
+        AFTER UPDATE OF user_id, title, date, content ON journal_entries
+        BEGIN
+            INSERT INTO journal_analysis_queue (entry_id, version) VALUES (NEW.id, 1)
+            ON CONFLICT (entry_id) DO UPDATE SET version = version + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS journal_analysis_after_delete
+        AFTER DELETE ON journal_entries
+        BEGIN
+            DELETE FROM journal_emotions WHERE entry_id = OLD.id;
+            DELETE FROM journal_analysis_queue WHERE entry_id = OLD.id;
+        END
+    ''')
+
+MIGRATIONS = [
+    _migration_001_initial_schema,
+    _migration_002_per_user_indexes,
+    _migration_003_daily_burnout_and_rollup,
+    _migration_004_rescoring_checkpoints,
+    _migration_005_survey_history,
+    _migration_006_calendar_events_cache,
+    _migration_007_fitbit_sync,
+    _migration_008_fitbit_daily_features,
+    _migration_009_profile_scores,
+    _migration_010_monthly_rollup,
+    _migration_011_journal_listing,
+    _migration_012_journal_search,
+    _migration_013_journal_emotions,
+]
+
+def get_schema_version():
+    """Returns the schema version stored in the database."""
+    with unit_of_work() as conn:
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate_database(target_version=None):
+    """Applies the pending schema migrations and returns the resulting schema version.
+
+    target_version stops at an earlier version (used by benchmarks to build the
+    pre-optimization schema); by default every migration is applied.
+    """
+    if target_version is None:
+        target_version = len(MIGRATIONS)
+    if get_schema_version() >= target_version:
+        return target_version
 
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    # Take the write lock first so concurrent processes apply each step only once
+    with unit_of_work(immediate=True) as conn:
+        cursor = conn.cursor()
+        version = cursor.execute('PRAGMA user_version').fetchone()[0]
+        for number in range(version, target_version):
+            MIGRATIONS[number](cursor)
+            cursor.execute(f'PRAGMA user_version = {number + 1}')
+    return target_version
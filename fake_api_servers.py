@@ -0,0 +1,347 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+# -------------------- Local API Stubs --------------------
+# Small in-memory stand-ins for the external APIs the app talks to. benchmarks.py runs
+# them on localhost so API-heavy code paths can be measured without network access.
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Routes requests to the owning stub server and serializes its JSON replies."""
+
+    def _dispatch(self, method):
+        stub = self.server.stub
+        stub.request_count += 1
+        if stub.latency:
+            time.sleep(stub.latency)
+        parsed = urlparse(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if not raw:
+            body = None
+        elif self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+            body = {key: values[0] for key, values in parse_qs(raw.decode()).items()}
+        else:
+            body = json.loads(raw)
+        status, payload, *extra_headers = stub.handle(method, parsed.path, parse_qs(parsed.query), body, self.headers)
+        data = json.dumps(payload).encode() if payload is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (extra_headers[0] if extra_headers else {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output readable
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # the default backlog of 5 stalls concurrent benchmark clients
+
+class StubServer:
+    """Serves a stub API on a background thread; use as a context manager."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.request_count = 0
+        self._httpd = _StubHTTPServer(('127.0.0.1', 0), _StubHandler)
+        self._httpd.stub = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address
+        return f'http://{host}:{port}/'
+
+    def handle(self, method, path, query, body, headers):
+        """Returns (status, payload) or (status, payload, headers) for one request; implemented by each stub."""
+        raise NotImplementedError
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+# -------------------- Google Calendar Stub --------------------
+
+def _parse_time(value):
+    """Parses an RFC 3339 timestamp as sent by the Calendar API client."""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+class FakeCalendarServer(StubServer):
+    """In-memory Calendar API: list (with paging and syncToken incremental sync), insert and delete."""
+
+    # The client drops the /calendar/v3 prefix when api_endpoint points at this server
+    EVENTS_PATH = re.compile(r'^(?:/calendar/v3)?/calendars/([^/]+)/events(?:/([^/]+))?$')
+    PAGE_SIZE = 250
+
+    def __init__(self, events=(), latency=0.0):
+        super().__init__(latency)
+        self.events = {}
+        self._sequence = 0       # bumped on every change
+        self._changed_at = {}    # event id -> sequence of its last change
+        self._cancelled = set()  # deleted ids, reported to incremental syncs
+        self._oldest_sync = 0    # sync tokens older than this answer 410 Gone
+        for event in events:
+            self.add_event(event)
+
+    def _touch(self, event_id):
+        self._sequence += 1
+        self._changed_at[event_id] = self._sequence
+
+    def add_event(self, event):
+        """Stores an event (assigning an id when missing) and returns it."""
+        with self._lock:
+            event = dict(event, id=event.get('id') or uuid.uuid4().hex, status='confirmed')
+            self.events[event['id']] = event
+            self._cancelled.discard(event['id'])
+            self._touch(event['id'])
+            return event
+
+    def update_event(self, event_id, **changes):
+        """Changes fields of a stored event, as an edit made in another client would."""
+        with self._lock:
+            self.events[event_id].update(changes)
+            self._touch(event_id)
+
+    def remove_event(self, event_id):
+        """Deletes an event; returns False if it did not exist."""
+        with self._lock:
+            if self.events.pop(event_id, None) is None:
+                return False
+            self._cancelled.add(event_id)
+            self._touch(event_id)
+            return True
+
+    def expire_sync_tokens(self):
+        """Invalidates every sync token handed out so far, like Google does from time to time."""
+        with self._lock:
+            self._sequence += 1
+            self._oldest_sync = self._sequence
+
+    def handle(self, method, path, query, body, headers):
+        match = self.EVENTS_PATH.match(path)
+        if not match:
+            return 404, {'error': {'code': 404, 'message': 'Not Found'}}
+        event_id = match.group(2)
+        if method == 'POST' and not event_id:
+            return 200, self.add_event(body)
+        if method == 'DELETE' and event_id:
+            if self.remove_event(event_id):
+                return 204, None
+            return 410, {'error': {'code': 410, 'message': 'Resource has been deleted'}}
+        if method == 'GET' and not event_id:
+            return self._list(query)
+        return 405, {'error': {'code': 405, 'message': 'Method Not Allowed'}}
+
+    def _changes_since(self, sync_token):
+        """Returns events changed after the token, with deleted ones as cancelled stubs, or None if it expired."""
+        try:
+            since = int(sync_token.rsplit('-', 1)[1])
+        except (IndexError, ValueError):
+            return None
+        if since < self._oldest_sync:
+            return None
+        changed = [event_id for event_id, sequence in self._changed_at.items() if sequence > since]
+        return [self.events[event_id] if event_id not in self._cancelled else {'id': event_id, 'status': 'cancelled'}
+                for event_id in changed]
+
+    def _in_window(self, query):
+        """Returns the live events that overlap the timeMin/timeMax window."""
+        time_min = _parse_time(query['timeMin'][0]) if 'timeMin' in query else None
+        time_max = _parse_time(query['timeMax'][0]) if 'timeMax' in query else None
+        items = []
+        for event in self.events.values():
+            start = _parse_time(event['start'].get('dateTime') or event['start']['date'])
+            end = _parse_time(event['end'].get('dateTime') or event['end']['date'])
+            if start.tzinfo is None:
+                zone = (time_min or time_max).tzinfo if (time_min or time_max) else None
+                start, end = start.replace(tzinfo=zone), end.replace(tzinfo=zone)
+            if (time_min and end <= time_min) or (time_max and start >= time_max):
+                continue
+            items.append(event)
+        items.sort(key=lambda event: event['start'].get('dateTime') or event['start']['date'])
+        return items
+
+    def _list(self, query):
+        with self._lock:
+            if 'syncToken' in query:
+                if {'timeMin', 'timeMax', 'orderBy'} & set(query):
+                    return 400, {'error': {'code': 400, 'message': 'syncToken cannot be combined with these filters'}}
+                items = self._changes_since(query['syncToken'][0])
+                if items is None:
+                    return 410, {'error': {'code': 410, 'message': 'Sync token is no longer valid'}}
+            else:
+                items = self._in_window(query)
+            sync_token = f'sync-{self._sequence}'
+
+        offset = int(query['pageToken'][0]) if 'pageToken' in query else 0
+        page_size = int(query['maxResults'][0]) if 'maxResults' in query else self.PAGE_SIZE
+        page = {'kind': 'calendar#events', 'items': items[offset:offset + page_size]}
+        if offset + page_size < len(items):
+            page['nextPageToken'] = str(offset + page_size)
+        else:
+            page['nextSyncToken'] = sync_token
+        return 200, page
+
+# -------------------- Fitbit Stub --------------------
+
+class FakeFitbitServer(StubServer):
+    """Fitbit Web API stand-in: token refresh, intraday heart rate, sleep and activity summaries.
+
+    Every user gets deterministic synthetic data for each day from first_day up to
+    today, so repeated syncs see the same values. Access tokens expire like real ones
+    (401 expired_token), refresh tokens are single-use, and each user is limited to
+    rate_limit requests per hour (429 with Retry-After). A share error_rate of data
+    requests fails with 503 to exercise retries. The python-fitbit client
+    only talks plain HTTP to it with OAUTHLIB_INSECURE_TRANSPORT=1.
+    """
+
+    HEART_PATH = re.compile(r'^/1/user/-/activities/heart/date/(\d{4}-\d{2}-\d{2})/1d/1min\.json$')
+    # python-fitbit's get_sleep does not zero-pad the month and day
+    SLEEP_PATH = re.compile(r'^/1(?:\.2)?/user/-/sleep/date/(\d{4}-\d{1,2}-\d{1,2})\.json$')
+    ACTIVITY_PATH = re.compile(r'^/1/user/-/activities/date/(\d{4}-\d{2}-\d{2})\.json$')
+
+    def __init__(self, first_day=None, rate_limit=150, token_lifetime=8 * 60 * 60, error_rate=0.0, latency=0.0):
+        super().__init__(latency)
+        self.error_rate = error_rate
+        self._random = random.Random(0)
+        self.first_day = first_day or date.today() - timedelta(days=30)
+        self.rate_limit = rate_limit
+        self.token_lifetime = token_lifetime
+        self._access_tokens = {}   # access token -> (user key, expires at)
+        self._refresh_tokens = {}  # refresh token -> user key
+        self._windows = {}         # user key -> (hour window start, requests in it)
+        self.requests_by_user = {}
+        self.refresh_count = 0
+
+    def add_user(self, user_key, expires_in=None):
+        """Registers a user and returns a fresh token dict for them (as the OAuth flow would)."""
+        with self._lock:
+            return self._issue_tokens(user_key, expires_in)
+
+    def expire_access_token(self, access_token):
+        """Makes the server reject an access token as expired, whatever expiry the client holds."""
+        with self._lock:
+            user_key, _ = self._access_tokens[access_token]
+            self._access_tokens[access_token] = (user_key, 0)
+
+    def _issue_tokens(self, user_key, expires_in=None):
+        access_token, refresh_token = uuid.uuid4().hex, uuid.uuid4().hex
+        expires_in = self.token_lifetime if expires_in is None else expires_in
+        self._access_tokens[access_token] = (user_key, time.time() + expires_in)
+        self._refresh_tokens[refresh_token] = user_key
+        return {'access_token': access_token, 'refresh_token': refresh_token, 'expires_in': expires_in,
+                'token_type': 'Bearer', 'user_id': str(user_key)}
+
+    def handle(self, method, path, query, body, headers):
+        if method == 'POST' and path == '/oauth2/token':
+            return self._refresh(body or {})
+        with self._lock:
+            authorization = headers.get('Authorization', '')
+            user_key, expires_at = self._access_tokens.get(authorization.replace('Bearer ', ''), (None, 0))
+            if user_key is None:
+                return 401, {'errors': [{'errorType': 'invalid_token', 'message': 'Access token invalid'}]}
+            if expires_at <= time.time():
+                return 401, {'errors': [{'errorType': 'expired_token', 'message': 'Access token expired'}]}
+            retry_after = self._count_request(user_key)
+            failed = self._random.random() < self.error_rate
+        if failed:
+            return 503, {'errors': [{'errorType': 'system', 'message': 'Service Unavailable'}]}
+        if retry_after:
+            return 429, {'errors': [{'errorType': 'system', 'message': 'Too Many Requests'}]}, {'Retry-After': retry_after}
+
+        for pattern, build in ((self.HEART_PATH, self._heart), (self.SLEEP_PATH, self._sleep),
+                               (self.ACTIVITY_PATH, self._activity)):
+            match = pattern.match(path)
+            if match and method == 'GET':
+                return 200, build(user_key, datetime.strptime(match.group(1), '%Y-%m-%d').date())
+        return 404, {'errors': [{'errorType': 'not_found', 'message': 'Not Found'}]}
+
+    def _refresh(self, body):
+        with self._lock:
+            user_key = self._refresh_tokens.pop(body.get('refresh_token'), None)
+            if user_key is None:
+                return 400, {'errors': [{'errorType': 'invalid_grant', 'message': 'Refresh token invalid'}]}
+            self.refresh_count += 1
+            return 200, self._issue_tokens(user_key)
+
+    def _count_request(self, user_key):
+        """Counts a request against the user's hourly quota; returns seconds to wait if it is used up."""
+        now = time.time()
+        window_start, count = self._windows.get(user_key, (now, 0))
+        if now - window_start >= 3600:
+            window_start, count = now, 0
+        self.requests_by_user[user_key] = self.requests_by_user.get(user_key, 0) + 1
+        if count >= self.rate_limit:
+            return int(window_start + 3600 - now) + 1
+        self._windows[user_key] = (window_start, count + 1)
+        return 0
+
+    def _rng(self, user_key, day, resource):
+        seed = hashlib.sha1(f'{user_key}/{day}/{resource}'.encode()).digest()[:8]
+        return np.random.default_rng(int.from_bytes(seed, 'little'))
+
+    def _has_data(self, day):
+        return self.first_day <= day <= date.today()
+
+    def _heart(self, user_key, day):
+        dataset, resting = [], None
+        if self._has_data(day):
+            rng = self._rng(user_key, day, 'heart')
+            resting = int(rng.integers(52, 75))
+            minutes = np.flatnonzero(rng.random(24 * 60) < 0.95)
+            if day == date.today():
+                now = datetime.now()
+                minutes = minutes[minutes <= now.hour * 60 + now.minute]
+            values = np.clip(resting + rng.gamma(2.0, 8.0, len(minutes)), 35, 200).astype(int)
+            dataset = [{'time': f'{minute // 60:02d}:{minute % 60:02d}:00', 'value': int(value)}
+                       for minute, value in zip(minutes, values)]
+        summary = {'dateTime': day.isoformat(), 'value': {'heartRateZones': []}}
+        if resting is not None:
+            summary['value']['restingHeartRate'] = resting
+        return {'activities-heart': [summary],
+                'activities-heart-intraday': {'dataset': dataset, 'datasetInterval': 1, 'datasetType': 'minute'}}
+
+    def _sleep(self, user_key, day):
+        if not self._has_data(day):
+            return {'sleep': [], 'summary': {'totalMinutesAsleep': 0, 'totalSleepRecords': 0, 'totalTimeInBed': 0}}
+        rng = self._rng(user_key, day, 'sleep')
+        asleep = int(rng.normal(410, 60))
+        in_bed = asleep + int(rng.integers(10, 60))
+        record = {'dateOfSleep': day.isoformat(), 'isMainSleep': True, 'minutesAsleep': asleep,
+                  'timeInBed': in_bed, 'efficiency': round(100 * asleep / in_bed)}
+        return {'sleep': [record],
+                'summary': {'totalMinutesAsleep': asleep, 'totalSleepRecords': 1, 'totalTimeInBed': in_bed}}
+
+    def _activity(self, user_key, day):
+        summary = {'steps': 0, 'sedentaryMinutes': 1440, 'veryActiveMinutes': 0, 'caloriesOut': 0}
+        if self._has_data(day):
+            rng = self._rng(user_key, day, 'activity')
+            summary = {'steps': int(rng.gamma(4.0, 2000.0)), 'sedentaryMinutes': int(rng.integers(500, 900)),
+                       'veryActiveMinutes': int(rng.integers(0, 60)), 'caloriesOut': int(rng.normal(2300, 300))}
+        return {'activities': [], 'goals': {'steps': 10000}, 'summary': summary}
@@ -3,10 +3,14 @@ os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
 
 import fitbit
 import datetime
+import sqlite3
+import tempfile
+from contextlib import closing
 import pandas as pd
 from requests_oauthlib import OAuth2Session
 import webbrowser
 import requests
+from burnout_model_functions import predict_burnout_risk_batch
 
 class FitbitDataRetriever:
     def __init__(self, client_id, client_secret):
@@ -84,7 +88,145 @@ class FitbitDataRetriever:
             print(f"Error retrieving sleep data: {e}")
             return None
 
-def main():
+# --- INGEST OF FITBIT EXPORT FILES ---
+# Streams the daily activity, sleep and weight CSVs of a Fitbit export in chunks through
+# an on-disk SQLite staging database, joins them on (Id, day) there and writes one row
+# per user and day to SQLite or Parquet. Memory stays bounded by the chunk size no
+# matter how large the export is.
+
+FITBIT_EXPORT_DIR = os.environ.get('FITBIT_EXPORT_DIR', 'fitbit')
+CHUNK_ROWS = 100_000
+
+EXPORT_FILES = {
+    'activity': {
+        'file': 'dailyActivity_merged1.csv',
+        'date_column': 'ActivityDate',
+        'date_format': '%m/%d/%Y',
+        'dtypes': {'Id': 'int64', 'ActivityDate': 'str', 'TotalSteps': 'int32', 'TotalDistance': 'float32', 'Calories': 'int32'},
+    },
+    'sleep': {
+        'file': 'sleepDay_merged.csv',
+        'date_column': 'SleepDay',
+        'date_format': '%m/%d/%Y %I:%M:%S %p',
+        'dtypes': {'Id': 'int64', 'SleepDay': 'str', 'TotalMinutesAsleep': 'int32', 'TotalTimeInBed': 'int32'},
+    },
+    'weight': {
+        'file': 'weightLogInfo_merged.csv',
+        'date_column': 'Date',
+        'date_format': '%m/%d/%Y %I:%M:%S %p',
+        'dtypes': {'Id': 'int64', 'Date': 'str', 'WeightKg': 'float32'},
+    },
+}
+
+FEATURE_COLUMNS = ['Id', 'day', 'TotalSteps', 'TotalDistance', 'Calories', 'TotalMinutesAsleep', 'TotalTimeInBed', 'WeightKg']
+
+# Sleep can be logged twice for a day and weight many times, so both are reduced to one row per (Id, day)
+DAILY_FEATURES_QUERY = '''
+    SELECT a.Id, a.day, a.TotalSteps, a.TotalDistance, a.Calories,
+           s.TotalMinutesAsleep, s.TotalTimeInBed, w.WeightKg
+    FROM activity a
+    LEFT JOIN (
+        SELECT Id, day, MAX(TotalMinutesAsleep) AS TotalMinutesAsleep, MAX(TotalTimeInBed) AS TotalTimeInBed
+        FROM sleep GROUP BY Id, day
+    ) s ON s.Id = a.Id AND s.day = a.day
+    LEFT JOIN (
+        SELECT Id, day, AVG(WeightKg) AS WeightKg FROM weight GROUP BY Id, day
+    ) w ON w.Id = a.Id AND w.day = a.day
+    ORDER BY a.Id, a.day
+'''
+
+def _stage_export_file(conn, name, path, chunk_rows):
+    """Copies one export CSV into a staging table chunk by chunk, with the date reduced to an ISO day."""
+    spec = EXPORT_FILES[name]
+    values = [column for column in spec['dtypes'] if column not in ('Id', spec['date_column'])]
+    conn.execute(f"CREATE TABLE {name} (Id INTEGER, day TEXT, {', '.join(values)})")
+    insert = f"INSERT INTO {name} VALUES ({', '.join('?' * (len(values) + 2))})"
+    rows = 0
+    for chunk in pd.read_csv(path, usecols=list(spec['dtypes']), dtype=spec['dtypes'], chunksize=chunk_rows):
+        # An export holds few distinct dates, so parse each one once
+        codes, dates = pd.factorize(chunk[spec['date_column']])
+        days = pd.to_datetime(dates, format=spec['date_format']).strftime('%Y-%m-%d').to_numpy()[codes]
+        columns = [chunk['Id'].tolist(), days.tolist()] + [chunk[column].tolist() for column in values]
+        conn.executemany(insert, zip(*columns))
+        rows += len(chunk)
+    conn.execute(f"CREATE INDEX idx_{name}_id_day ON {name} (Id, day)")
+    return rows
+
+def _write_sqlite(staging, output_path):
+    """Writes the joined features into the fitbit_export_daily table of an SQLite database."""
+    staging.execute('ATTACH DATABASE ? AS output', (output_path,))
+    staging.execute('''
+        CREATE TABLE IF NOT EXISTS output.fitbit_export_daily (
+            Id INTEGER, day DATE, TotalSteps INTEGER, TotalDistance REAL, Calories INTEGER,
+            TotalMinutesAsleep INTEGER, TotalTimeInBed INTEGER, WeightKg REAL,
+            PRIMARY KEY (Id, day)
+        )
+    ''')
+    staging.execute('BEGIN')
+    written = staging.execute(f'INSERT OR REPLACE INTO output.fitbit_export_daily {DAILY_FEATURES_QUERY}').rowcount
+    staging.execute('COMMIT')
+    staging.execute('DETACH DATABASE output')
+    return written
+
+def _write_parquet(staging, output_path, chunk_rows):
+    """Writes the joined features to a Parquet file one row group per chunk (needs pyarrow)."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Writing Parquet needs pyarrow: pip install pyarrow") from e
+
+    schema = pa.schema([('Id', pa.int64()), ('day', pa.string()), ('TotalSteps', pa.int32()),
+                        ('TotalDistance', pa.float32()), ('Calories', pa.int32()),
+                        ('TotalMinutesAsleep', pa.int32()), ('TotalTimeInBed', pa.int32()), ('WeightKg', pa.float32())])
+    cursor = staging.execute(DAILY_FEATURES_QUERY)
+    written = 0
+    with pq.ParquetWriter(output_path, schema) as writer:
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                return written
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=schema.field(i).type) for i, column in enumerate(columns)], schema=schema))
+            written += len(rows)
+
+def ingest_fitbit_export(export_dir=None, output_path='fitbit_export.db', chunk_rows=CHUNK_ROWS):
+    """Joins a Fitbit export's daily activity, sleep and weight files on (Id, day) and writes the result.
+
+    output_path ending in .parquet writes Parquet, anything else an SQLite database.
+    Returns the number of user-days written.
+    """
+    export_dir = export_dir or FITBIT_EXPORT_DIR
+    with tempfile.TemporaryDirectory(prefix='fitbit_ingest_') as workdir:
+        staging = sqlite3.connect(os.path.join(workdir, 'staging.db'), isolation_level=None)
+        try:
+            # Staging data is disposable: skip the journal and keep the page cache small
+            staging.execute('PRAGMA journal_mode=OFF')
+            staging.execute('PRAGMA synchronous=OFF')
+            staging.execute('PRAGMA cache_size=-16000')
+            staging.execute('BEGIN')
+            for name, spec in EXPORT_FILES.items():
+                _stage_export_file(staging, name, os.path.join(export_dir, spec['file']), chunk_rows)
+            staging.execute('COMMIT')
+            if output_path.endswith('.parquet'):
+                return _write_parquet(staging, output_path, chunk_rows)
+            return _write_sqlite(staging, output_path)
+        finally:
+            staging.close()
+
+def load_export_features(output_path='fitbit_export.db', limit=None):
+    """Reads ingested export features back as a DataFrame (from SQLite or Parquet)."""
+    if output_path.endswith('.parquet'):
+        df = pd.read_parquet(output_path)
+        return df.head(limit) if limit else df
+    with closing(sqlite3.connect(output_path)) as conn:
+        query = 'SELECT * FROM fitbit_export_daily ORDER BY Id, day'
+        return pd.read_sql_query(query + (f' LIMIT {int(limit)}' if limit else ''), conn)
+
+EXPORT_REFERENCE_AGE = 35  # exports carry no profile, so demo scores assume this age
+
+def main(export_dir=None, output_path='fitbit_export.db'):
     CLIENT_ID = 'add your client id here'
     CLIENT_SECRET = 'add your client secret here'
 
@@ -108,27 +250,25 @@ def main():
     # --- SIMULATED DATA FROM FITBIT FILES ---
     print("\n--- Using simulated Fitbit data ---")
 
-    activity = pd.read_csv("/Users/carlotatejeda/Desktop/MSc/Term 2/Prototyping/Final project/fitbit/dailyActivity_merged1.csv")
-    sleep = pd.read_csv("/Users/carlotatejeda/Desktop/MSc/Term 2/Prototyping/Final project/fitbit/sleepDay_merged.csv")
-    weight = pd.read_csv("/Users/carlotatejeda/Desktop/MSc/Term 2/Prototyping/Final project/fitbit/weightLogInfo_merged.csv")
-
-    activity['ActivityDate'] = pd.to_datetime(activity['ActivityDate'])
-    sleep['SleepDay'] = pd.to_datetime(sleep['SleepDay'])
-    weight['Date'] = pd.to_datetime(weight['Date'])
-
-    df = pd.merge(activity, sleep, left_on='ActivityDate', right_on='SleepDay', how='left')
-    df = pd.merge(df, weight, left_on='ActivityDate', right_on='Date', how='left')
+    rows = ingest_fitbit_export(export_dir, output_path)
+    print(f"Ingested {rows:,} user-days into {output_path}")
 
-    df = df[['ActivityDate', 'TotalSteps', 'TotalDistance', 'Calories', 'TotalMinutesAsleep', 'WeightKg']]
+    df = load_export_features(output_path, limit=1000)
+    df = df.rename(columns={'day': 'ActivityDate'})
+    df = df[['Id', 'ActivityDate', 'TotalSteps', 'TotalDistance', 'Calories', 'TotalMinutesAsleep', 'WeightKg']]
     df = df.dropna(subset=['TotalSteps', 'TotalMinutesAsleep'])
 
-    df['burnout_risk'] = (df['TotalSteps'] < 4000) & (df['TotalMinutesAsleep'] < 300)
+    # Same model as the app: steps and sleep come from the export, the answers it has no
+    # data for use the model defaults and a reference age
+    df['burnout_risk'], _ = predict_burnout_risk_batch({
+        'age': [EXPORT_REFERENCE_AGE] * len(df), 'gender': [''] * len(df),
+        'sleep_hours': df['TotalMinutesAsleep'] / 60, 'daily_steps': df['TotalSteps']})
 
     print("\n--- Simulated Fitbit Data ---")
     print(df.head())
 
     print("\n--- Burnout Prediction ---")
-    print(df[['ActivityDate', 'TotalSteps', 'TotalMinutesAsleep', 'burnout_risk']].head())
+    print(df[['Id', 'ActivityDate', 'TotalSteps', 'TotalMinutesAsleep', 'burnout_risk']].head())
 
 if __name__ == "__main__":
     main()
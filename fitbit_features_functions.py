@@ -0,0 +1,107 @@
+import json
+from datetime import date, timedelta
+import numpy as np
+from database_functions import unit_of_work
+from fitbit_store_functions import MISSING, get_intraday_store
+
+# -------------------- Fitbit Daily Features --------------------
+# Turns the synced Fitbit data (fitbit_daily_summaries and the intraday heart rate store)
+# into one row of model features per user and day in fitbit_daily_features. Rows are
+# recomputed by the sync job whenever it stores new data for a day, and a trigger on
+# fitbit_daily_summaries drops the row of any day rewritten without recomputing it, so a
+# stored row never describes older data than the summaries it came from. Scoring only
+# reads this table; it never calls the Fitbit API.
+
+FEATURE_COLUMNS = ['steps', 'minutes_asleep', 'resting_hr', 'hr_variability']
+NIGHT_MINUTES = 6 * 60        # 00:00-06:00, where heart rate variability is least disturbed by activity
+RESTING_PERCENTILE = 5        # fallback resting heart rate when Fitbit did not report one
+MIN_HEART_READINGS = 60       # minutes of readings needed for intraday heart rate features
+
+def heart_rate_features(blocks):
+    """Returns (resting_hr, hr_variability) arrays for a (days, 1440) int16 block array.
+
+    resting_hr is a low percentile of the day's readings and hr_variability the RMS of
+    successive minute-to-minute differences during the night (a coarse RMSSD proxy, since
+    Fitbit's intraday series has one reading per minute rather than beat-to-beat intervals).
+    Days with too few readings get NaN.
+    """
+    values = np.where(blocks == MISSING, np.nan, blocks.astype(np.float64))
+    readings = np.count_nonzero(~np.isnan(values), axis=1)
+    resting_hr = np.full(len(values), np.nan)
+    hr_variability = np.full(len(values), np.nan)
+    enough = readings >= MIN_HEART_READINGS
+    if enough.any():
+        resting_hr[enough] = np.nanpercentile(values[enough], RESTING_PERCENTILE, axis=1)
+        steps = np.diff(values[enough, :NIGHT_MINUTES], axis=1)
+        valid = np.count_nonzero(~np.isnan(steps), axis=1)
+        squares = np.nansum(steps ** 2, axis=1)
+        hr_variability[enough] = np.where(valid >= MIN_HEART_READINGS, np.sqrt(squares / np.maximum(valid, 1)), np.nan)
+    return resting_hr, hr_variability
+
+def _number(value):
+    """Converts NaN to None so missing features are stored as NULL."""
+    return None if value is None or np.isnan(value) else float(value)
+
+def compute_daily_features(user_id, start, end):
+    """Returns {day: (steps, minutes_asleep, resting_hr, hr_variability)} for the synced days in [start, end]."""
+    with unit_of_work() as conn:
+        rows = conn.execute('''
+            SELECT resource, day, summary FROM fitbit_daily_summaries
+            WHERE user_id = ? AND day BETWEEN ? AND ?
+        ''', (user_id, start.isoformat(), end.isoformat())).fetchall()
+    summaries = {}
+    for resource, day, summary in rows:
+        summaries.setdefault(date.fromisoformat(day), {})[resource] = json.loads(summary) if summary else {}
+
+    days, blocks = get_intraday_store('heart').read_blocks(user_id, start, end)
+    resting_hr, hr_variability = heart_rate_features(blocks)
+    intraday = {day: (resting, variability)
+                for day, resting, variability in zip(days.tolist(), resting_hr, hr_variability)}
+
+    features = {}
+    for day, resources in summaries.items():
+        activity, sleep, heart = resources.get('activity'), resources.get('sleep'), resources.get('heart')
+        intraday_resting, variability = intraday.get(day, (np.nan, np.nan))
+        resting = heart.get('restingHeartRate') if heart else None
+        features[day] = (
+            activity.get('steps') if activity else None,
+            sleep.get('totalMinutesAsleep') if sleep else None,
+            float(resting) if resting is not None else _number(intraday_resting),
+            _number(variability),
+        )
+    return features
+
+def refresh_daily_features(user_id, days=None):
+    """Recomputes the user's feature rows for the given days and returns how many were stored.
+
+    Without days, only the days whose summaries have no feature row (never computed, or
+    invalidated by a later write) are recomputed.
+    """
+    with unit_of_work(immediate=True) as conn:
+        if days is None:
+            days = [date.fromisoformat(day) for (day,) in conn.execute('''
+                SELECT DISTINCT s.day FROM fitbit_daily_summaries s
+                WHERE s.user_id = ? AND NOT EXISTS (
+                    SELECT 1 FROM fitbit_daily_features f WHERE f.user_id = s.user_id AND f.day = s.day)
+            ''', (user_id,))]
+        days = sorted(set(days))
+        if not days:
+            return 0
+        features = compute_daily_features(user_id, days[0], days[-1])
+        wanted = set(days)
+        conn.executemany('''
+            INSERT OR REPLACE INTO fitbit_daily_features
+                (user_id, day, steps, minutes_asleep, resting_hr, hr_variability, computed_at)
+            VALUES (?, ?, ?, ?, ?, ?, DATETIME('now'))
+        ''', [(user_id, day.isoformat(), *values) for day, values in features.items() if day in wanted])
+    return len(wanted & features.keys())
+
+def get_daily_features(user_id, day=None):
+    """Returns the stored features of the user's day (yesterday by default) as a dict, or None."""
+    day = day or date.today() - timedelta(days=1)
+    with unit_of_work() as conn:
+        row = conn.execute('''
+            SELECT steps, minutes_asleep, resting_hr, hr_variability
+            FROM fitbit_daily_features WHERE user_id = ? AND day = ?
+        ''', (user_id, day.isoformat())).fetchone()
+    return dict(zip(FEATURE_COLUMNS, row)) if row else None
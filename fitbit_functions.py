@@ -1,5 +1,7 @@
-import sqlite3
+from database_functions import unit_of_work
 from datetime import datetime, timedelta, date
+import threading
+import time
 import streamlit as st
 import webbrowser
 import fitbit
@@ -11,23 +13,20 @@ import os
 
 def save_fitbit_tokens(email, access_token, refresh_token, expires_in):
     """Saves Fitbit tokens to the database."""
-    conn = sqlite3.connect('user_data.db')
-    cursor = conn.cursor()
-    expiry_time = datetime.now() + timedelta(seconds=expires_in)
-    cursor.execute('''
-        INSERT OR REPLACE INTO fitbit_tokens (email, access_token, refresh_token, token_expiry)
-        VALUES (?, ?, ?, ?)
-    ''', (email, access_token, refresh_token, expiry_time))
-    conn.commit()
-    conn.close()
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        expiry_time = datetime.now() + timedelta(seconds=expires_in)
+        cursor.execute('''
+            INSERT OR REPLACE INTO fitbit_tokens (email, access_token, refresh_token, token_expiry)
+            VALUES (?, ?, ?, ?)
+        ''', (email, access_token, refresh_token, expiry_time))
 
 def get_fitbit_tokens(email):
     """Retrieves Fitbit tokens for the given email."""
-    conn = sqlite3.connect('user_data.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT access_token, refresh_token, token_expiry FROM fitbit_tokens WHERE email = ?', (email,))
-    row = cursor.fetchone()
-    conn.close()
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT access_token, refresh_token, token_expiry FROM fitbit_tokens WHERE email = ?', (email,))
+        row = cursor.fetchone()
     if row:
         return {
             'access_token': row[0],
@@ -36,6 +35,121 @@ def get_fitbit_tokens(email):
         }
     return None
 
+# -------------------- Fitbit Client Registry --------------------
+# Point the clients at another server (e.g. a local stub) instead of api.fitbit.com
+FITBIT_API_ENDPOINT = os.environ.get('EXHALE_FITBIT_API_ENDPOINT')
+# Access tokens are refreshed this long before they expire
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+def _expires_at(token_expiry):
+    """Converts a stored token_expiry into the epoch seconds the Fitbit client expects."""
+    if token_expiry is None:
+        return None
+    if isinstance(token_expiry, str):
+        token_expiry = datetime.fromisoformat(token_expiry)
+    return token_expiry.timestamp()
+
+class FitbitClientRegistry:
+    """Keeps one fitbit.Fitbit client per user so HTTP sessions and tokens survive reruns.
+
+    Tokens are refreshed ahead of expiry and every rotation is written back to
+    fitbit_tokens. Fitbit refresh tokens are single-use, so refreshes for one user are
+    serialized and a refresh that another thread or process already did is adopted
+    instead of repeated.
+    """
+
+    def __init__(self, client_id, client_secret):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self._clients = {}        # email -> fitbit.Fitbit
+        self._locks = {}          # email -> lock guarding that user's client and its refreshes
+        self._lock = threading.Lock()
+
+    def _user_lock(self, email):
+        with self._lock:
+            return self._locks.setdefault(email, threading.RLock())
+
+    def _build_client(self, email, tokens):
+        client = fitbit.Fitbit(
+            self.client_id,
+            self.client_secret,
+            oauth2=True,
+            access_token=tokens['access_token'],
+            refresh_token=tokens['refresh_token'],
+            expires_at=_expires_at(tokens['token_expiry']),
+            refresh_cb=lambda token: self._persist_token(email, token)
+        )
+        session = client.client.session
+        if FITBIT_API_ENDPOINT:
+            client.API_ENDPOINT = FITBIT_API_ENDPOINT.rstrip('/')
+            client.client.refresh_token_url = f"{client.API_ENDPOINT}/oauth2/token"
+            session.auto_refresh_url = client.client.refresh_token_url
+        # Both the library's expiry check and its 401 retry end up in session.refresh_token
+        session.refresh_token = self._serialized_refresh(email, session, session.refresh_token)
+        return client
+
+    def _serialized_refresh(self, email, session, refresh):
+        """Wraps session.refresh_token so each user's refresh token is spent only once."""
+        def refresh_token(token_url, **kwargs):
+            seen = session.token.get('refresh_token')
+            with self._user_lock(email):
+                if session.token.get('refresh_token') != seen:
+                    return session.token  # another thread refreshed while this one waited
+                stored = get_fitbit_tokens(email)
+                if stored and stored['refresh_token'] != seen:
+                    # Another process already rotated the tokens; use its result
+                    session.token = {
+                        'access_token': stored['access_token'],
+                        'refresh_token': stored['refresh_token'],
+                        'token_type': 'Bearer',
+                        'expires_at': _expires_at(stored['token_expiry']),
+                    }
+                    return session.token
+                return refresh(token_url, **kwargs)
+        return refresh_token
+
+    def _persist_token(self, email, token):
+        """refresh_cb: stores a rotated token pair and its expiry in a single write."""
+        expires_in = token.get('expires_in')
+        if expires_in is None and token.get('expires_at'):
+            expires_in = token['expires_at'] - time.time()
+        save_fitbit_tokens(email, token['access_token'], token['refresh_token'], expires_in or 0)
+
+    def get_client(self, email):
+        """Returns the user's Fitbit client with a token valid for at least TOKEN_REFRESH_MARGIN, or None if not connected."""
+        with self._user_lock(email):
+            client = self._clients.get(email)
+            if client is None:
+                tokens = get_fitbit_tokens(email)
+                if not tokens:
+                    return None
+                client = self._clients[email] = self._build_client(email, tokens)
+            expires_at = client.client.session.token.get('expires_at')
+            if expires_at is not None and expires_at - TOKEN_REFRESH_MARGIN.total_seconds() <= time.time():
+                client.client.refresh_token()
+            return client
+
+    def forget(self, email):
+        """Drops the user's cached client, e.g. after they connect Fitbit again."""
+        with self._user_lock(email):
+            self._clients.pop(email, None)
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+def get_client_registry(client_id, client_secret):
+    """Returns the process-wide client registry for a Fitbit app."""
+    with _registries_lock:
+        registry = _registries.get(client_id)
+        if registry is None:
+            registry = _registries[client_id] = FitbitClientRegistry(client_id, client_secret)
+        return registry
+
+def clear_client_registries():
+    """Forgets every cached Fitbit client (e.g. when pointing the app at another server)."""
+    with _registries_lock:
+        _registries.clear()
+
 class FitbitDataRetriever:
     def __init__(self, client_id, client_secret):
         self.client_id = client_id
@@ -49,22 +163,29 @@ class FitbitDataRetriever:
             'sleep', 'weight'
         ]
         self.oauth = None
+        self.authorization_url = None
         self.token = None
+        self.clients = get_client_registry(client_id, client_secret)
 
     def authorize(self, email):
-        """Handles Fitbit OAuth 2.0 authorization."""
-        self.oauth = OAuth2Session(
-            self.client_id, 
-            scope=self.scope, 
-            redirect_uri=self.redirect_uri
-        )
-        authorization_url, state = self.oauth.authorization_url(
-            self.authorization_base_url, 
-            access_type='offline'
-        )
+        """Handles Fitbit OAuth 2.0 authorization.
+
+        Call it on every rerun while the user connects: the OAuth session (and its state)
+        is kept on the retriever, and the tokens are returned once the callback URL is submitted.
+        """
+        if self.oauth is None:
+            self.oauth = OAuth2Session(
+                self.client_id, 
+                scope=self.scope, 
+                redirect_uri=self.redirect_uri
+            )
+            self.authorization_url, state = self.oauth.authorization_url(
+                self.authorization_base_url, 
+                access_type='offline'
+            )
+            webbrowser.open(self.authorization_url)
         st.write("Please go to this URL and authorize:")
-        st.write(authorization_url)
-        webbrowser.open(authorization_url)
+        st.write(self.authorization_url)
         authorization_response = st.text_input("Enter the full callback URL:")
         if st.button("Submit Authorization Code"):
             self.token = self.oauth.fetch_token(
@@ -73,6 +194,8 @@ class FitbitDataRetriever:
                 client_secret=self.client_secret
             )
             save_fitbit_tokens(email, self.token['access_token'], self.token['refresh_token'], self.token['expires_in'])
+            self.clients.forget(email)
+            self.oauth = None
             st.success("✅ Successfully connected to Fitbit!")
             return self.token
 
@@ -81,21 +204,13 @@ class FitbitDataRetriever:
         if not target_date:
             target_date = datetime.today().strftime("%Y-%m-%d")
 
-        tokens = get_fitbit_tokens(email)
-        if not tokens:
+        client = self.clients.get_client(email)
+        if client is None:
             st.error("No Fitbit account connected for this email.")
             return None
 
-        client = fitbit.Fitbit(
-            self.client_id, 
-            self.client_secret, 
-            oauth2=True, 
-            access_token=tokens['access_token'], 
-            refresh_token=tokens['refresh_token']
-        )
-
         try:
-            hr_data = client.intraday_time_series('activities/heart', base_date=date, detail_level='1min')
+            hr_data = client.intraday_time_series('activities/heart', base_date=target_date, detail_level='1min')
             hr_df = pd.DataFrame(hr_data['activities-heart-intraday']['dataset'])
             return hr_df
         except Exception as e:
@@ -107,21 +222,14 @@ class FitbitDataRetriever:
         if not target_date:
             target_date = datetime.today().strftime("%Y-%m-%d")
 
-        tokens = get_fitbit_tokens(email)
-        if not tokens:
+        client = self.clients.get_client(email)
+        if client is None:
             st.error("No Fitbit account connected for this email.")
             return None
 
-        client = fitbit.Fitbit(
-            self.client_id, 
-            self.client_secret, 
-            oauth2=True, 
-            access_token=tokens['access_token'], 
-            refresh_token=tokens['refresh_token']
-        )
-
         try:
-            sleep_data = client.get_sleep(date)
+            sleep_day = date.fromisoformat(target_date) if isinstance(target_date, str) else target_date
+            sleep_data = client.get_sleep(sleep_day)
             return sleep_data
         except Exception as e:
             st.error(f"Error retrieving sleep data: {e}")
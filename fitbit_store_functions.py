@@ -0,0 +1,188 @@
+import os
+import threading
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+
+# -------------------- Intraday Time-Series Store --------------------
+# Fitbit intraday series (1-minute heart rate, steps, ...) are kept on disk so features
+# over weeks of data never need the API. Each user and resource has two append-only files:
+#
+#   blocks.bin  one int16 block of 1,440 values per stored day, indexed by minute of day
+#   index.bin   one (day, block) record per append; the latest record for a day wins
+#
+# Re-syncing a day (e.g. today, which was still partial) appends a new block instead of
+# rewriting the old one, so readers never see a half-written day. compact() drops the
+# superseded blocks. There is one writer per store; any number of readers memory-map it,
+# but compact() should run while nobody reads (e.g. at the end of the sync job).
+
+FITBIT_STORE_PATH = os.environ.get('EXHALE_FITBIT_STORE', 'fitbit_store')
+
+MINUTES_PER_DAY = 24 * 60
+MISSING = np.iinfo(np.int16).min   # minutes without a reading
+INDEX_DTYPE = np.dtype([('day', '<i4'), ('block', '<i4')])  # day = days since 1970-01-01
+EPOCH = date(1970, 1, 1)
+
+def _day_number(day):
+    """Converts a date or 'YYYY-MM-DD' string to days since the epoch."""
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    elif isinstance(day, datetime):
+        day = day.date()
+    return (day - EPOCH).days
+
+def dataset_to_block(dataset):
+    """Converts an intraday dataset ([{'time': 'HH:MM:SS', 'value': v}] or its DataFrame) to a day block."""
+    block = np.full(MINUTES_PER_DAY, MISSING, dtype=np.int16)
+    if isinstance(dataset, pd.DataFrame):
+        times, values = dataset['time'].tolist(), dataset['value'].tolist()
+    else:
+        times, values = [point['time'] for point in dataset], [point['value'] for point in dataset]
+    if not times:
+        return block
+    # Parse the 'HH:MM:SS' strings as one byte array instead of one int() call per minute
+    digits = np.frombuffer(''.join(times).encode('ascii'), dtype=np.uint8).reshape(-1, 8) - ord('0')
+    minutes = (digits[:, 0] * 10 + digits[:, 1]).astype(np.int64) * 60 + digits[:, 3] * 10 + digits[:, 4]
+    block[minutes] = np.clip(np.rint(values), MISSING + 1, np.iinfo(np.int16).max)
+    return block
+
+class IntradayStore:
+    """Append-only per-user, per-day store for one intraday resource (e.g. 'heart')."""
+
+    def __init__(self, root=None, resource='heart'):
+        self.root = root or FITBIT_STORE_PATH
+        self.resource = resource
+        self._write_locks = {}
+        self._lock = threading.Lock()
+        self._maps = {}  # user_id -> (blocks memmap, file inode, number of blocks it covers)
+
+    def _directory(self, user_id):
+        return os.path.join(self.root, str(user_id), self.resource)
+
+    def _write_lock(self, user_id):
+        with self._lock:
+            return self._write_locks.setdefault(user_id, threading.Lock())
+
+    def append_days(self, user_id, blocks):
+        """Appends {day: dataset or block} for one user; days already stored are superseded."""
+        if not blocks:
+            return
+        directory = self._directory(user_id)
+        os.makedirs(directory, exist_ok=True)
+        data = np.stack([block if isinstance(block, np.ndarray) else dataset_to_block(block)
+                         for block in blocks.values()]).astype(np.int16, copy=False)
+        with self._write_lock(user_id):
+            blocks_path = os.path.join(directory, 'blocks.bin')
+            first_block = os.path.getsize(blocks_path) // (MINUTES_PER_DAY * 2) if os.path.exists(blocks_path) else 0
+            # Data first, index second: a reader only follows index records whose block exists
+            with open(blocks_path, 'ab') as file:
+                file.write(data.tobytes())
+                file.flush()
+                os.fsync(file.fileno())
+            index = np.empty(len(blocks), dtype=INDEX_DTYPE)
+            index['day'] = [_day_number(day) for day in blocks]
+            index['block'] = np.arange(first_block, first_block + len(blocks))
+            with open(os.path.join(directory, 'index.bin'), 'ab') as file:
+                file.write(index.tobytes())
+                file.flush()
+                os.fsync(file.fileno())
+
+    def append_day(self, user_id, day, dataset):
+        """Appends one day of intraday data for the user."""
+        self.append_days(user_id, {day: dataset})
+
+    def _index(self, user_id):
+        """Returns the latest block per stored day as a day-sorted index array."""
+        path = os.path.join(self._directory(user_id), 'index.bin')
+        if not os.path.exists(path):
+            return np.empty(0, dtype=INDEX_DTYPE)
+        with open(path, 'rb') as file:
+            raw = file.read()
+        index = np.frombuffer(raw[:len(raw) - len(raw) % INDEX_DTYPE.itemsize], dtype=INDEX_DTYPE)
+        # Keep the last record of each day (np.unique keeps the first, so search reversed)
+        reversed_index = index[::-1]
+        _, first = np.unique(reversed_index['day'], return_index=True)
+        return reversed_index[first]
+
+    def _blocks(self, user_id, needed):
+        """Returns a read-only memory map of the user's blocks covering at least `needed` blocks."""
+        path = os.path.join(self._directory(user_id), 'blocks.bin')
+        inode = os.stat(path).st_ino  # changes when compact() replaces the file
+        cached = self._maps.get(user_id)
+        if cached is None or cached[1] != inode or cached[2] < needed:
+            count = os.path.getsize(path) // (MINUTES_PER_DAY * 2)
+            blocks = np.memmap(path, dtype=np.int16, mode='r', shape=(count, MINUTES_PER_DAY))
+            cached = self._maps[user_id] = (blocks, inode, count)
+        return cached[0]
+
+    def stored_days(self, user_id):
+        """Returns the stored days for the user, oldest first."""
+        return [EPOCH + timedelta(days=int(day)) for day in self._index(user_id)['day']]
+
+    def last_day(self, user_id):
+        """Returns the most recent stored day for the user, or None."""
+        index = self._index(user_id)
+        return EPOCH + timedelta(days=int(index['day'][-1])) if len(index) else None
+
+    def superseded_blocks(self, user_id):
+        """Returns how many stored blocks were replaced by a later append (what compact() would drop)."""
+        path = os.path.join(self._directory(user_id), 'index.bin')
+        records = os.path.getsize(path) // INDEX_DTYPE.itemsize if os.path.exists(path) else 0
+        return records - len(self._index(user_id))
+
+    def read_blocks(self, user_id, start, end):
+        """Returns (days, values) for stored days in [start, end]: datetime64[D] and a (days, 1440) int16 array.
+
+        Minutes without a reading hold MISSING. Only the selected blocks are read from disk.
+        """
+        index = self._index(user_id)
+        index = index[(index['day'] >= _day_number(start)) & (index['day'] <= _day_number(end))]
+        if not len(index):
+            return np.empty(0, dtype='datetime64[D]'), np.empty((0, MINUTES_PER_DAY), dtype=np.int16)
+        values = self._blocks(user_id, int(index['block'].max()) + 1)[index['block']]
+        return index['day'].astype('datetime64[D]'), values
+
+    def read_series(self, user_id, start, end):
+        """Returns the readings in [start, end] as a DataFrame with 'time' (Timestamp) and 'value' columns."""
+        days, values = self.read_blocks(user_id, start, end)
+        day_index, minutes = np.nonzero(values != MISSING)
+        times = days[day_index].astype('datetime64[m]') + minutes.astype('timedelta64[m]')
+        return pd.DataFrame({'time': times, 'value': values[day_index, minutes]})
+
+    def compact(self, user_id):
+        """Rewrites the user's files keeping only the latest block of each day."""
+        with self._write_lock(user_id):
+            index = self._index(user_id)
+            if not len(index):
+                return
+            directory = self._directory(user_id)
+            values = np.array(self._blocks(user_id, int(index['block'].max()) + 1)[index['block']])
+            self._maps.pop(user_id, None)
+            compacted = np.empty(len(index), dtype=INDEX_DTYPE)
+            compacted['day'] = index['day']
+            compacted['block'] = np.arange(len(index))
+            for name, payload in (('blocks.bin', values), ('index.bin', compacted)):
+                tmp_path = os.path.join(directory, f'{name}.tmp')
+                with open(tmp_path, 'wb') as file:
+                    file.write(payload.tobytes())
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(tmp_path, os.path.join(directory, name))
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def set_store_path(path):
+    """Points the process-wide stores at another directory (used by benchmarks)."""
+    global FITBIT_STORE_PATH
+    with _stores_lock:
+        FITBIT_STORE_PATH = path
+        _stores.clear()
+
+def get_intraday_store(resource='heart'):
+    """Returns the process-wide store for one intraday resource under FITBIT_STORE_PATH."""
+    with _stores_lock:
+        store = _stores.get(resource)
+        if store is None:
+            store = _stores[resource] = IntradayStore(resource=resource)
+        return store
@@ -0,0 +1,311 @@
+import argparse
+import json
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+import numpy as np
+import requests
+from fitbit.exceptions import HTTPServerError, HTTPTooManyRequests, Timeout
+
+
+from database_functions import migrate_database, unit_of_work
+from fitbit_features_functions import refresh_daily_features
+from fitbit_functions import get_client_registry
+from fitbit_store_functions import get_intraday_store
+
+# -------------------- Fitbit Sync --------------------
+# Pulls Fitbit data for every connected user into the local stores: intraday heart rate
+# into the IntradayStore and the daily heart, sleep and activity summaries into
+# fitbit_daily_summaries. Each (user, resource) remembers the last complete day it
+# synced, so a run only fetches the days after it. Today is always fetched again
+# because it is still filling up.
+#
+# Every (user, resource) is fetched on a bounded thread pool. Fetched days go through a
+# bounded queue to a single writer thread (SQLite has one writer), so fetchers block
+# instead of piling up data when writing falls behind. The writer also recomputes the
+# daily features (fitbit_features_functions) of every day it stores.
+
+RESOURCES = ('heart', 'sleep', 'activity')
+INITIAL_SYNC_DAYS = 30       # history fetched for a user who never synced
+HOURLY_REQUEST_LIMIT = 150   # Fitbit's per-user quota
+COMPACT_AFTER_BLOCKS = 7     # superseded heart rate blocks tolerated before compacting
+WORKERS = 8                  # concurrent fetches
+RETRIES = 3                  # extra attempts for timeouts, connection errors and 5xx responses
+RETRY_BACKOFF = 0.5          # seconds before the first retry, doubled for each further one
+WRITE_BATCH_DAYS = 31        # days handed to the writer at once
+
+class TokenBucket:
+    """Rate limiter allowing bursts of `capacity` requests, refilled at `rate` requests per second."""
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        """Takes a token and returns 0.0, or returns the seconds until one is available."""
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self, max_wait=None):
+        """Waits for a token; returns False instead when that would take longer than max_wait seconds."""
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Empties the bucket so no token is handed out for the next `seconds` (e.g. after a 429)."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(user_id):
+    """Returns the user's process-wide token bucket for Fitbit requests."""
+    with _rate_limiters_lock:
+        bucket = _rate_limiters.get(user_id)
+        if bucket is None:
+            bucket = _rate_limiters[user_id] = TokenBucket(HOURLY_REQUEST_LIMIT, HOURLY_REQUEST_LIMIT / 3600)
+        return bucket
+
+def reset_rate_limiters():
+    """Forgets every user's request history, giving each a full bucket again."""
+    with _rate_limiters_lock:
+        _rate_limiters.clear()
+
+def fetch_day(client, resource, day):
+    """Fetches one day of a resource and returns (daily summary, intraday dataset or None)."""
+    if resource == 'heart':
+        data = client.intraday_time_series('activities/heart', base_date=day.isoformat(), detail_level='1min')
+        summary = data['activities-heart'][0]['value'] if data['activities-heart'] else {}
+        return summary, data['activities-heart-intraday']['dataset']
+    if resource == 'sleep':
+        return client.get_sleep(day)['summary'], None
+    if resource == 'activity':
+        return client.activities(date=day.isoformat())['summary'], None
+    raise ValueError(f"Unknown Fitbit resource: {resource}")
+
+def load_sync_state(user_id):
+    """Returns {resource: last synced day} for the user."""
+    with unit_of_work() as conn:
+        rows = conn.execute('''
+            SELECT resource, last_synced_day FROM fitbit_sync_state WHERE user_id = ?
+        ''', (user_id,)).fetchall()
+    return {resource: date.fromisoformat(day) for resource, day in rows if day}
+
+def missing_days(last_synced_day, today):
+    """Returns the days a resource still needs, oldest first: everything after the mark, up to today."""
+    first = last_synced_day + timedelta(days=1) if last_synced_day else today - timedelta(days=INITIAL_SYNC_DAYS - 1)
+    return [first + timedelta(days=offset) for offset in range((today - first).days + 1)]
+
+def write_synced_days(user_id, resource, results, today):
+    """Stores fetched days in one batch, recomputes their features and advances the high-water mark."""
+    if not results:
+        return
+    intraday = {day: dataset for day, (_, dataset) in results.items() if dataset is not None}
+    if intraday:
+        get_intraday_store(resource).append_days(user_id, intraday)
+    complete = [day for day in results if day < today]
+    with unit_of_work(immediate=True) as conn:
+        conn.executemany('''
+            INSERT OR REPLACE INTO fitbit_daily_summaries (user_id, resource, day, summary)
+            VALUES (?, ?, ?, ?)
+        ''', [(user_id, resource, day.isoformat(), json.dumps(summary)) for day, (summary, _) in results.items()])
+        conn.execute('''
+            INSERT INTO fitbit_sync_state (user_id, resource, last_synced_day, synced_at)
+            VALUES (?, ?, ?, DATETIME('now'))
+            ON CONFLICT (user_id, resource) DO UPDATE SET
+                last_synced_day = COALESCE(excluded.last_synced_day, fitbit_sync_state.last_synced_day),
+                synced_at = excluded.synced_at
+        ''', (user_id, resource, max(complete).isoformat() if complete else None))
+        refresh_daily_features(user_id, results)
+
+@dataclass
+class SyncStats:
+    """Counters and request latencies of one sync run."""
+    days: int = 0
+    requests: int = 0
+    retries: int = 0
+    deferred: int = 0      # (user, resource) pairs left for the next run by the rate limit
+    failed: int = 0        # (user, resource) pairs that raised
+    latencies: list = field(default_factory=list)  # seconds per request
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def record_request(self, seconds):
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(seconds)
+
+    def latency_percentiles(self, percentiles=(50, 95, 99)):
+        """Returns {percentile: milliseconds} over all requests of the run."""
+        if not self.latencies:
+            return {}
+        values = np.percentile(np.array(self.latencies) * 1000, percentiles)
+        return dict(zip(percentiles, values.tolist()))
+
+def fetch_with_retry(client, resource, day, bucket, stats, max_wait=0.0):
+    """Fetches one day through the user's rate limiter, retrying transient failures with backoff.
+
+    Returns None when the user's quota is used up (or Fitbit answered 429).
+    """
+    for attempt in range(RETRIES + 1):
+        if not bucket.acquire(max_wait):
+            return None
+        start = time.perf_counter()
+        try:
+            return fetch_day(client, resource, day)
+        except HTTPTooManyRequests as error:
+            bucket.pause(error.retry_after_secs)
+            return None
+        except (HTTPServerError, Timeout, requests.ConnectionError):
+            if attempt == RETRIES:
+                raise
+        finally:
+            stats.record_request(time.perf_counter() - start)
+        stats.add(retries=1)
+        time.sleep(RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+
+def sync_resource(user_id, client, resource, write, stats, today=None, max_wait=0.0):
+    """Fetches the user's missing days of one resource, oldest first, handing batches to write().
+
+    Fetching stops at the first day the rate limit refuses, so the stored high-water mark
+    never skips a day and the next run continues from there.
+    """
+    today = today or date.today()
+    bucket = get_rate_limiter(user_id)
+    batch = {}
+    for day in missing_days(load_sync_state(user_id).get(resource), today):
+        result = fetch_with_retry(client, resource, day, bucket, stats, max_wait)
+        if result is None:
+            stats.add(deferred=1)
+            break
+        batch[day] = result
+        if len(batch) >= WRITE_BATCH_DAYS:
+            write(user_id, resource, batch, today)
+            batch = {}
+    if batch:
+        write(user_id, resource, batch, today)
+
+def connected_users():
+    """Returns (user_id, email) for every user with stored Fitbit tokens."""
+    with unit_of_work() as conn:
+        return conn.execute('''
+            SELECT u.id, u.email FROM users u JOIN fitbit_tokens t ON t.email = u.email ORDER BY u.id
+        ''').fetchall()
+
+def _write_queued_days(pending, stats, failed_pairs):
+    """Writer thread: stores batches from the queue until it receives None.
+
+    Once a batch of a (user, resource) fails, that pair's later batches are dropped too:
+    storing them would move its high-water mark past the failed days, which would then
+    never be fetched again. The next run starts over after the last stored batch.
+    """
+    while True:
+        item = pending.get()
+        if item is None:
+            return
+        pair = item[:2]
+        if pair in failed_pairs:
+            continue
+        try:
+            write_synced_days(*item)
+            stats.add(days=len(item[2]))
+        except Exception as e:
+            # Keep draining, or the fetchers blocked on the full queue would never finish
+            print(f"Error storing Fitbit {item[1]} data for user {item[0]}: {e}")
+            failed_pairs.add(pair)
+            stats.add(failed=1)
+
+def run_fitbit_sync(client_id, client_secret, resources=RESOURCES, max_wait=0.0, workers=WORKERS):
+    """Syncs every connected user and returns the run's SyncStats."""
+    migrate_database()
+    registry = get_client_registry(client_id, client_secret)
+    users = connected_users()
+    stats = SyncStats()
+    pending = queue.Queue(maxsize=2 * workers)
+    failed_pairs = set()   # (user_id, resource) pairs whose batches are no longer stored this run
+    writer = threading.Thread(target=_write_queued_days, args=(pending, stats, failed_pairs), daemon=True)
+    writer.start()
+
+    def write(*batch):
+        if batch[:2] not in failed_pairs:
+            pending.put(batch)  # blocks while the writer is behind
+
+    def sync_task(user_id, email, resource):
+        client = registry.get_client(email)
+        if client is not None:
+            sync_resource(user_id, client, resource, write, stats, max_wait=max_wait)
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(workers) as executor:
+            tasks = {executor.submit(sync_task, user_id, email, resource): user_id
+                     for user_id, email in users for resource in resources}
+            for task in as_completed(tasks):
+                try:
+                    task.result()
+                except Exception as e:
+                    # One revoked token or broken response should not stop the other users
+                    print(f"Error syncing Fitbit data for user {tasks[task]}: {e}")
+                    stats.add(failed=1)
+    finally:
+        pending.put(None)
+        writer.join()
+
+    store = get_intraday_store('heart')
+    for user_id, _ in users:
+        if store.superseded_blocks(user_id) > COMPACT_AFTER_BLOCKS:
+            store.compact(user_id)
+
+    elapsed = time.perf_counter() - start
+    latency = ', '.join(f"p{p} {ms:.1f} ms" for p, ms in stats.latency_percentiles().items())
+    print(f"Fetched {stats.days:,} Fitbit days for {len(users):,} users in {elapsed:.2f} s "
+          f"({stats.days / elapsed if elapsed else 0:,.0f} days/s, {workers} workers). "
+          f"Requests: {stats.requests:,} ({latency or 'none'}), retries: {stats.retries:,}, "
+          f"deferred: {stats.deferred:,}, failed: {stats.failed:,}.")
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync Fitbit data for every connected user into the local stores.")
+    parser.add_argument('--client-id', default=os.environ.get('FITBIT_CLIENT_ID'), help="Fitbit app client id.")
+    parser.add_argument('--client-secret', default=os.environ.get('FITBIT_CLIENT_SECRET'), help="Fitbit app client secret.")
+    parser.add_argument('--resources', nargs='+', choices=RESOURCES, default=list(RESOURCES))
+    parser.add_argument('--max-wait', type=float, default=0.0,
+                        help="Seconds to wait for a user's rate limit before deferring them to the next run.")
+    parser.add_argument('--workers', type=int, default=WORKERS, help="Concurrent fetches.")
+    args = parser.parse_args()
+    if not args.client_id or not args.client_secret:
+        parser.error("set --client-id/--client-secret or FITBIT_CLIENT_ID/FITBIT_CLIENT_SECRET")
+    run_fitbit_sync(args.client_id, args.client_secret, args.resources, args.max_wait, args.workers)
+
+if __name__ == "__main__":
+    main()
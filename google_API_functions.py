@@ -1,28 +1,106 @@
-import sqlite3
 import streamlit as st
 import pickle
 import os
+import threading
+import time
 from datetime import datetime, timedelta
+import httplib2
+import pytz
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
+from database_functions import unit_of_work
 
 # -------------------- Google Calendar Functions --------------------
 SCOPES = ['https://www.googleapis.com/auth/calendar']
+TOKEN_PATH = 'token.pickle'
+# Point the client at another server (e.g. a local stub) instead of www.googleapis.com
+CALENDAR_API_ENDPOINT = os.environ.get('EXHALE_CALENDAR_API_ENDPOINT')
+# Services are rebuilt after this long; credentials are refreshed this far ahead of expiry
+SERVICE_TTL_SECONDS = 60 * 60
+REFRESH_MARGIN = timedelta(minutes=5)
 
-def get_calendar_service():
-    """Authenticates and returns a Google Calendar API service instance."""
+_service_cache = {}  # (user_id, token_path) -> (service, credentials, built_at)
+_service_locks = {}  # (user_id, token_path) -> lock, so one user's OAuth flow never blocks another
+_service_lock = threading.Lock()
+
+def _user_lock(key):
+    """Returns the lock guarding the cached service for one user."""
+    with _service_lock:
+        return _service_locks.setdefault(key, threading.Lock())
+
+def _save_credentials(creds, token_path):
+    """Persists credentials atomically so a crash never leaves a truncated token file."""
+    tmp_path = f'{token_path}.tmp'
+    with open(tmp_path, 'wb') as token:
+        pickle.dump(creds, token)
+    os.replace(tmp_path, token_path)
+
+def _refresh_if_expiring(creds, token_path):
+    """Refreshes credentials that expire within REFRESH_MARGIN; returns False if they cannot be refreshed."""
+    if creds.expiry is None or creds.expiry - REFRESH_MARGIN > datetime.utcnow():
+        return creds.valid
+    if not creds.refresh_token:
+        return False
+    try:
+        creds.refresh(Request())
+    except RefreshError:
+        return False
+    _save_credentials(creds, token_path)
+    return True
+
+def _load_credentials(token_path):
+    """Loads stored credentials, refreshing them or running the OAuth flow when needed."""
     creds = None
-    if os.path.exists('token.pickle'):
-        with open('token.pickle', 'rb') as token:
+    if os.path.exists(token_path):
+        with open(token_path, 'rb') as token:
             creds = pickle.load(token)
-    if not creds or not creds.valid:
-        flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-        creds = flow.run_local_server(port=0)
-        with open('token.pickle', 'wb') as token:
-            pickle.dump(creds, token)
-    return build('calendar', 'v3', credentials=creds)
+    if creds and _refresh_if_expiring(creds, token_path):
+        return creds
+    flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
+    creds = flow.run_local_server(port=0)
+    _save_credentials(creds, token_path)
+    return creds
+
+def _build_service(creds):
+    """Builds a Calendar service that can be shared between Streamlit sessions.
+
+    httplib2 connections are not thread-safe, so every request gets its own authorized
+    Http object while the (expensive) service object and discovery document are shared.
+    """
+    def build_request(http, *args, **kwargs):
+        return HttpRequest(AuthorizedHttp(creds, http=httplib2.Http()), *args, **kwargs)
+
+    client_options = {'api_endpoint': CALENDAR_API_ENDPOINT} if CALENDAR_API_ENDPOINT else None
+    return build('calendar', 'v3', credentials=creds, requestBuilder=build_request,
+                 client_options=client_options, cache_discovery=False)
+
+def get_calendar_service(user_id=None, token_path=None):
+    """Returns the user's Google Calendar API service, built once per process and reused across reruns."""
+    if user_id is None:
+        user_id = st.session_state.get('user_id')
+    token_path = token_path or TOKEN_PATH
+    key = (user_id, token_path)
+    with _user_lock(key):
+        cached = _service_cache.get(key)
+        if cached is not None:
+            service, creds, built_at = cached
+            if time.monotonic() - built_at < SERVICE_TTL_SECONDS and _refresh_if_expiring(creds, token_path):
+                return service
+        creds = _load_credentials(token_path)
+        service = _build_service(creds)
+        _service_cache[key] = (service, creds, time.monotonic())
+        return service
+
+def clear_calendar_service_cache():
+    """Forgets every cached Calendar service (e.g. after the user revokes access)."""
+    with _service_lock:
+        _service_cache.clear()
 
 def schedule_event(summary, description, duration_minutes):
     """Schedules an event in the user's Google Calendar if 24 hours have passed since the last scheduled task."""
@@ -32,10 +110,10 @@ def schedule_event(summary, description, duration_minutes):
         return
 
     # Check the last scheduled task timestamp
-    conn = sqlite3.connect('user_data.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT last_scheduled FROM scheduled_tasks WHERE user_id = ?', (user_id,))
-    row = cursor.fetchone()
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT last_scheduled FROM scheduled_tasks WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
 
     now = datetime.utcnow()
     if row:
@@ -43,7 +121,6 @@ def schedule_event(summary, description, duration_minutes):
         time_since_last = now - last_scheduled
         if time_since_last < timedelta(hours=24):
             st.info("A task has already been scheduled in the last 24 hours. No new task will be scheduled.")
-            conn.close()
             return
 
     # Schedule the event
@@ -56,54 +133,171 @@ def schedule_event(summary, description, duration_minutes):
         'start': {'dateTime': start_time.isoformat() + 'Z'},
         'end': {'dateTime': end_time.isoformat() + 'Z'}
     }
-    service.events().insert(calendarId='primary', body=event).execute()
+    created = service.events().insert(calendarId='primary', body=event).execute()
+    cache_calendar_event(user_id, created)
 
     # Update the last scheduled task timestamp
-    if row:
-        cursor.execute('UPDATE scheduled_tasks SET last_scheduled = ? WHERE user_id = ?', (now.strftime('%Y-%m-%d %H:%M:%S'), user_id))
-    else:
-        cursor.execute('INSERT INTO scheduled_tasks (user_id, last_scheduled) VALUES (?, ?)', (user_id, now.strftime('%Y-%m-%d %H:%M:%S')))
-    conn.commit()
-    conn.close()
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        if row:
+            cursor.execute('UPDATE scheduled_tasks SET last_scheduled = ? WHERE user_id = ?', (now.strftime('%Y-%m-%d %H:%M:%S'), user_id))
+        else:
+            cursor.execute('INSERT INTO scheduled_tasks (user_id, last_scheduled) VALUES (?, ?)', (user_id, now.strftime('%Y-%m-%d %H:%M:%S')))
 
     st.success("Task scheduled successfully!")
 
-def get_weekly_calendar_events():
-    """Fetches events from the user's Google Calendar for the next 7 days."""
-    service = get_calendar_service()
-    now = datetime.utcnow().isoformat() + 'Z'
-    one_week_later = (datetime.utcnow() + timedelta(days=7)).isoformat() + 'Z'
-
-    events_result = service.events().list(
-        calendarId='primary',
-        timeMin=now,
-        timeMax=one_week_later,
-        singleEvents=True,
-        orderBy='startTime',
-        timeZone='Europe/Madrid',
-        fields='items(id,start,end,summary)'
-    ).execute()
-
-
-    events = events_result.get('items', [])
-    formatted_events = []
+# -------------------- Weekly Events Cache --------------------
+# Events are synced into SQLite and main_page reads them from there, so reruns within
+# CALENDAR_CACHE_TTL_SECONDS never call the API. After that an incremental sync with the
+# stored syncToken pulls only the events that changed; writes made through this module
+# patch the cache directly.
+
+CALENDAR_TIME_ZONE = 'Europe/Madrid'
+CALENDAR_CACHE_TTL_SECONDS = int(os.environ.get('EXHALE_CALENDAR_CACHE_TTL', 300))
+# A full sync loads this many days ahead and is repeated once less than a week is left
+SYNC_WINDOW_DAYS = 28
+EVENT_FIELDS = 'nextPageToken,nextSyncToken,items(id,status,start,end,summary)'
+
+def _utc_text(moment):
+    """Formats a datetime as sortable UTC text, the form used by the start_utc/end_utc columns."""
+    return moment.astimezone(pytz.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def _event_time(moment):
+    """Returns (display value, UTC text) for an event start or end object."""
+    zone = pytz.timezone(moment.get('timeZone') or CALENDAR_TIME_ZONE)
+    if 'dateTime' not in moment:
+        # All-day events keep their date, like the API returns them
+        day = datetime.fromisoformat(moment['date'])
+        return moment['date'], _utc_text(zone.localize(day))
+    value = datetime.fromisoformat(moment['dateTime'].replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = zone.localize(value)
+    return value.astimezone(pytz.timezone(CALENDAR_TIME_ZONE)).isoformat(), _utc_text(value)
+
+def _store_events(cursor, user_id, events):
+    """Applies API events to the cache: cancelled events are removed, the rest upserted."""
     for event in events:
-        start = event['start'].get('dateTime', event['start'].get('date'))
-        end = event['end'].get('dateTime', event['end'].get('date'))
-        summary = event.get('summary', 'No Title')
-        event_id = event.get('id') 
-        formatted_events.append({
-            'start': start,
-            'end': end,
-            'summary': summary,
-            'id': event_id              
-        })
-
-    return formatted_events
+        if event.get('status') == 'cancelled':
+            cursor.execute('DELETE FROM calendar_events WHERE user_id = ? AND event_id = ?', (user_id, event['id']))
+            continue
+        start, start_utc = _event_time(event['start'])
+        end, end_utc = _event_time(event['end'])
+        cursor.execute('''
+            INSERT OR REPLACE INTO calendar_events (user_id, event_id, summary, start, end, start_utc, end_utc)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, event['id'], event.get('summary', 'No Title'), start, end, start_utc, end_utc))
+
+def _list_events(service, **params):
+    """Lists events on the primary calendar, following pages; returns (items, nextSyncToken)."""
+    items, page_token = [], None
+    while True:
+        result = service.events().list(
+            calendarId='primary',
+            singleEvents=True,
+            timeZone=CALENDAR_TIME_ZONE,
+            fields=EVENT_FIELDS,
+            pageToken=page_token,
+            **params
+        ).execute()
+        items.extend(result.get('items', []))
+        page_token = result.get('nextPageToken')
+        if not page_token:
+            return items, result.get('nextSyncToken')
+
+def sync_calendar_events(user_id, full=False):
+    """Brings the user's cached events up to date with Google Calendar; returns 'full' or 'incremental'."""
+    with unit_of_work() as conn:
+        state = conn.execute(
+            'SELECT sync_token, window_end FROM calendar_sync_state WHERE user_id = ?', (user_id,)
+        ).fetchone()
+
+    now = datetime.utcnow().replace(tzinfo=pytz.utc)
+    sync_token, window_end = state if state and not full else (None, None)
+    if window_end is not None and window_end < _utc_text(now + timedelta(days=7)):
+        sync_token = None  # events beyond the old window were never loaded
+
+    service = get_calendar_service(user_id)
+    items = None
+    if sync_token:
+        try:
+            items, next_token = _list_events(service, syncToken=sync_token)
+        except HttpError as error:
+            if error.resp.status != 410:
+                raise
+            sync_token = None  # 410 Gone: the token expired, so the cache is rebuilt
+    if sync_token is None:
+        window_end = _utc_text(now + timedelta(days=SYNC_WINDOW_DAYS))
+        items, next_token = _list_events(service, timeMin=_utc_text(now), timeMax=window_end)
+
+    with unit_of_work(immediate=True) as conn:
+        cursor = conn.cursor()
+        if sync_token is None:
+            cursor.execute('DELETE FROM calendar_events WHERE user_id = ?', (user_id,))
+        cursor.execute('DELETE FROM calendar_events WHERE user_id = ? AND end_utc <= ?', (user_id, _utc_text(now)))
+        _store_events(cursor, user_id, items)
+        cursor.execute('''
+            INSERT OR REPLACE INTO calendar_sync_state (user_id, sync_token, window_end, synced_at)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, next_token, window_end, time.time()))
+    return 'incremental' if sync_token else 'full'
+
+def _cache_age(user_id):
+    """Returns the seconds since the user's events were last synced (infinite if never or invalidated)."""
+    with unit_of_work() as conn:
+        row = conn.execute('SELECT synced_at FROM calendar_sync_state WHERE user_id = ?', (user_id,)).fetchone()
+    if row is None or row[0] is None:
+        return float('inf')
+    return time.time() - row[0]
+
+def invalidate_calendar_cache(user_id=None):
+    """Makes the next get_weekly_calendar_events call sync with the API, whatever the TTL."""
+    if user_id is None:
+        user_id = st.session_state.get('user_id')
+    with unit_of_work() as conn:
+        conn.execute('UPDATE calendar_sync_state SET synced_at = NULL WHERE user_id = ?', (user_id,))
+
+def cache_calendar_event(user_id, event):
+    """Writes an event returned by the API (e.g. from insert) through to the user's cache."""
+    with unit_of_work() as conn:
+        _store_events(conn.cursor(), user_id, [event])
+
+def get_weekly_calendar_events(user_id=None):
+    """Fetches events from the user's Google Calendar for the next 7 days, served from the local cache."""
+    if user_id is None:
+        user_id = st.session_state.get('user_id')
+    # One sync per user at a time; sessions that waited see the fresh cache and skip theirs
+    with _user_lock(('events', user_id)):
+        if _cache_age(user_id) >= CALENDAR_CACHE_TTL_SECONDS:
+            sync_calendar_events(user_id)
+
+    now = datetime.utcnow().replace(tzinfo=pytz.utc)
+    with unit_of_work() as conn:
+        rows = conn.execute('''
+            SELECT event_id, summary, start, end
+            FROM calendar_events
+            WHERE user_id = ? AND start_utc < ? AND end_utc > ?
+            ORDER BY start_utc
+        ''', (user_id, _utc_text(now + timedelta(days=7)), _utc_text(now))).fetchall()
+    return [{'start': start, 'end': end, 'summary': summary, 'id': event_id}
+            for event_id, summary, start, end in rows]
+
+def delete_calendar_event(event_id, user_id=None):
+    """Deletes an event from the user's Google Calendar and from the local cache."""
+    if user_id is None:
+        user_id = st.session_state.get('user_id')
+    service = get_calendar_service(user_id)
+    try:
+        service.events().delete(calendarId='primary', eventId=event_id).execute()
+    except HttpError as error:
+        if error.resp.status not in (404, 410):
+            raise
+        # Already deleted elsewhere; the cached copy is stale either way
+    cache_calendar_event(user_id, {'id': event_id, 'status': 'cancelled'})
 
 # -------------------- Schecule Custom Task --------------------
 def schedule_custom_task(summary, description, start_datetime, duration_minutes=60):
-    service = get_calendar_service()
+    user_id = st.session_state.get('user_id')
+    service = get_calendar_service(user_id)
 
     end_datetime = start_datetime + timedelta(minutes=duration_minutes)
 
@@ -124,4 +318,5 @@ def schedule_custom_task(summary, description, start_datetime, duration_minutes=
         }
     }
 
-    service.events().insert(calendarId='primary', body=event).execute()
\ No newline at end of file
+    created = service.events().insert(calendarId='primary', body=event).execute()
+    cache_calendar_event(user_id, created)
@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import re
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from database_functions import JOURNAL_EMOTIONS, migrate_database, unit_of_work
+
+# -------------------- Journal Analysis --------------------
+# Scores the emotions of journal entries and picks their keywords, for passive emotion
+# tracking. It runs from cron or as a long-lived worker (--watch), never inside a
+# Streamlit render. New entries are read in id order after the last_entry_id kept in
+# journal_analysis_state; entries edited after being analysed are queued by a trigger
+# in journal_analysis_queue. Batches are analysed in worker processes and written by
+# this process (SQLite has a single writer), one transaction per batch together with
+# the checkpoint, so an interrupted run resumes after its last written batch.
+#
+# Scoring is lexicon based and CPU only: an emotion's score is the share of an entry's
+# words found in its word list, not counting words shortly after a negation ("not happy").
+
+EMOTION_WORDS = {
+    'joy': '''happy happiness glad joy joyful excited exciting great wonderful amazing awesome fun
+              love loved lovely proud grateful thankful delighted cheerful smile laugh enjoy enjoyed
+              celebrate success fantastic good nice best hopeful optimistic''',
+    'calm': '''calm peaceful relaxed relaxing rest rested quiet serene content balanced gentle
+               comfortable refreshed slow easy meditate meditation breathe mindful safe steady
+               soothing settled''',
+    'sadness': '''sad sadness unhappy down lonely alone cry cried crying tears miss missed grief
+                  hopeless empty hurt disappointed disappointing upset depressed gloomy regret loss
+                  lost heartbroken sorry''',
+    'anger': '''angry anger mad furious annoyed annoying irritated irritating frustrated frustrating
+                frustration hate hated resent unfair rage argue argument yelled fight fought
+                outraged bitter''',
+    'fear': '''afraid fear scared scary anxious anxiety worried worry worrying nervous panic
+               terrified dread uneasy insecure uncertain doubt threat fearful tense''',
+    'stress': '''stress stressed stressful overwhelmed overworked pressure deadline deadlines busy
+                 exhausted exhausting tired burnout burned drained overtime rush rushed hectic
+                 demanding workload behind late sleepless insomnia''',
+}
+NEGATIONS = frozenset('''not no never nothing nor without hardly barely don't didn't doesn't isn't wasn't
+                         aren't weren't can't cannot couldn't won't wouldn't shouldn't haven't hasn't'''.split())
+NEGATION_WINDOW = 3     # words after a negation whose emotion is not counted
+STOPWORDS = frozenset('''a about above after again against all am an and any are as at be because been
+    before being below between both but by can could did do does doing down during each few for from
+    further had has have having he her here hers herself him himself his how i if in into is it its
+    itself just me more most my myself now of off on once only or other our ours ourselves out over own
+    same she should so some such than that the their theirs them themselves then there these they this
+    those through to too under until up very was we were what when where which while who whom why will
+    with would you your yours yourself yourselves also really still today yesterday tomorrow day got get
+    went go going one much many lot bit like felt feel feeling make made think thought know'''.split()) | NEGATIONS
+KEYWORDS_PER_ENTRY = 5
+WORD_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+def _stem(word):
+    """Strips common English suffixes so inflections of a lexicon word match it."""
+    for suffix in ('ing', 'ed', 'es', 's', 'ly'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+def _build_lexicon():
+    """Maps the stem of every EMOTION_WORDS word to the indices of its emotions in JOURNAL_EMOTIONS."""
+    lexicon = {}
+    for index, emotion in enumerate(JOURNAL_EMOTIONS):
+        for word in EMOTION_WORDS[emotion].split():
+            lexicon.setdefault(_stem(word), []).append(index)
+    return {stem: tuple(indices) for stem, indices in lexicon.items()}
+
+LEXICON = _build_lexicon()
+NEGATION = (None,)      # marks a negation in the word cache
+
+# Word -> its LEXICON emotions, NEGATION or (), filled in as words are first seen so each
+# distinct word is stemmed once per process
+_word_emotions = {}
+
+def _emotions_of(word):
+    """Returns a word's emotion indices, NEGATION or (), and caches them."""
+    emotions = NEGATION if word in NEGATIONS else LEXICON.get(_stem(word), ())
+    _word_emotions[word] = emotions
+    return emotions
+
+def analyse_text(text):
+    """Returns (word_count, emotion_scores, keywords) for a journal entry's text.
+
+    emotion_scores follow JOURNAL_EMOTIONS; keywords are the entry's most frequent
+    words outside STOPWORDS, most frequent first.
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    counts = [0] * len(JOURNAL_EMOTIONS)
+    negated_until = -1
+    for position, word in enumerate(words):
+        emotions = _word_emotions.get(word)
+        if emotions is None:
+            emotions = _emotions_of(word)
+        if not emotions:
+            continue
+        if emotions is NEGATION:
+            negated_until = position + NEGATION_WINDOW
+        elif position > negated_until:
+            for index in emotions:
+                counts[index] += 1
+    word_count = len(words)
+    scores = [count / word_count if word_count else 0.0 for count in counts]
+    frequent = (word for word, _ in Counter(words).most_common() if len(word) > 2 and word not in STOPWORDS)
+    return word_count, scores, list(islice(frequent, KEYWORDS_PER_ENTRY))
+
+def analyse_batch(rows):
+    """Analyses (id, user_id, date, title, content, version) rows into journal_emotions rows and queue versions."""
+    results = []
+    for entry_id, user_id, entry_date, title, content, version in rows:
+        word_count, scores, keywords = analyse_text(f'{title or ""}\n{content or ""}')
+        results.append((entry_id, user_id, entry_date, word_count, *scores, json.dumps(keywords), version))
+    return results
+
+SAVE_EMOTIONS_SQL = f'''
+    INSERT OR REPLACE INTO journal_emotions
+        (entry_id, user_id, date, word_count, {', '.join(JOURNAL_EMOTIONS)}, keywords, analysed_at)
+    SELECT ?, ?, ?, ?, {', '.join('?' for _ in JOURNAL_EMOTIONS)}, ?, DATETIME('now')
+    WHERE EXISTS (SELECT 1 FROM journal_entries WHERE id = ?)
+'''
+
+def _read_batches(after_entry_id, batch_size):
+    """Yields (requeued, rows) batches: queued edits first, then new entries in id order after after_entry_id."""
+    after_queued_id = 0
+    while True:
+        with unit_of_work() as conn:
+            rows = conn.execute('''
+                SELECT e.id, e.user_id, e.date, e.title, e.content, q.version
+                FROM journal_analysis_queue q
+                JOIN journal_entries e ON e.id = q.entry_id
+                WHERE q.entry_id > ? AND q.entry_id <= ?
+                ORDER BY q.entry_id
+                LIMIT ?
+            ''', (after_queued_id, after_entry_id, batch_size)).fetchall()
+        if not rows:
+            break
+        yield True, rows
+        after_queued_id = rows[-1][0]
+    while True:
+        with unit_of_work() as conn:
+            rows = conn.execute('''
+                SELECT id, user_id, date, title, content, NULL
+                FROM journal_entries
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (after_entry_id, batch_size)).fetchall()
+        if not rows:
+            return
+        yield False, rows
+        after_entry_id = rows[-1][0]
+
+def _write_batch(requeued, results):
+    """Stores an analysed batch and, in the same transaction, advances the checkpoint or clears the queued edits."""
+    with unit_of_work(immediate=True) as conn:
+        conn.executemany(SAVE_EMOTIONS_SQL, [(*result[:-1], result[0]) for result in results])
+        if requeued:
+            # An entry edited again since it was read keeps its newer version queued
+            conn.executemany('DELETE FROM journal_analysis_queue WHERE entry_id = ? AND version = ?',
+                             [(result[0], result[-1]) for result in results])
+            conn.execute("UPDATE journal_analysis_state SET updated_at = DATETIME('now') WHERE id = 1")
+        else:
+            conn.execute('''
+                UPDATE journal_analysis_state
+                SET last_entry_id = ?, entries_analysed = entries_analysed + ?, updated_at = DATETIME('now')
+                WHERE id = 1
+            ''', (results[-1][0], len(results)))
+
+def run_journal_analysis(batch_size=1_000, workers=None):
+    """Analyses every journal entry added or edited since the last run and returns the number analysed."""
+    migrate_database()
+    workers = workers or os.cpu_count() or 1
+    with unit_of_work() as conn:
+        last_entry_id = conn.execute('SELECT last_entry_id FROM journal_analysis_state WHERE id = 1').fetchone()[0]
+        # Queued entries that were deleted have nothing left to analyse
+        conn.execute('DELETE FROM journal_analysis_queue WHERE entry_id NOT IN (SELECT id FROM journal_entries)')
+
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    in_flight = deque()
+    analysed = 0
+    start = time.perf_counter()
+
+    def write_oldest():
+        nonlocal analysed
+        requeued, pending = in_flight.popleft()
+        results = pending.result() if executor else pending
+        analysed += len(results)
+        _write_batch(requeued, results)
+
+    try:
+        for requeued, rows in _read_batches(last_entry_id, batch_size):
+            pending = executor.submit(analyse_batch, rows) if executor else analyse_batch(rows)
+            in_flight.append((requeued, pending))
+            # Write in id order so the checkpoint never skips an unwritten batch
+            if len(in_flight) >= 2 * workers:
+                write_oldest()
+        while in_flight:
+            write_oldest()
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    if analysed:
+        rate = analysed / elapsed if elapsed else 0.0
+        print(f"Analysed {analysed:,} journal entries in {elapsed:.2f} s ({rate:,.0f} entries/s, {workers} workers).")
+    return analysed
+
+def main():
+    parser = argparse.ArgumentParser(description="Score the emotions and keywords of new and edited journal entries.")
+    parser.add_argument('--batch-size', type=int, default=1_000, help="Entries analysed per batch and per transaction.")
+    parser.add_argument('--workers', type=int, default=None, help="Analysis processes (default: one per core).")
+    parser.add_argument('--watch', type=float, default=None, metavar='SECONDS',
+                        help="Keep running, looking for new entries every SECONDS.")
+    args = parser.parse_args()
+    while True:
+        run_journal_analysis(args.batch_size, args.workers)
+        if args.watch is None:
+            break
+        time.sleep(args.watch)
+
+if __name__ == "__main__":
+    main()
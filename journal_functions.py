@@ -0,0 +1,109 @@
+import re
+from database_functions import unit_of_work
+
+# -------------------- Journal --------------------
+# The Journal tab lists entries a page at a time, newest first. Pages are keyset
+# paginated on (date, id), so reading the hundredth page costs the same as the first,
+# and list queries are served from idx_journal_entries_listing, which holds each
+# entry's title and stored preview: an entry's full content is only read when the user
+# opens it.
+
+JOURNAL_PAGE_SIZE = 20
+
+def list_journal_entries(user_id, before=None, limit=JOURNAL_PAGE_SIZE):
+    """Returns (entries, next_cursor) for one page of the user's journal.
+
+    entries are (id, title, date, preview) tuples, newest first, starting after the
+    cursor before (a (date, id) pair; None for the newest page). next_cursor is the
+    cursor of the following page, or None when this is the last one.
+    """
+    with unit_of_work() as conn:
+        if before is None:
+            entries = conn.execute('''
+                SELECT id, title, date, preview
+                FROM journal_entries
+                WHERE user_id = ?
+                ORDER BY date DESC, id DESC
+                LIMIT ?
+            ''', (user_id, limit + 1)).fetchall()
+        else:
+            entries = conn.execute('''
+                SELECT id, title, date, preview
+                FROM journal_entries
+                WHERE user_id = ? AND (date, id) < (?, ?)
+                ORDER BY date DESC, id DESC
+                LIMIT ?
+            ''', (user_id, *before, limit + 1)).fetchall()
+    if len(entries) <= limit:
+        return entries, None
+    entries = entries[:limit]
+    return entries, (entries[-1][2], entries[-1][0])
+
+def get_journal_content(user_id, entry_id):
+    """Returns the full content of one of the user's journal entries, or None."""
+    with unit_of_work() as conn:
+        row = conn.execute('SELECT content FROM journal_entries WHERE id = ? AND user_id = ?',
+                           (entry_id, user_id)).fetchone()
+    return row[0] if row else None
+
+def save_journal_entry(user_id, title, entry_date, content):
+    """Saves a new journal entry for the given user (its preview is filled in by a trigger)."""
+    with unit_of_work() as conn:
+        conn.execute('INSERT INTO journal_entries (user_id, title, date, content) VALUES (?, ?, ?, ?)',
+                     (user_id, title, entry_date, content))
+
+def delete_journal_entry(user_id, entry_id):
+    """Deletes one of the user's journal entries."""
+    with unit_of_work() as conn:
+        conn.execute('DELETE FROM journal_entries WHERE id = ? AND user_id = ?', (entry_id, user_id))
+
+# -------------------- Journal Search --------------------
+# Searches go through the journal_search FTS5 index (see _migration_012_journal_search).
+# Every query is restricted to the user's own entries by their owner token, so its cost
+# follows the size of one journal. Ranking by relevance (bm25, with title matches
+# weighted above content) also counts each term's matches across the whole index, so
+# words found in most entries take longer to rank (about 50-160 ms over two million
+# entries); ordering by date skips that step and stays within a few milliseconds.
+
+SEARCH_ORDERS = {
+    'relevance': 'bm25(journal_search, 10.0, 1.0, 0.0)',
+    'newest': 'journal_entries.date DESC, journal_entries.id DESC',
+}
+
+def journal_match_expression(user_id, text):
+    """Returns the FTS5 query matching every word of text in the user's entries, or None without words.
+
+    Words are quoted, so characters with a meaning in the FTS5 query syntax are searched literally.
+    """
+    words = re.findall(r'\w+', text.lower())
+    if not words:
+        return None
+    phrases = ' '.join(f'"{word}"' for word in words)
+    return f'owner:u{int(user_id)} AND {{title content}}: ({phrases})'
+
+def search_journal_entries(user_id, text, start=None, end=None, order='relevance', limit=JOURNAL_PAGE_SIZE):
+    """Returns up to limit of the user's entries matching every word of text, as (id, title, date, snippet) tuples.
+
+    start and end optionally bound the entry dates (dates or ISO strings, inclusive). Snippets are about a dozen
+    words of content around the matches, with the matched words wrapped in <mark> tags.
+    """
+    expression = journal_match_expression(user_id, text)
+    if expression is None:
+        return []
+    conditions, params = ['journal_search MATCH ?'], [expression]
+    if start is not None:
+        conditions.append('journal_entries.date >= ?')
+        params.append(str(start))
+    if end is not None:
+        conditions.append('journal_entries.date <= ?')
+        params.append(str(end))
+    with unit_of_work() as conn:
+        return conn.execute(f'''
+            SELECT journal_entries.id, journal_entries.title, journal_entries.date,
+                   snippet(journal_search, 1, '<mark>', '</mark>', '…', 12)
+            FROM journal_search
+            JOIN journal_entries ON journal_entries.id = journal_search.rowid
+            WHERE {' AND '.join(conditions)}
+            ORDER BY {SEARCH_ORDERS[order]}
+            LIMIT ?
+        ''', (*params, limit)).fetchall()
@@ -9,111 +9,23 @@ from urllib.parse import urlencode
 import plotly.graph_objects as go
 import matplotlib.pyplot as plt
 import altair as alt
-from fitbit_data import FitbitDataRetriever
 from pytz import timezone
 import pytz
 import random 
-from survey_functions import has_submitted_survey_today, update_survey_submission_timestamp, load_recent_survey_data
-from fitbit_functions import save_fitbit_tokens, get_fitbit_tokens
-from google_API_functions import get_calendar_service, schedule_event, schedule_custom_task, get_weekly_calendar_events
-from to_do_functions import save_todo, get_todo_list, update_todo_status, delete_todo
-from burnout_predictions_functions import save_burnout_percentage, get_burnout_history
-from database_functions import create_database, update_database_schema
-from user_profile_functions import save_user_profile, load_user_profile
-
-# -------------------- Model Definition --------------------
-
-def predict_burnout_risk(age, gender, work_hours=8.0, sleep_hours=7.0, weekend_overtime=0.0,
-                         stress_level=5, job_avg_stress=5, education=1, city='Small',
-                         family_size=0, num_pets=0, exercise_hours=1.0, remote_percentage=0.5):
-    
-    score = 0
-    # Age: older age reduces burnout risk
-    score += -0.2 * age  
-    # Gender: female workers have a higher risk
-    score += 0.7 if gender.lower() == 'female' else 0
-
-    # Work hours: baseline for first 8 hours and extra for overtime
-    baseline_hours = 8
-    score += 0.3 * min(work_hours, baseline_hours)
-    score += 0.5 * max(0, work_hours - baseline_hours)
-
-    # Sleep: more sleep reduces risk
-    score += -0.4 * sleep_hours
-    # Overtime: increased weekend overtime increases risk
-    score += 0.6 * weekend_overtime
-
-    # Stress factors: higher stress strongly increases burnout risk
-    score += 1.0 * stress_level
-    score += 0.8 * job_avg_stress
-
-    # Education: higher education increases risk
-    score += 0.2 * education
-    # City: living in a big city adds a modest risk
-    score += 0.3 if city.lower() == 'big' else 0
-
-    # Family size: larger family responsibilities might increase risk
-    score += 0.1 * family_size
-    # Pets: presence of pets might help reduce stress
-    score += -0.2 * num_pets
-    # Exercise: more exercise reduces burnout risk
-    score += -0.3 * exercise_hours
-    # Remote work: higher remote percentage might increase risk (but effect is moderated)
-    score += 0.4 * remote_percentage
-
-    # Daily steps: more steps are linked with lower burnout risk
-    # Here, we subtract 0.0002 per step (i.e., ~2 points reduction for 10,000 steps)
-#    score += -0.0002 * daily_steps
-    # ------------------------------
-    # Scale score to percentage (0-100%)
-    # ------------------------------
-    MIN_SCORE = -10  
-    MAX_SCORE = 20  
-    risk_percentage = (score - MIN_SCORE) / (MAX_SCORE - MIN_SCORE) * 100
-    risk_percentage = max(0, min(100, risk_percentage)) 
-
-    return risk_percentage, score
-
-# -------------------- Job Stress Dictionary --------------------
-
-job_stress_levels = {
-    "Air Traffic Controller": 9,
-    "Surgeon": 9,
-    "Firefighter": 8,
-    "Commercial Airline Pilot": 8,
-    "Police Officer": 8,
-    "Corporate Executive": 7,
-    "Journalist": 7,
-    "Emergency Medical Technician (EMT)": 7,
-    "Stockbroker": 7,
-    "Event Coordinator": 6,
-    "Teacher": 6,
-    "Nurse": 6,
-    "IT Manager": 6,
-    "Sales Manager": 6,
-    "Social Worker": 6,
-    "Engineer": 5,
-    "Accountant": 5,
-    "Architect": 5,
-    "Electrician": 5,
-    "Customer Service Representative": 5,
-    "Administrative Assistant": 4,
-    "Graphic Designer": 4,
-    "Librarian": 3,
-    "Data Entry Clerk": 3,
-    "Translator": 3,
-    "Receptionist": 3,
-    "Florist": 2,
-    "Tailor": 2,
-    "Student": 7,
-    "Stay-at-Home Parent": 7
-}
-
-# -------------------- Age Calculation Function --------------------
-def calculate_age(dob):
-        """Calculates the age based on the date of birth."""
-        today = date.today()
-        return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+import os
+from time import perf_counter
+from survey_functions import has_submitted_survey_today, update_survey_submission_timestamp, save_survey_submission
+from fitbit_functions import FitbitDataRetriever, save_fitbit_tokens, get_fitbit_tokens
+from google_API_functions import schedule_event, schedule_custom_task, get_weekly_calendar_events, delete_calendar_event
+from to_do_functions import save_todo, update_todo_status, delete_todo
+from journal_functions import (SEARCH_ORDERS, delete_journal_entry, get_journal_content, list_journal_entries,
+                               save_journal_entry, search_journal_entries)
+from dashboard_functions import get_dashboard_snapshot, get_history_window, history_figure, invalidate_dashboard_snapshot
+from burnout_predictions_functions import HISTORY_WINDOWS, compute_inputs_hash, save_burnout_percentage
+from database_functions import migrate_database, unit_of_work
+from user_profile_functions import save_user_profile, load_user_profile, store_profile_score
+from burnout_model_functions import daily_score, job_stress_levels
+from model_registry_functions import LinearRuleModel, load_model, model_inputs
 
 # -------------------- Streamlit Pages --------------------
 def hash_password(password):
@@ -183,11 +95,10 @@ def sign_in():
     password = st.text_input("Password", type="password", placeholder="Enter your password")
 
     if st.button("Let's start"):
-        conn = sqlite3.connect('user_data.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, password FROM users WHERE email = ?', (email,))
-        user = cursor.fetchone()
-        conn.close()
+        with unit_of_work() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id, password FROM users WHERE email = ?', (email,))
+            user = cursor.fetchone()
 
         if user:
             user_id, hashed_password = user
@@ -279,19 +190,16 @@ def create_account():
 
             hashed_password = hash_password(password)
 
-            conn = sqlite3.connect('user_data.db')
-            cursor = conn.cursor()
             try:
-                cursor.execute('INSERT INTO users (email, password) VALUES (?, ?)', (email, hashed_password))
-                conn.commit()
-                user_id = cursor.lastrowid
+                with unit_of_work() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('INSERT INTO users (email, password) VALUES (?, ?)', (email, hashed_password))
+                    user_id = cursor.lastrowid
                 st.session_state['user_id'] = user_id
                 st.session_state['page'] = 'onboarding'
                 st.success("Account created successfully! Redirecting to onboarding...")
             except sqlite3.IntegrityError:
                 st.error("An account with this email already exists. Please sign in.")
-            finally:
-                conn.close()
 
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -347,11 +255,10 @@ def onboarding():
         return
 
     # Avoid duplicate onboarding
-    conn = sqlite3.connect('user_data.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM user_profile WHERE user_id = ?', (user_id,))
-    profile = cursor.fetchone()
-    conn.close()
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM user_profile WHERE user_id = ?', (user_id,))
+        profile = cursor.fetchone()
 
     if profile:
         st.info("Profile already exists. Redirecting to the main page...")
@@ -369,23 +276,30 @@ def onboarding():
     remote_percentage = st.slider('Remote Work Percentage', 0.0, 1.0, 0.5)
     job = st.selectbox('Job', list(job_stress_levels.keys()))
 
-    fitbit_retriever = FitbitDataRetriever('23Q56Z', '1ed3890271875514537ca3067417a496')
+    # The retriever keeps its OAuth session across reruns until the callback URL is submitted;
+    # the tokens go to fitbit_tokens, where the client registry and fitbit_sync.py pick them up
+    fitbit_retriever = st.session_state.setdefault(
+        'fitbit_retriever', FitbitDataRetriever('23Q56Z', '1ed3890271875514537ca3067417a496'))
     if st.button("Connect Fitbit"):
-        fitbit_retriever.authorize()
+        st.session_state['fitbit_connecting'] = True
+    if st.session_state.get('fitbit_connecting') and fitbit_retriever.authorize(st.session_state['email']):
+        st.session_state['fitbit_connecting'] = False
 
     # Save profile
     if st.button("Save Profile"):
         education_map = {'High School': 1, 'Bachelor': 2, 'Master': 3, 'PhD': 4}
         education_numeric = education_map[education]
 
-        conn = sqlite3.connect('user_data.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO user_profile (user_id, name, dob, gender, family_size, num_pets, city, education, remote_percentage, job)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, name, dob, gender, family_size, num_pets, city, education_numeric, remote_percentage, job))
-        conn.commit()
-        conn.close()
+        with unit_of_work() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO user_profile (user_id, name, dob, gender, family_size, num_pets, city, education, remote_percentage, job)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, name, dob, gender, family_size, num_pets, city, education_numeric, remote_percentage, job))
+            store_profile_score(user_id, {'dob': dob, 'gender': gender, 'family_size': family_size, 'num_pets': num_pets,
+                                          'city': city, 'education': education_numeric,
+                                          'remote_percentage': remote_percentage, 'job': job})
+        invalidate_dashboard_snapshot()
 
         st.success("✅ Profile saved! Redirecting to the daily stress survey...")
         st.session_state['page'] = 'daily_stress_survey'
@@ -475,14 +389,8 @@ def daily_stress_survey():
     # Submit button
     if st.button("Submit Survey"):
         # Save the survey data to the database
-        conn = sqlite3.connect('user_data.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO daily_stress_submissions (user_id, last_submission, mood, stress_level, work_hours, weekend_overtime, exercise_hours, sleep_hours)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f'), selected_mood, stress_level, work_hours, weekend_overtime, exercise_hours, sleep_hours))
-        conn.commit()
-        conn.close()
+        save_survey_submission(user_id, selected_mood, stress_level, work_hours, weekend_overtime, exercise_hours, sleep_hours)
+        invalidate_dashboard_snapshot()
 
         st.success("Thank you for submitting the survey! Redirecting to the main page...")
         st.session_state['page'] = 'main'
@@ -538,35 +446,63 @@ def main_page():
         st.session_state['page'] = 'sign_in'
         return
 
-    survey_data = load_recent_survey_data(user_id)
+    # All dashboard reads come from one cached snapshot, reloaded only after writes
+    render_start = perf_counter()
+    snapshot = get_dashboard_snapshot(user_id)
+    survey_data = snapshot.survey
     if not survey_data:
         st.error("Survey data not found. Redirecting to daily stress survey...")
         st.session_state['page'] = 'daily_stress_survey'
         return
 
-    # Load user profile
-    conn = sqlite3.connect('user_data.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM user_profile WHERE user_id = ?', (user_id,))
-    user = cursor.fetchone()
-    conn.close()
-
+    user = snapshot.profile
     if not user:
         st.error("User profile not found. Redirecting to onboarding...")
         st.session_state['page'] = 'onboarding'
         return
 
-    dob = datetime.strptime(user[1], '%Y-%m-%d').date()
-    gender = user[2]
-    family_size = user[3]
-    num_pets = user[4]
-    city = user[5]
-    education = user[6]
-    remote_percentage = user[7]
-    job = user[8]
-    age = calculate_age(dob)
-    job_avg_stress = job_stress_levels.get(job, 5)
-    name=user[9]
+    name = user['name']
+
+    # The profile part of the score was stored with the profile; it is only recomputed
+    # here when it is missing or a birthday has passed since
+    profile_component = snapshot.profile_score
+    if profile_component is None or profile_component[1] <= date.today().isoformat():
+        profile_component = snapshot.profile_score = store_profile_score(user_id, user)
+
+    # Fitbit features were precomputed by the sync job; no API call while rendering
+    daily_steps = snapshot.fitbit_features['steps'] if snapshot.fitbit_features else None
+    daily_inputs = (
+    survey_data['work_hours'], survey_data['sleep_hours'], survey_data['weekend_overtime'],
+    survey_data['stress_level'], survey_data['exercise_hours'], daily_steps
+    )
+    # Only rescore (and write) when today's inputs differ from the stored result
+    model = load_model()
+    if model.kind == LinearRuleModel.kind:
+        # The built-in rule only needs the stored profile part plus the daily terms
+        inputs_hash = compute_inputs_hash(profile_component[0], *daily_inputs)
+    else:
+        inputs = model_inputs(profile_component[2], user, daily_inputs)
+        inputs_hash = compute_inputs_hash(model.name, *inputs.values())
+    todays_burnout = snapshot.todays_burnout
+    if todays_burnout and todays_burnout[1] == inputs_hash:
+        risk_percentage = todays_burnout[0]
+    else:
+        if model.kind == LinearRuleModel.kind:
+            risk_percentage, _ = daily_score(profile_component[0], *daily_inputs)
+        else:
+            risk_percentage = model.predict_one(**inputs)
+        if save_burnout_percentage(user_id, risk_percentage, inputs_hash):
+            invalidate_dashboard_snapshot()
+            snapshot = get_dashboard_snapshot(user_id)
+
+    history = snapshot.history
+    todo_tasks = snapshot.todos
+    data_ms = (perf_counter() - render_start) * 1000
+
+    if os.environ.get('EXHALE_SHOW_TIMINGS'):
+        with st.expander("Render timings"):
+            st.write({**{f"snapshot.{stage}": round(ms, 3) for stage, ms in snapshot.timings.items()},
+                      'data_access_total': round(data_ms, 3)})
 
     tab1, tab2 = st.tabs(["Home", "Journal"])
 
@@ -574,14 +510,6 @@ def main_page():
     with tab1:
         st.markdown(f"""<h1 style="font-size: 48px; font-weight: bold; color: #a3c9a8; text-align: left;">Welcome Back {name}</h1>""", unsafe_allow_html=True)
 
-        risk_percentage, risk_factors = predict_burnout_risk(
-        age, gender, survey_data['work_hours'], survey_data['sleep_hours'],
-        survey_data['weekend_overtime'], survey_data['stress_level'],
-        job_avg_stress, education, city, family_size, num_pets,
-        survey_data['exercise_hours'], remote_percentage
-        )
-        save_burnout_percentage(user_id, risk_percentage)
-
         # Now use risk_percentage
         fig = go.Figure(go.Indicator(
             mode="gauge+number",
@@ -608,8 +536,6 @@ def main_page():
         st.markdown("</div>", unsafe_allow_html=True)
 
         #Wellness Recommendations
-        from datetime import date
-
         st.markdown("<h3 style='font-size: 20px; color: #457B9D; text-align: left;'><b><i>Wellness Recommendations</i></b></h3>", unsafe_allow_html=True)
         # Define tasks based on risk levels and categories
         tasks = {
@@ -665,8 +591,7 @@ def main_page():
         st.markdown("<br>", unsafe_allow_html=True)
 
         # Burnout Risk History Line Chart
-        history = get_burnout_history(user_id)
-        if history:
+        if history[0]:
             # Add a styled title for "Your Burnout History"
             st.markdown("""
             <div style="
@@ -679,42 +604,10 @@ def main_page():
             </div>
             """, unsafe_allow_html=True)
 
-            # Extract dates and percentages from the history
-            dates = [row[0] for row in history]
-            percentages = [row[1] for row in history]
-
-            # Format dates to exclude time and ensure uniqueness
-            unique_dates = list(dict.fromkeys(dates)) 
-            unique_percentages = [percentages[dates.index(d)] for d in unique_dates]  
-
-            # Create a line chart using Plotly
-            fig = px.line(
-                x=unique_dates[::-1], 
-                y=unique_percentages[::-1],
-                labels={'x': 'Date', 'y': 'Burnout Risk (%)'},
-                title=None  # Remove the default title
-            )
-            fig.update_traces(mode='lines+markers', line=dict(color='#d8bfd8'))
-            fig.update_layout(
-                xaxis=dict(
-                    title=None,
-                    showgrid=True,
-                    zeroline=True,
-                    zerolinecolor='darkgray',
-                    zerolinewidth=1,
-                    tickformat='%Y-%m-%d',  
-                    tickangle=45
-                ),
-                yaxis=dict(
-                    title='Burnout Risk (%)',
-                    showgrid=True,
-                    zeroline=True,
-                    zerolinecolor='darkgray',
-                    zerolinewidth=1
-                ),
-                plot_bgcolor='white'
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            # Chart-ready series from the snapshot; longer windows come downsampled to weekly or
+            # monthly points, and the figure spec is memoized until the history changes
+            window = st.radio("History window", list(HISTORY_WINDOWS), horizontal=True, key='history_window')
+            st.plotly_chart(history_figure(user_id, get_history_window(snapshot, window)), use_container_width=True)
         else:
             st.info("No burnout history available. Complete the daily stress survey to start tracking.")
 
@@ -733,7 +626,7 @@ def main_page():
                 <h3 style="color: white; text-align: center;">To-Do List</h3>
             """, unsafe_allow_html=True)
 
-            tasks = get_todo_list(user_id)
+            tasks = todo_tasks
             if tasks:
                 for task_id, task_text, completed in tasks:
                     task_col1, task_col2 = st.columns([0.8, 0.2])
@@ -742,6 +635,7 @@ def main_page():
                         checked = st.checkbox(task_text, value=completed, key=f"task_{task_id}")
                         if checked != completed:
                             update_todo_status(user_id, task_id, checked)
+                            invalidate_dashboard_snapshot()
                             st.rerun()
                     with task_col2:
                         # Green Delete Button
@@ -764,6 +658,7 @@ def main_page():
                         st.markdown(delete_button_style, unsafe_allow_html=True)
                         if st.button("✖", key=f"delete_{task_id}"):
                             delete_todo(user_id, task_id)
+                            invalidate_dashboard_snapshot()
                             st.rerun()
             else:
                 st.markdown("<p style='color: white; text-align: center;'>No tasks available. Add a new task below!</p>", unsafe_allow_html=True)
@@ -773,6 +668,7 @@ def main_page():
             add_task_button = st.button("Add Task", key="add_task_button")
             if add_task_button and new_task.strip():
                 save_todo(user_id, new_task.strip())
+                invalidate_dashboard_snapshot()
                 st.rerun()
 
 
@@ -875,8 +771,7 @@ def main_page():
                     event_label = f"{e['Event']} ({e['Start'].strftime('%A %H:%M')})"
                     delete_key = f"del_{e.get('EventID', event_label)}"
                     if st.button(f"Delete {event_label}", key=delete_key):
-                        service = get_calendar_service()
-                        service.events().delete(calendarId='primary', eventId=e['EventID']).execute()
+                        delete_calendar_event(e['EventID'])
                         st.success(f"Deleted event: {e['Event']}")
                         st.rerun()
         else:
@@ -886,72 +781,90 @@ def main_page():
     # --- TAB 2: Journal ---
 
     with tab2:
-        # Database connection for journals
-        conn = sqlite3.connect('user_data.db')
-        cursor = conn.cursor()
+        # Full-text search over the user's entries; the paged listing shows while the box is empty
+        search_text = st.text_input("Search your journal", placeholder="Words to look for...",
+                                    key='journal_search_text')
+        if search_text.strip():
+            col_from, col_to, col_order = st.columns(3)
+            with col_from:
+                search_from = st.date_input("From", value=None, key='journal_search_from')
+            with col_to:
+                search_to = st.date_input("To", value=None, key='journal_search_to')
+            with col_order:
+                search_order = st.selectbox("Sort by", list(SEARCH_ORDERS), key='journal_search_order')
+            search_results = search_journal_entries(user_id, search_text, search_from, search_to, search_order)
+            if not search_results:
+                st.info("No journal entries match your search.")
+            for entry_id, title, journal_date, snippet in search_results:
+                st.markdown(f"""
+                <div style="
+                    background: #f7f5f2;
+                    border-radius: 10px;
+                    padding: 15px;
+                    margin-bottom: 10px;
+                    box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+                ">
+                    <h4 style="color: #457B9D; margin-bottom: 5px;">{title}</h4>
+                    <p style="color: gray; font-size: 12px; margin-bottom: 10px;">{journal_date}</p>
+                    <p style="color: #333; font-size: 14px;">{snippet}</p>
+                </div>
+                """, unsafe_allow_html=True)
+        else:
+            # One keyset page of titles and previews per rerun; the cursor stack lets the
+            # user page back to newer entries
+            cursors = st.session_state.setdefault(f'journal_cursors_{user_id}', [None])
+            journal_entries, next_cursor = list_journal_entries(user_id, cursors[-1])
+
+            # Display past journal entries as boxes
+            if journal_entries:
+                st.markdown("""
+                <div style="margin-bottom: 20px;">
+                    <h3 style="color: #B392AC; text-align: center;">Your Past Journals</h3>
+                </div>
+                """, unsafe_allow_html=True)
 
-        # Create the journal table if it doesn't exist
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS journal_entries (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                title TEXT,
-                date DATE,
-                content TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        conn.commit()
-
-        # Fetch past journal entries for the user
-        cursor.execute('''
-            SELECT title, date, content
-            FROM journal_entries
-            WHERE user_id = ?
-            ORDER BY date DESC
-        ''', (user_id,))
-        journal_entries = cursor.fetchall()
-        conn.close()
-
-        # Display past journal entries as boxes
-        if journal_entries:
-            st.markdown("""
-            <div style="margin-bottom: 20px;">
-                <h3 style="color: #B392AC; text-align: center;">Your Past Journals</h3>
-            </div>
-            """, unsafe_allow_html=True)
+                for entry_id, title, journal_date, preview in journal_entries:
+                    col_journal, col_delete = st.columns([0.9, 0.1]) 
+                    with col_journal:
+                        # The full entry is only read from the database once it is opened
+                        show_full = st.session_state.get(f'journal_open_{entry_id}', False)
+                        content = get_journal_content(user_id, entry_id) if show_full else preview
+                        st.markdown(f"""
+                        <div style="
+                            background: #f7f5f2;
+                            border-radius: 10px;
+                            padding: 15px;
+                            margin-bottom: 10px;
+                            box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+                        ">
+                            <h4 style="color: #457B9D; margin-bottom: 5px;">{title}</h4>
+                            <p style="color: gray; font-size: 12px; margin-bottom: 10px;">{journal_date}</p>
+                            <p style="color: #333; font-size: 14px;">{content}</p>
+                        </div>
+                        """, unsafe_allow_html=True)
+                        if preview and preview.endswith('…'):
+                            st.toggle("Show full entry", key=f'journal_open_{entry_id}')
+                    with col_delete:
+                        # Add a delete button for each journal entry
+                        if st.button("✖", key=f"delete_journal_{entry_id}"):
+                            delete_journal_entry(user_id, entry_id)
+                            st.rerun()
 
-            for title, journal_date, content in journal_entries:
-                col_journal, col_delete = st.columns([0.9, 0.1]) 
-                with col_journal:
-                    st.markdown(f"""
-                    <div style="
-                        background: #f7f5f2;
-                        border-radius: 10px;
-                        padding: 15px;
-                        margin-bottom: 10px;
-                        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-                    ">
-                        <h4 style="color: #457B9D; margin-bottom: 5px;">{title}</h4>
-                        <p style="color: gray; font-size: 12px; margin-bottom: 10px;">{journal_date}</p>
-                        <p style="color: #333; font-size: 14px;">{content}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                with col_delete:
-                    # Add a delete button for each journal entry
-                    delete_key=f'delete_{user_id}_{title}_{journal_date}'
-                    if st.button("✖", key=f"delete_{title}_{journal_date}"):
-                        conn = sqlite3.connect('user_data.db')
-                        cursor = conn.cursor()
-                        cursor.execute('''
-                            DELETE FROM journal_entries
-                            WHERE user_id = ? AND title = ? AND date = ?
-                        ''', (user_id, title, journal_date))
-                        conn.commit()
-                        conn.close()
+                col_newer, col_older = st.columns(2)
+                with col_newer:
+                    if len(cursors) > 1 and st.button("Newer entries"):
+                        cursors.pop()
                         st.rerun()
-        else:
-            st.info("No journal entries found. Start by creating your first journal entry below!")
+                with col_older:
+                    if next_cursor is not None and st.button("Older entries"):
+                        cursors.append(next_cursor)
+                        st.rerun()
+            elif len(cursors) > 1:
+                # The page became empty (e.g. its last entry was deleted); go back one page
+                cursors.pop()
+                st.rerun()
+            else:
+                st.info("No journal entries found. Start by creating your first journal entry below!")
 
         # Section to create a new journal entry
         st.markdown("""
@@ -968,14 +881,8 @@ def main_page():
         # Save the new journal entry
         if st.button("Save Journal Entry"):
             if journal_title.strip() and journal_content.strip():
-                conn = sqlite3.connect('user_data.db')
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO journal_entries (user_id, title, date, content)
-                    VALUES (?, ?, ?, ?)
-                ''', (user_id, journal_title.strip(), journal_date, journal_content.strip()))
-                conn.commit()
-                conn.close()
+                save_journal_entry(user_id, journal_title.strip(), journal_date, journal_content.strip())
+                st.session_state[f'journal_cursors_{user_id}'] = [None]  # show the newest page, with the new entry
                 st.success("Journal entry saved successfully!")
                 st.rerun()  # Refresh the page to show the new entry
             else:
@@ -983,8 +890,12 @@ def main_page():
 
 # -------------------- App Initialization --------------------
 
-create_database()
-update_database_schema()
+@st.cache_resource
+def init_database():
+    """Brings the database schema up to date once per process instead of on every rerun."""
+    return migrate_database()
+
+init_database()
 
 if 'page' not in st.session_state:
     st.session_state['page'] = 'sign_in'
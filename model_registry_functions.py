@@ -0,0 +1,258 @@
+import json
+import os
+import re
+import threading
+import warnings
+import numpy as np
+from burnout_model_functions import (DAILY_INPUTS, FEATURE_NAMES, feature_matrix, job_stress_levels,
+                                     predict_burnout_risk_batch)
+
+# -------------------- Model Registry --------------------
+# Every burnout model scores the same inputs as predict_burnout_risk_batch and returns
+# risk percentages (0-100). Trained models are stored as versioned artifacts under
+# MODEL_DIR/<kind>/<version>.npz: plain NumPy arrays plus a JSON metadata entry, loaded
+# without pickle and scored with NumPy only (scikit-learn is needed to fit, not to
+# predict). A model is loaded at most once per process and then shared by all callers.
+#
+# Models are named '<kind>@<version>'; a bare '<kind>' means its latest version. The
+# hand-written rule is the built-in 'linear_rule@builtin' and stays the default until
+# EXHALE_MODEL names another one.
+
+MODEL_DIR = os.environ.get('EXHALE_MODEL_DIR', 'models')
+ACTIVE_MODEL = os.environ.get('EXHALE_MODEL', 'linear_rule')
+PREDICT_CHUNK_ROWS = 16_384     # rows walked through each tree at once by GradientBoostingModel
+
+def _json_params(estimator):
+    """Returns the estimator's parameters that can be stored as JSON metadata."""
+    return {key: value for key, value in estimator.get_params().items()
+            if isinstance(value, (int, float, str, bool, type(None)))}
+
+def _fill_values(matrix):
+    """Returns each feature's median, used in place of missing values (0 for a feature never seen)."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN columns
+        fill = np.nanmedian(matrix, axis=0)
+    return np.nan_to_num(fill, nan=0.0)
+
+class BurnoutModel:
+    """A versioned burnout model; subclasses implement predict_batch."""
+    kind = None
+
+    def __init__(self, version=None, arrays=None, metadata=None):
+        self.version = version
+        self.arrays = arrays or {}
+        self.metadata = metadata or {}
+
+    @property
+    def name(self):
+        return f'{self.kind}@{self.version}'
+
+    @property
+    def nbytes(self):
+        """Memory held by the model's arrays."""
+        return sum(array.nbytes for array in self.arrays.values())
+
+    def predict_batch(self, features):
+        """Returns the risk percentage of every row of features (a DataFrame or dict of columns)."""
+        raise NotImplementedError
+
+    def predict_one(self, **inputs):
+        """Returns the risk percentage for one user's predict_burnout_risk arguments."""
+        return float(self.predict_batch({name: [value] for name, value in inputs.items()})[0])
+
+    def _filled_matrix(self, features):
+        """Returns the feature matrix with missing values replaced by the training fill values."""
+        matrix = feature_matrix(features)
+        missing = np.isnan(matrix)
+        if missing.any():
+            matrix[missing] = np.broadcast_to(self.arrays['fill'], matrix.shape)[missing]
+        return matrix
+
+class LinearRuleModel(BurnoutModel):
+    """The hand-written weights of predict_burnout_risk."""
+    kind = 'linear_rule'
+
+    def __init__(self, version='builtin', arrays=None, metadata=None):
+        super().__init__(version, arrays, metadata)
+
+    def predict_batch(self, features):
+        return predict_burnout_risk_batch(features)[0]
+
+class LogisticRegressionModel(BurnoutModel):
+    """Standardized logistic regression; arrays: fill, mean, scale, coef, intercept."""
+    kind = 'logistic_regression'
+
+    def predict_batch(self, features):
+        a = self.arrays
+        z = ((self._filled_matrix(features) - a['mean']) / a['scale']) @ a['coef'] + a['intercept'][0]
+        return 100.0 / (1.0 + np.exp(-z))
+
+    @classmethod
+    def fit(cls, matrix, labels, version=None, **params):
+        """Fits on a FEATURE_NAMES matrix (float32 or float64) and 0/1 labels (needs scikit-learn)."""
+        from sklearn.linear_model import LogisticRegression
+
+        fill = _fill_values(matrix)
+        matrix = np.where(np.isnan(matrix), fill, matrix)
+        mean, scale = matrix.mean(axis=0), matrix.std(axis=0)
+        scale[scale == 0] = 1.0
+        fitted = LogisticRegression(max_iter=params.pop('max_iter', 1000), **params).fit((matrix - mean) / scale, labels)
+        arrays = {'fill': fill.astype(np.float64), 'mean': mean.astype(np.float64), 'scale': scale.astype(np.float64),
+                  'coef': fitted.coef_[0].astype(np.float64), 'intercept': fitted.intercept_.astype(np.float64)}
+        return cls(version, arrays, {'params': _json_params(fitted)})
+
+class GradientBoostingModel(BurnoutModel):
+    """Boosted regression trees on the log-odds, flattened into node arrays.
+
+    arrays: fill, feature/threshold/left/right/value per node (all trees concatenated),
+    roots (first node of each tree) and init (starting log-odds). Leaves point to
+    themselves, so every row walks exactly max_depth steps.
+    """
+    kind = 'gradient_boosting'
+
+    def __init__(self, version=None, arrays=None, metadata=None):
+        super().__init__(version, arrays, metadata)
+        # Index arrays in the form the walk uses: children[node * 2 + went_right]
+        self._children = np.stack([self.arrays['left'], self.arrays['right']], axis=1).ravel().astype(np.intp)
+        self._feature = self.arrays['feature'].astype(np.intp)
+
+    def predict_batch(self, features):
+        a = self.arrays
+        # The trees were grown on float32 features; compare the same rounded values
+        matrix = self._filled_matrix(features).astype(np.float32)
+        raw = np.full(len(matrix), a['init'][0])
+        for start in range(0, len(matrix), PREDICT_CHUNK_ROWS):
+            rows = matrix[start:start + PREDICT_CHUNK_ROWS]
+            values, offsets = rows.ravel(), np.arange(len(rows)) * rows.shape[1]
+            total = np.zeros(len(rows))
+            if len(rows) * len(a['roots']) <= PREDICT_CHUNK_ROWS:
+                # A few rows (e.g. one user during a page render): walk all trees at once
+                leaves = self._walk(values, offsets[:, None], a['roots'])
+                for tree in range(leaves.shape[1]):
+                    total += leaves[:, tree]  # same summation order as the loop below
+            else:
+                # Many rows: walk one tree at a time over a cache-sized block of rows
+                for root in a['roots']:
+                    total += self._walk(values, offsets, root)
+            raw[start:start + PREDICT_CHUNK_ROWS] += self.metadata['learning_rate'] * total
+        return 100.0 / (1.0 + np.exp(-raw))
+
+    def _walk(self, values, offsets, roots):
+        """Returns the leaf value reached from roots for the rows at offsets of the flattened matrix."""
+        a = self.arrays
+        node = np.broadcast_to(np.asarray(roots, dtype=np.intp), np.broadcast_shapes(offsets.shape, np.shape(roots)))
+        for _ in range(self.metadata['max_depth']):
+            node = self._children[2 * node + (values[offsets + self._feature[node]] > a['threshold'][node])]
+        return a['value'][node]
+
+    @classmethod
+    def fit(cls, matrix, labels, version=None, **params):
+        """Fits sklearn's GradientBoostingClassifier and exports its trees (needs scikit-learn)."""
+        from sklearn.ensemble import GradientBoostingClassifier
+
+        fill = _fill_values(matrix)
+        fitted = GradientBoostingClassifier(**params).fit(np.where(np.isnan(matrix), fill, matrix), labels)
+        return cls.from_sklearn(fitted, fill, version)
+
+    @classmethod
+    def from_sklearn(cls, fitted, fill, version=None):
+        """Flattens a fitted binary GradientBoostingClassifier into node arrays."""
+        trees = [estimator.tree_ for estimator in fitted.estimators_[:, 0]]
+        roots = np.cumsum([0] + [tree.node_count for tree in trees[:-1]]).astype(np.int32)
+        feature, threshold, left, right, value = [], [], [], [], []
+        for root, tree in zip(roots, trees):
+            leaf = tree.children_left < 0
+            own = np.arange(tree.node_count) + root
+            feature.append(np.where(leaf, 0, tree.feature))
+            threshold.append(np.where(leaf, np.inf, tree.threshold))
+            left.append(np.where(leaf, own, tree.children_left + root))
+            right.append(np.where(leaf, own, tree.children_right + root))
+            value.append(tree.value[:, 0, 0])
+        prior = fitted.init_.class_prior_[1]
+        arrays = {
+            'fill': np.asarray(fill, dtype=np.float64),
+            'feature': np.concatenate(feature).astype(np.int16),
+            'threshold': np.concatenate(threshold).astype(np.float64),
+            'left': np.concatenate(left).astype(np.int32),
+            'right': np.concatenate(right).astype(np.int32),
+            'value': np.concatenate(value).astype(np.float64),
+            'roots': roots,
+            'init': np.array([np.log(prior / (1 - prior))]),
+        }
+        metadata = {'learning_rate': float(fitted.learning_rate),
+                    'max_depth': int(max(tree.max_depth for tree in trees)),
+                    'params': _json_params(fitted)}
+        return cls(version, arrays, metadata)
+
+MODEL_TYPES = {model.kind: model for model in (LinearRuleModel, LogisticRegressionModel, GradientBoostingModel)}
+
+def _split_name(name):
+    kind, _, version = name.partition('@')
+    if kind not in MODEL_TYPES:
+        raise ValueError(f"Unknown model kind: {kind}")
+    return kind, version or None
+
+def list_model_versions(kind, directory=None):
+    """Returns the stored versions of a model kind, oldest first."""
+    if kind == LinearRuleModel.kind:
+        return ['builtin']
+    path = os.path.join(directory or MODEL_DIR, kind)
+    versions = [name[:-4] for name in os.listdir(path) if name.endswith('.npz')] if os.path.isdir(path) else []
+    return sorted(versions, key=lambda version: [int(part) if part.isdigit() else part
+                                                 for part in re.split(r'(\d+)', version)])
+
+def save_model(model, directory=None):
+    """Writes a trained model as a new version (the next number unless model.version is set); returns its name."""
+    if model.kind == LinearRuleModel.kind:
+        raise ValueError("The linear rule is built in and has no artifact")
+    path = os.path.join(directory or MODEL_DIR, model.kind)
+    os.makedirs(path, exist_ok=True)
+    if model.version is None:
+        numbered = [int(version) for version in list_model_versions(model.kind, directory) if version.isdigit()]
+        model.version = str(max(numbered, default=0) + 1)
+    target = os.path.join(path, f'{model.version}.npz')
+    tmp_path = f'{target}.tmp.npz'
+    np.savez_compressed(tmp_path, metadata=np.array(json.dumps({**model.metadata, 'features': FEATURE_NAMES})),
+                        **model.arrays)
+    os.replace(tmp_path, target)
+    return model.name
+
+def _read_model(kind, version, directory):
+    if kind == LinearRuleModel.kind:
+        return LinearRuleModel()
+    if version is None:
+        versions = list_model_versions(kind, directory)
+        if not versions:
+            raise FileNotFoundError(f"No stored {kind} model in {directory or MODEL_DIR}")
+        version = versions[-1]
+    with np.load(os.path.join(directory or MODEL_DIR, kind, f'{version}.npz'), allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files if name != 'metadata'}
+        metadata = json.loads(str(data['metadata']))
+    if metadata.pop('features', FEATURE_NAMES) != FEATURE_NAMES:
+        raise ValueError(f"{kind}@{version} was trained on different features")
+    return MODEL_TYPES[kind](version, arrays, metadata)
+
+_models = {}
+_models_lock = threading.Lock()
+
+def load_model(name=None, directory=None):
+    """Returns the named model (default: ACTIVE_MODEL), reading its artifact only on first use in this process."""
+    name = name or ACTIVE_MODEL
+    key = (name, directory or MODEL_DIR)
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            model = _models[key] = _read_model(*_split_name(name), directory)
+        return model
+
+def clear_model_cache():
+    """Forgets the loaded models, so the next load_model reads the artifacts again."""
+    with _models_lock:
+        _models.clear()
+
+def model_inputs(age, profile, daily_inputs):
+    """Returns predict_burnout_risk's arguments as a dict from an age, a user_profile dict and DAILY_INPUTS values."""
+    return {'age': age, 'gender': profile['gender'], 'job_avg_stress': job_stress_levels.get(profile['job'], 5),
+            'education': profile['education'], 'city': profile['city'], 'family_size': profile['family_size'],
+            'num_pets': profile['num_pets'], 'remote_percentage': profile['remote_percentage'],
+            **dict(zip(DAILY_INPUTS, daily_inputs))}
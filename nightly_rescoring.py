@@ -0,0 +1,165 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from burnout_model_functions import DAILY_INPUTS, daily_score_batch
+from burnout_predictions_functions import compute_inputs_hash, save_burnout_percentages
+from database_functions import migrate_database, unit_of_work
+from survey_functions import SURVEY_DEFAULTS
+from model_registry_functions import LinearRuleModel, load_model, model_inputs
+from user_profile_functions import refresh_profile_scores
+
+# -------------------- Nightly Rescoring --------------------
+# Rescores every user from their profile and latest survey without anyone opening
+# main_page. Chunks are scored in worker processes and written by this process (SQLite
+# has a single writer), one transaction per chunk together with the checkpoint. Stored
+# profile scores that expired (birthdays) or are missing are refreshed first.
+
+CHUNK_QUERY = '''
+    SELECT ps.user_id, ps.profile_score,
+           s.work_hours, s.sleep_hours, s.weekend_overtime, s.stress_level, s.exercise_hours,
+           f.steps,
+           ps.age, p.gender, p.job, p.education, p.city, p.family_size, p.num_pets, p.remote_percentage
+    FROM user_profile_scores ps
+    JOIN user_profile p ON p.user_id = ps.user_id
+    JOIN daily_stress_submissions s ON s.user_id = ps.user_id
+    LEFT JOIN fitbit_daily_features f ON f.user_id = ps.user_id AND f.day = DATE('now', '-1 day')
+    WHERE ps.user_id > ?
+    ORDER BY ps.user_id
+    LIMIT ?
+'''
+PROFILE_COLUMNS = ['gender', 'job', 'education', 'city', 'family_size', 'num_pets', 'remote_percentage']
+
+def _survey_value(value, name):
+    """Applies the same default as load_recent_survey_data to a missing survey answer."""
+    return value if value is not None else SURVEY_DEFAULTS[name]
+
+def score_chunk(rows, model_name=None):
+    """Scores one chunk of CHUNK_QUERY rows and returns (user_id, risk_percentage, inputs_hash) tuples.
+
+    The inputs are assembled exactly like main_page does, so the stored hash matches and
+    the next page render does not rescore a user whose inputs did not change. The model
+    is loaded once per worker process.
+    """
+    model = load_model(model_name)
+    linear_rule = model.kind == LinearRuleModel.kind
+    user_ids, profile_scores, inputs, hashes = [], [], [], []
+    for row in rows:
+        (user_id, profile_component, work_hours, sleep_hours, weekend_overtime, stress_level, exercise_hours,
+         daily_steps, age) = row[:9]
+        daily_inputs = (
+            _survey_value(work_hours, 'work_hours'), _survey_value(sleep_hours, 'sleep_hours'),
+            _survey_value(weekend_overtime, 'weekend_overtime'), _survey_value(stress_level, 'stress_level'),
+            _survey_value(exercise_hours, 'exercise_hours'), daily_steps
+        )
+        user_ids.append(user_id)
+        if linear_rule:
+            profile_scores.append(profile_component)
+            inputs.append(daily_inputs)
+            hashes.append(compute_inputs_hash(profile_component, *daily_inputs))
+        else:
+            user_inputs = model_inputs(age, dict(zip(PROFILE_COLUMNS, row[9:])), daily_inputs)
+            inputs.append(user_inputs)
+            hashes.append(compute_inputs_hash(model.name, *user_inputs.values()))
+    if not inputs:
+        return []
+
+    if linear_rule:
+        risk_percentages, _ = daily_score_batch(profile_scores, dict(zip(DAILY_INPUTS, zip(*inputs))))
+    else:
+        risk_percentages = model.predict_batch({name: [user[name] for user in inputs] for name in inputs[0]})
+    return list(zip(user_ids, risk_percentages.tolist(), hashes))
+
+def _read_chunks(after_user_id, chunk_size):
+    """Yields CHUNK_QUERY pages in user_id order, starting after the given user."""
+    while True:
+        with unit_of_work() as conn:
+            rows = conn.execute(CHUNK_QUERY, (after_user_id, chunk_size)).fetchall()
+        if not rows:
+            return
+        yield rows
+        after_user_id = rows[-1][0]
+
+def _write_chunk(run_date, last_user_id, results, rows_scored):
+    """Stores a scored chunk and advances the checkpoint in the same transaction."""
+    with unit_of_work(immediate=True) as conn:
+        save_burnout_percentages(results)
+        conn.execute('''
+            UPDATE rescoring_runs SET last_user_id = ?, rows_scored = ? WHERE run_date = ?
+        ''', (last_user_id, rows_scored, run_date))
+
+def run_rescoring(chunk_size=10_000, workers=None, restart=False, model_name=None):
+    """Rescores all users for today, resuming from the last checkpoint, and returns the number of rows scored."""
+    migrate_database()
+    workers = workers or os.cpu_count() or 1
+
+    with unit_of_work(immediate=True) as conn:
+        run_date = conn.execute("SELECT DATE('now')").fetchone()[0]
+        checkpoint = conn.execute('''
+            SELECT last_user_id, rows_scored, finished_at FROM rescoring_runs WHERE run_date = ?
+        ''', (run_date,)).fetchone()
+        if checkpoint is None or restart:
+            conn.execute('''
+                INSERT OR REPLACE INTO rescoring_runs (run_date, last_user_id, rows_scored, started_at, finished_at)
+                VALUES (?, 0, 0, DATETIME('now'), NULL)
+            ''', (run_date,))
+            checkpoint = (0, 0, None)
+
+    last_user_id, rows_scored, finished_at = checkpoint
+    if finished_at is not None:
+        print(f"Rescoring for {run_date} already finished at {finished_at} ({rows_scored:,} rows).")
+        return 0
+    refreshed = refresh_profile_scores(date.fromisoformat(run_date), chunk_size)
+    if refreshed:
+        print(f"Refreshed {refreshed:,} stored profile scores.")
+    if last_user_id:
+        print(f"Resuming rescoring for {run_date} after user {last_user_id} ({rows_scored:,} rows done).")
+
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    in_flight = deque()
+    scored_now = 0
+    start = time.perf_counter()
+
+    def write_oldest():
+        nonlocal rows_scored, scored_now
+        chunk_last_user_id, pending = in_flight.popleft()
+        results = pending.result() if executor else pending
+        rows_scored += len(results)
+        scored_now += len(results)
+        _write_chunk(run_date, chunk_last_user_id, results, rows_scored)
+
+    try:
+        for rows in _read_chunks(last_user_id, chunk_size):
+            pending = executor.submit(score_chunk, rows, model_name) if executor else score_chunk(rows, model_name)
+            in_flight.append((rows[-1][0], pending))
+            # Write in user_id order so the checkpoint never skips an unwritten chunk
+            if len(in_flight) >= 2 * workers:
+                write_oldest()
+        while in_flight:
+            write_oldest()
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+    with unit_of_work() as conn:
+        conn.execute("UPDATE rescoring_runs SET finished_at = DATETIME('now') WHERE run_date = ?", (run_date,))
+
+    elapsed = time.perf_counter() - start
+    rate = scored_now / elapsed if elapsed else 0.0
+    print(f"Rescored {scored_now:,} users for {run_date} in {elapsed:.2f} s ({rate:,.0f} rows/s, {workers} workers).")
+    return scored_now
+
+def main():
+    parser = argparse.ArgumentParser(description="Rescore every user's burnout risk for today.")
+    parser.add_argument('--chunk-size', type=int, default=10_000, help="Users scored per chunk and per transaction.")
+    parser.add_argument('--workers', type=int, default=None, help="Scoring processes (default: one per core).")
+    parser.add_argument('--restart', action='store_true', help="Ignore today's checkpoint and rescore everyone.")
+    parser.add_argument('--model', default=None, help="Model to score with, e.g. 'gradient_boosting@3' (default: EXHALE_MODEL).")
+    args = parser.parse_args()
+    run_rescoring(args.chunk_size, args.workers, args.restart, args.model)
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,25 @@
-import sqlite3
+from database_functions import unit_of_work
 from datetime import datetime
 import os
 
 # -------------------- Daily Survey --------------------
 
+# Values used when a stored survey answer is missing, in SELECT column order
+SURVEY_DEFAULTS = {
+    'mood': 'Happy',
+    'stress_level': 5,
+    'work_hours': 8.0,
+    'weekend_overtime': 0.0,
+    'exercise_hours': 1.0,
+    'sleep_hours': 7.0,
+}
+
 def has_submitted_survey_today(user_id):
     """Checks if the user has submitted the daily stress survey today."""
-    conn = sqlite3.connect('user_data.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT last_submission FROM daily_stress_submissions WHERE user_id = ?', (user_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT last_submission FROM daily_stress_submissions WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
 
     if row:
         try:
@@ -24,37 +33,56 @@ def has_submitted_survey_today(user_id):
 
 def update_survey_submission_timestamp(user_id):
     """Updates the last submission timestamp for the daily stress survey."""
-    conn = sqlite3.connect('user_data.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR REPLACE INTO daily_stress_submissions (user_id, last_submission)
-        VALUES (?, ?)
-    ''', (user_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')))
-    conn.commit()
-    conn.close()
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        # Only touch the timestamp; INSERT OR REPLACE used to wipe the stored answers
+        cursor.execute('''
+            INSERT INTO daily_stress_submissions (user_id, last_submission)
+            VALUES (?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET last_submission = excluded.last_submission
+        ''', (user_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')))
+
+def save_survey_submission(user_id, mood, stress_level, work_hours, weekend_overtime, exercise_hours, sleep_hours):
+    """Appends a daily stress survey to the user's history; a trigger refreshes the latest row."""
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO survey_submissions (user_id, submitted_at, mood, stress_level, work_hours,
+                                            weekend_overtime, exercise_hours, sleep_hours)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f'), mood, stress_level, work_hours,
+              weekend_overtime, exercise_hours, sleep_hours))
 
 def load_recent_survey_data(user_id):
     """Loads the most recent survey data for the given user."""
-    conn = sqlite3.connect('user_data.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT mood, stress_level, work_hours, weekend_overtime, exercise_hours, sleep_hours
-        FROM daily_stress_submissions
-        WHERE user_id = ?
-        ORDER BY last_submission DESC
-        LIMIT 1
-    ''', (user_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        # daily_stress_submissions holds one row per user: the latest submission
+        cursor.execute('''
+            SELECT mood, stress_level, work_hours, weekend_overtime, exercise_hours, sleep_hours
+            FROM daily_stress_submissions
+            WHERE user_id = ?
+        ''', (user_id,))
+        row = cursor.fetchone()
 
     if row:
         # Ensure all fields have default values if they are None
-        return {
-            'mood': row[0] if row[0] is not None else 'Happy',  # Default to 5
-            'stress_level': row[1] if row[1] is not None else 5,  # Default to 5
-            'work_hours': row[2] if row[2] is not None else 8.0,  # Default to 8.0
-            'weekend_overtime': row[3] if row[3] is not None else 0.0,  # Default to 0.0
-            'exercise_hours': row[4] if row[4] is not None else 1.0,  # Default to 1.0
-            'sleep_hours': row[5] if row[5] is not None else 7.0  # Default to 7.0
-        }
-    return None
\ No newline at end of file
+        return {name: value if value is not None else SURVEY_DEFAULTS[name]
+                for name, value in zip(SURVEY_DEFAULTS, row)}
+    return None
+
+def load_survey_history(user_id, start=None, end=None):
+    """Loads the user's survey submissions between start and end (datetimes or ISO strings), oldest first."""
+    # Timestamps are stored as text; keep the bounds text-shaped so they are compared as text
+    start = str(start) if start is not None else ''
+    end = str(end) if end is not None else '9999-12-31 23:59:59'
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT submitted_at, mood, stress_level, work_hours, weekend_overtime, exercise_hours, sleep_hours
+            FROM survey_submissions
+            WHERE user_id = ? AND submitted_at >= ? AND submitted_at < ?
+            ORDER BY submitted_at
+        ''', (user_id, start, end))
+        rows = cursor.fetchall()
+    return [dict(zip(('submitted_at', *SURVEY_DEFAULTS), row)) for row in rows]
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+# The app's modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database_functions
+import fitbit_functions
+import fitbit_store_functions
+from fake_api_servers import FakeFitbitServer
+from fitbit_sync import reset_rate_limiters
+
+@pytest.fixture
+def database(tmp_path):
+    """Points the data-access layer at a fresh, fully migrated database."""
+    previous_path = database_functions.DB_PATH
+    database_functions.set_database_path(str(tmp_path / 'exhale.db'))
+    database_functions.migrate_database()
+    yield database_functions.DB_PATH
+    database_functions.set_database_path(previous_path)
+
+@pytest.fixture
+def fitbit_server(database, tmp_path, monkeypatch):
+    """Starts a fake Fitbit server and points the client registry and intraday stores at it."""
+    monkeypatch.setenv('OAUTHLIB_INSECURE_TRANSPORT', '1')  # the stub speaks plain HTTP
+    previous_store_path = fitbit_store_functions.FITBIT_STORE_PATH
+    fitbit_store_functions.set_store_path(str(tmp_path / 'store'))
+    fitbit_functions.clear_client_registries()
+    reset_rate_limiters()
+    with FakeFitbitServer() as server:
+        monkeypatch.setattr(fitbit_functions, 'FITBIT_API_ENDPOINT', server.url)
+        yield server
+    fitbit_functions.clear_client_registries()
+    reset_rate_limiters()
+    fitbit_store_functions.set_store_path(previous_store_path)
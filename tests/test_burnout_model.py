@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from burnout_model_functions import job_stress_levels, predict_burnout_risk, predict_burnout_risk_batch
+
+def _population(num_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    steps = rng.uniform(0, 20_000, num_rows)
+    return pd.DataFrame({
+        'age': rng.integers(18, 70, num_rows),
+        'gender': rng.choice(['Male', 'Female', 'female', 'Other'], num_rows),
+        'work_hours': rng.uniform(0, 16, num_rows),
+        'sleep_hours': rng.uniform(0, 12, num_rows),
+        'weekend_overtime': rng.uniform(0, 16, num_rows),
+        'stress_level': rng.integers(1, 11, num_rows),
+        'job_avg_stress': rng.choice(list(job_stress_levels.values()), num_rows),
+        'education': rng.integers(1, 5, num_rows),
+        'city': rng.choice(['Small', 'Big', 'big'], num_rows),
+        'family_size': rng.integers(0, 6, num_rows),
+        'num_pets': rng.integers(0, 4, num_rows),
+        'exercise_hours': rng.uniform(0, 5, num_rows),
+        'remote_percentage': rng.uniform(0, 1, num_rows),
+        'daily_steps': [None if missing else value for missing, value in zip(rng.random(num_rows) < 0.3, steps)],
+    })
+
+def _scalar_scores(population):
+    # Missing steps are None for the scalar scorer (pandas holds them as NaN)
+    rows = [{name: None if name == 'daily_steps' and pd.isna(value) else value for name, value in row.items()}
+            for row in population.to_dict('records')]
+    return [predict_burnout_risk(**row) for row in rows]
+
+def test_batch_scores_match_scalar_scores_exactly():
+    population = _population(5_000)
+    risk, score = predict_burnout_risk_batch(population)
+    expected = _scalar_scores(population)
+    assert np.array_equal(risk, [row[0] for row in expected])
+    assert np.array_equal(score, [row[1] for row in expected])
+
+def test_batch_scores_use_the_scalar_defaults_for_missing_columns():
+    population = _population(100)[['age', 'gender']]
+    risk, score = predict_burnout_risk_batch(population)
+    expected = _scalar_scores(population)
+    assert np.array_equal(risk, [row[0] for row in expected])
+    assert np.array_equal(score, [row[1] for row in expected])
@@ -0,0 +1,99 @@
+import math
+
+import numpy as np
+import pytest
+
+from burnout_predictions_functions import lttb, save_burnout_percentage
+from database_functions import ROLLUP_PERIODS, unit_of_work
+
+def _reference_lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets as originally published, one bucket at a time."""
+    n = len(x)
+    every = (n - 2) / (threshold - 2)
+    kept = [0]
+    for bucket in range(threshold - 2):
+        start, end = math.floor(bucket * every) + 1, math.floor((bucket + 1) * every) + 1
+        next_start, next_end = end, min(math.floor((bucket + 2) * every) + 1, n)
+        mean_x = sum(x[next_start:next_end]) / (next_end - next_start)
+        mean_y = sum(y[next_start:next_end]) / (next_end - next_start)
+        ax, ay = x[kept[-1]], y[kept[-1]]
+        best, best_area = start, -1.0
+        for i in range(start, end):
+            area = abs((ax - mean_x) * (y[i] - ay) - (ax - x[i]) * (mean_y - ay))
+            if area > best_area:
+                best, best_area = i, area
+        kept.append(best)
+    kept.append(n - 1)
+    return kept
+
+@pytest.mark.parametrize('n, threshold', [(3, 3), (10, 3), (10, 9), (100, 7), (1_000, 100), (5_000, 365),
+                                          (10_000, 9_999)])
+def test_lttb_matches_the_reference_algorithm(n, threshold):
+    rng = np.random.default_rng(n + threshold)
+    x = np.cumsum(rng.integers(1, 4, n)).astype(float).tolist()
+    y = rng.uniform(0, 100, n).tolist()
+    kept = lttb(x, y, threshold)
+    assert kept.dtype == np.intp
+    assert kept.tolist() == _reference_lttb(x, y, threshold)
+
+def test_lttb_keeps_the_first_point_of_each_bucket_on_a_flat_series():
+    x = list(range(50))
+    assert lttb(x, [42.0] * 50, 5).tolist() == _reference_lttb(x, [42.0] * 50, 5)
+
+@pytest.mark.parametrize('threshold', [0, 1, 2, 10, 11])
+def test_lttb_keeps_every_point_below_three_or_at_least_the_length(threshold):
+    x, y = list(range(10)), [float(i % 3) for i in range(10)]
+    kept = lttb(x, y, threshold)
+    assert kept.dtype == np.intp
+    assert kept.tolist() == list(range(10))
+
+def _rollup_differences(conn):
+    """Returns the rollup rows that differ from a GROUP BY over burnout_history, per granularity."""
+    differences = []
+    for granularity, period in ROLLUP_PERIODS.items():
+        expected = {row[:2]: row[2:] for row in conn.execute(f'''
+            SELECT user_id, {period.format(day='day')}, SUM(risk_percentage), COUNT(*)
+            FROM burnout_history
+            GROUP BY user_id, {period.format(day='day')}
+        ''')}
+        stored = {row[:2]: row[2:] for row in conn.execute('''
+            SELECT user_id, period_start, risk_sum, day_count
+            FROM burnout_rollup
+            WHERE granularity = ?
+        ''', (granularity,))}
+        for key in expected.keys() | stored.keys():
+            if key not in expected or key not in stored:
+                differences.append((granularity, key, expected.get(key), stored.get(key)))
+            elif expected[key][1] != stored[key][1] or not math.isclose(expected[key][0], stored[key][0],
+                                                                       abs_tol=1e-6):
+                differences.append((granularity, key, expected[key], stored[key]))
+    return differences
+
+def test_rollup_matches_group_by_after_inserts_updates_and_deletes(database):
+    rng = np.random.default_rng(0)
+    with unit_of_work() as conn:
+        # A little over a year for two users, so weeks and months cross year boundaries
+        conn.executemany('''
+            INSERT INTO burnout_history (user_id, day, date, risk_percentage, updated_at)
+            VALUES (?, DATE('2024-12-01', ? || ' days'), DATE('2024-12-01', ? || ' days'), ?, DATETIME('now'))
+        ''', [(user_id, offset, offset, float(rng.uniform(0, 100))) for user_id in (1, 2) for offset in range(400)])
+        assert _rollup_differences(conn) == []
+
+        conn.execute("UPDATE burnout_history SET risk_percentage = risk_percentage / 2 WHERE user_id = 1 "
+                     "AND day BETWEEN '2025-01-15' AND '2025-03-10'")
+        assert _rollup_differences(conn) == []
+
+        # Whole periods disappear when their last day is deleted
+        conn.execute("DELETE FROM burnout_history WHERE user_id = 2 AND day BETWEEN '2025-02-01' AND '2025-03-31'")
+        conn.execute("DELETE FROM burnout_history WHERE user_id = 1 AND STRFTIME('%j', day) % 3 = 0")
+        conn.execute("DELETE FROM burnout_history WHERE id % 7 = 0")
+        assert _rollup_differences(conn) == []
+
+    # Today's upsert inserts once, then updates the same row
+    assert save_burnout_percentage(3, 40.0, 'a')
+    assert save_burnout_percentage(3, 55.5, 'b')
+    assert not save_burnout_percentage(3, 55.5, 'b')
+    with unit_of_work() as conn:
+        assert _rollup_differences(conn) == []
+        assert conn.execute("SELECT risk_sum, day_count FROM burnout_rollup WHERE user_id = 3").fetchall() == [
+            (55.5, 1), (55.5, 1)]
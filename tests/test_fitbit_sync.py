@@ -0,0 +1,126 @@
+from datetime import date, timedelta
+
+import fitbit_sync
+from database_functions import unit_of_work
+from fitbit_functions import get_client_registry, get_fitbit_tokens, save_fitbit_tokens
+from fitbit_sync import INITIAL_SYNC_DAYS, load_sync_state, run_fitbit_sync
+
+def _connect(server, user_id=1, expires_in=None):
+    """Creates a user connected to the fake server and returns their email."""
+    email = f'user{user_id}@example.com'
+    with unit_of_work() as conn:
+        conn.execute('INSERT INTO users (id, email, password) VALUES (?, ?, ?)', (user_id, email, 'x'))
+    token = server.add_user(user_id, expires_in)
+    save_fitbit_tokens(email, token['access_token'], token['refresh_token'], token['expires_in'])
+    return email
+
+def _set_high_water_mark(user_id, resource, day):
+    with unit_of_work() as conn:
+        conn.execute('UPDATE fitbit_sync_state SET last_synced_day = ? WHERE user_id = ? AND resource = ?',
+                     (day.isoformat(), user_id, resource))
+
+def _stored_days(user_id, resource):
+    with unit_of_work() as conn:
+        return [row[0] for row in conn.execute('''
+            SELECT day FROM fitbit_daily_summaries WHERE user_id = ? AND resource = ? ORDER BY day
+        ''', (user_id, resource))]
+
+def test_incremental_sync_fetches_only_the_missing_days(fitbit_server):
+    _connect(fitbit_server)
+    today = date.today()
+    run_fitbit_sync('client', 'secret', resources=('activity',))
+    assert fitbit_server.requests_by_user[1] == INITIAL_SYNC_DAYS
+    assert load_sync_state(1) == {'activity': today - timedelta(days=1)}
+
+    # A run right after only fetches today again, which is still filling up
+    run_fitbit_sync('client', 'secret', resources=('activity',))
+    assert fitbit_server.requests_by_user[1] == INITIAL_SYNC_DAYS + 1
+
+    # Three days behind: the three complete days after the mark, then today
+    _set_high_water_mark(1, 'activity', today - timedelta(days=4))
+    run_fitbit_sync('client', 'secret', resources=('activity',))
+    assert fitbit_server.requests_by_user[1] == INITIAL_SYNC_DAYS + 1 + 4
+    assert load_sync_state(1) == {'activity': today - timedelta(days=1)}
+    assert len(_stored_days(1, 'activity')) == INITIAL_SYNC_DAYS
+
+def test_high_water_mark_stops_at_a_429(fitbit_server):
+    fitbit_server.rate_limit = 10
+    _connect(fitbit_server)
+    first_day = date.today() - timedelta(days=INITIAL_SYNC_DAYS - 1)
+
+    stats = run_fitbit_sync('client', 'secret', resources=('activity',))
+    assert stats.deferred == 1
+    assert load_sync_state(1) == {'activity': first_day + timedelta(days=9)}
+    assert len(_stored_days(1, 'activity')) == 10
+
+    # Fitbit's Retry-After pauses the user, so the next run defers without a request
+    requests = fitbit_server.requests_by_user[1]
+    stats = run_fitbit_sync('client', 'secret', resources=('activity',))
+    assert stats.deferred == 1
+    assert fitbit_server.requests_by_user[1] == requests
+    assert load_sync_state(1) == {'activity': first_day + timedelta(days=9)}
+
+def test_high_water_mark_stops_when_the_local_quota_is_used_up(fitbit_server, monkeypatch):
+    monkeypatch.setattr(fitbit_sync, 'HOURLY_REQUEST_LIMIT', 5)
+    _connect(fitbit_server)
+    first_day = date.today() - timedelta(days=INITIAL_SYNC_DAYS - 1)
+
+    stats = run_fitbit_sync('client', 'secret', resources=('activity',))
+    assert stats.deferred == 1
+    assert fitbit_server.requests_by_user[1] == 5
+    assert load_sync_state(1) == {'activity': first_day + timedelta(days=4)}
+
+def test_token_refresh_is_persisted(fitbit_server):
+    email = _connect(fitbit_server, expires_in=60)  # inside the refresh margin
+    stale = get_fitbit_tokens(email)
+
+    run_fitbit_sync('client', 'secret', resources=('activity',))
+    assert fitbit_server.refresh_count == 1
+    stored = get_fitbit_tokens(email)
+    assert stored['access_token'] != stale['access_token']
+    assert stored['refresh_token'] != stale['refresh_token']
+
+    # The rotated tokens work for a process that starts from the database alone
+    fitbit_sync.reset_rate_limiters()
+    get_client_registry('client', 'secret').forget(email)
+    stats = run_fitbit_sync('client', 'secret', resources=('activity',))
+    assert stats.failed == 0
+    assert fitbit_server.refresh_count == 1
+
+def test_expired_access_token_is_refreshed_and_persisted(fitbit_server):
+    email = _connect(fitbit_server)
+    stale = get_fitbit_tokens(email)
+    # Fitbit rejects the access token although its stored expiry lies ahead
+    fitbit_server.expire_access_token(stale['access_token'])
+
+    stats = run_fitbit_sync('client', 'secret', resources=('activity',))
+    assert stats.failed == 0
+    assert fitbit_server.refresh_count == 1
+    assert get_fitbit_tokens(email)['refresh_token'] != stale['refresh_token']
+
+def test_failed_write_keeps_the_high_water_mark_before_the_failed_days(fitbit_server, monkeypatch):
+    monkeypatch.setattr(fitbit_sync, 'WRITE_BATCH_DAYS', 5)
+    write_synced_days = fitbit_sync.write_synced_days
+    calls = []
+
+    def failing_second_batch(user_id, resource, results, today):
+        calls.append(sorted(results))
+        if len(calls) == 2:
+            raise RuntimeError('disk full')
+        write_synced_days(user_id, resource, results, today)
+
+    monkeypatch.setattr(fitbit_sync, 'write_synced_days', failing_second_batch)
+    _connect(fitbit_server)
+    first_day = date.today() - timedelta(days=INITIAL_SYNC_DAYS - 1)
+
+    stats = run_fitbit_sync('client', 'secret', resources=('activity',), workers=1)
+    assert stats.failed == 1
+    assert load_sync_state(1) == {'activity': first_day + timedelta(days=4)}
+    assert len(_stored_days(1, 'activity')) == 5
+
+    # The next run fetches the failed days again
+    monkeypatch.setattr(fitbit_sync, 'write_synced_days', write_synced_days)
+    stats = run_fitbit_sync('client', 'secret', resources=('activity',))
+    assert stats.failed == 0
+    assert load_sync_state(1) == {'activity': date.today() - timedelta(days=1)}
+    assert len(_stored_days(1, 'activity')) == INITIAL_SYNC_DAYS
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from burnout_model_functions import feature_matrix, predict_burnout_risk_batch
+from model_registry_functions import (PREDICT_CHUNK_ROWS, GradientBoostingModel, _fill_values, clear_model_cache,
+                                      load_model, save_model)
+from test_burnout_model import _population
+
+pytest.importorskip('sklearn')
+from sklearn.ensemble import GradientBoostingClassifier
+
+@pytest.fixture(scope='module')
+def fitted_models():
+    """A GradientBoostingClassifier fitted on random users and its flattened GradientBoostingModel."""
+    population = _population(2_000, seed=1)
+    matrix = feature_matrix(population)
+    risk = predict_burnout_risk_batch(population)[0]
+    labels = (risk + np.random.default_rng(1).normal(0, 10, len(risk)) > np.median(risk)).astype(int)
+    fill = _fill_values(matrix)
+    fitted = GradientBoostingClassifier(n_estimators=40, max_depth=3, random_state=0).fit(
+        np.where(np.isnan(matrix), fill, matrix), labels)
+    return fitted, GradientBoostingModel.from_sklearn(fitted, fill)
+
+def _sklearn_risk(fitted, model, population):
+    matrix = feature_matrix(population)
+    return 100.0 * fitted.predict_proba(np.where(np.isnan(matrix), model.arrays['fill'], matrix))[:, 1]
+
+@pytest.mark.parametrize('num_rows', [1, 10, PREDICT_CHUNK_ROWS + 500])
+def test_gradient_boosting_matches_sklearn_predict_proba(fitted_models, num_rows):
+    # 1 and 10 rows walk all trees at once; the large batch walks one tree at a time in chunks
+    fitted, model = fitted_models
+    population = _population(num_rows, seed=2)
+    np.testing.assert_allclose(model.predict_batch(population), _sklearn_risk(fitted, model, population),
+                               rtol=1e-9, atol=1e-9)
+
+def test_gradient_boosting_matches_sklearn_after_save_and_load(fitted_models, tmp_path):
+    fitted, model = fitted_models
+    name = save_model(GradientBoostingModel(None, model.arrays, model.metadata), str(tmp_path))
+    clear_model_cache()
+    try:
+        loaded = load_model(name, str(tmp_path))
+    finally:
+        clear_model_cache()
+    population = _population(3_000, seed=3)
+    np.testing.assert_allclose(loaded.predict_batch(population), _sklearn_risk(fitted, model, population),
+                               rtol=1e-9, atol=1e-9)
+    assert loaded.predict_one(**population.iloc[0].to_dict()) == pytest.approx(
+        _sklearn_risk(fitted, model, population.head(1))[0], rel=1e-9)
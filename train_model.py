@@ -0,0 +1,164 @@
+import argparse
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from burnout_model_functions import FEATURE_NAMES, calculate_age_batch, feature_matrix, predict_burnout_risk_batch
+from database_functions import migrate_database, unit_of_work
+from model_registry_functions import GradientBoostingModel, LogisticRegressionModel, save_model
+from survey_functions import SURVEY_DEFAULTS
+
+# -------------------- Model Training --------------------
+# Fits the trained burnout models from the app's own history. One training row is one
+# user-day: that day's latest survey answers, the profile (with the age on that day) and
+# the previous day's Fitbit features, i.e. exactly what main_page scores. The label is
+# whether the user's next survey, at most LABEL_HORIZON_DAYS later, reports a stress
+# level of HIGH_STRESS_LEVEL or more, the closest thing to a burnout outcome the app
+# records.
+#
+# Rows are read a block of users at a time and kept only as a float32 feature matrix,
+# so 10M user-days need about 0.6 GB plus one block's DataFrame. Cross-validation folds
+# are split by user (no user is in both the training and the validation fold) and run
+# in parallel worker processes. Fitted models are written as new versions to the model
+# registry.
+
+HIGH_STRESS_LEVEL = 8
+LABEL_HORIZON_DAYS = 2
+CHUNK_USERS = 1_000             # about 365k user-days per block for a year of history
+CV_FOLDS = 5
+MODEL_TYPES = {
+    'logistic_regression': (LogisticRegressionModel, {}),
+    'gradient_boosting': (GradientBoostingModel, {'n_estimators': 100, 'max_depth': 3}),
+}
+
+TRAINING_QUERY = '''
+    WITH days AS (
+        SELECT user_id, DATE(submitted_at) AS day, stress_level, work_hours, weekend_overtime,
+               exercise_hours, sleep_hours,
+               ROW_NUMBER() OVER (PARTITION BY user_id, DATE(submitted_at) ORDER BY submitted_at DESC) AS latest
+        FROM survey_submissions
+        WHERE user_id > ? AND user_id <= ?
+    ),
+    labelled AS (
+        SELECT user_id, day, stress_level, work_hours, weekend_overtime, exercise_hours, sleep_hours,
+               LEAD(day) OVER next AS next_day, LEAD(stress_level) OVER next AS next_stress_level
+        FROM days
+        WHERE latest = 1
+        WINDOW next AS (PARTITION BY user_id ORDER BY day)
+    )
+    SELECT l.user_id, l.day, l.stress_level, l.work_hours, l.weekend_overtime, l.exercise_hours, l.sleep_hours,
+           l.next_stress_level,
+           p.dob, p.gender, p.job, p.education, p.city, p.family_size, p.num_pets, p.remote_percentage,
+           f.steps AS daily_steps
+    FROM labelled l
+    JOIN user_profile p ON p.user_id = l.user_id
+    LEFT JOIN fitbit_daily_features f ON f.user_id = l.user_id AND f.day = DATE(l.day, '-1 day')
+    WHERE l.next_day IS NOT NULL AND l.next_day <= DATE(l.day, '+{horizon} days')
+'''.format(horizon=LABEL_HORIZON_DAYS)
+
+def _training_chunk(first_user_id, last_user_id):
+    """Returns (features, labels, user_ids) for the users in (first_user_id, last_user_id]."""
+    with unit_of_work() as conn:
+        frame = pd.read_sql_query(TRAINING_QUERY, conn, params=(first_user_id, last_user_id))
+    frame['age'] = calculate_age_batch(frame['dob'], frame['day'])
+    frame = frame[frame['age'].notna()]  # profiles without a valid date of birth cannot be scored
+    for name, default in SURVEY_DEFAULTS.items():
+        if name in frame:
+            frame[name] = frame[name].fillna(default)
+    labels = (frame['next_stress_level'] >= HIGH_STRESS_LEVEL).to_numpy(dtype=np.int8)
+    return feature_matrix(frame).astype(np.float32), labels, frame['user_id'].to_numpy(dtype=np.int64)
+
+def load_training_data(chunk_users=CHUNK_USERS):
+    """Builds the training matrix a block of users at a time; returns (float32 matrix, int8 labels, user ids)."""
+    with unit_of_work() as conn:
+        max_user_id = conn.execute('SELECT MAX(user_id) FROM survey_submissions').fetchone()[0] or 0
+    matrices, labels, users = [], [], []
+    for first_user_id in range(0, max_user_id, chunk_users):
+        matrix, chunk_labels, chunk_user_ids = _training_chunk(first_user_id, first_user_id + chunk_users)
+        matrices.append(matrix)
+        labels.append(chunk_labels)
+        users.append(chunk_user_ids)
+    if not matrices:
+        return np.empty((0, len(FEATURE_NAMES)), dtype=np.float32), np.empty(0, dtype=np.int8), np.empty(0, dtype=np.int64)
+    return np.concatenate(matrices), np.concatenate(labels), np.concatenate(users)
+
+def _estimator(kind, params):
+    """Returns the scikit-learn pipeline equivalent to the registry model's fit, for cross-validation."""
+    from sklearn.ensemble import GradientBoostingClassifier
+    from sklearn.impute import SimpleImputer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    if kind == 'logistic_regression':
+        return make_pipeline(SimpleImputer(strategy='median', keep_empty_features=True), StandardScaler(),
+                             LogisticRegression(max_iter=1000, **params))
+    return make_pipeline(SimpleImputer(strategy='median', keep_empty_features=True), GradientBoostingClassifier(**params))
+
+def cross_validate_model(kind, matrix, labels, users, folds=CV_FOLDS, workers=-1):
+    """Returns {'roc_auc': mean, 'log_loss': mean} over folds grouped by user, fitted in parallel."""
+    from sklearn.model_selection import GroupKFold, cross_validate
+
+    results = cross_validate(_estimator(kind, MODEL_TYPES[kind][1]), matrix, labels, groups=users,
+                             cv=GroupKFold(folds), scoring=('roc_auc', 'neg_log_loss'), n_jobs=workers)
+    return {'roc_auc': float(results['test_roc_auc'].mean()), 'log_loss': float(-results['test_neg_log_loss'].mean())}
+
+def linear_rule_auc(matrix, labels):
+    """Returns the built-in rule's ROC AUC on the same rows, as the baseline to beat."""
+    from sklearn.metrics import roc_auc_score
+
+    features = {name: matrix[:, i] for i, name in enumerate(FEATURE_NAMES)}
+    features['gender'] = np.where(features.pop('is_female') == 1, 'female', 'male')
+    features['city'] = np.where(features.pop('is_big_city') == 1, 'big', 'small')
+    return float(roc_auc_score(labels, predict_burnout_risk_batch(features)[1]))  # raw scores, before clipping to 0-100
+
+def train_models(kinds=tuple(MODEL_TYPES), folds=CV_FOLDS, workers=-1, max_train_rows=None, chunk_users=CHUNK_USERS):
+    """Cross-validates and fits each model kind on the full history; returns the saved model names."""
+    migrate_database()
+    start = time.perf_counter()
+    matrix, labels, users = load_training_data(chunk_users)
+    if max_train_rows and len(labels) > max_train_rows:
+        # Subsample whole users so the folds stay grouped
+        chosen = np.random.default_rng(0).permutation(np.unique(users))
+        keep = np.isin(users, chosen[:max(1, int(len(chosen) * max_train_rows / len(labels)))])
+        matrix, labels, users = matrix[keep], labels[keep], users[keep]
+    print(f"Loaded {len(labels):,} user-days of {len(np.unique(users)):,} users in {time.perf_counter() - start:.2f} s "
+          f"({matrix.nbytes / 2**20:,.0f} MB features, {labels.mean() if len(labels) else 0:.1%} positive).")
+    if len(np.unique(labels)) < 2 or len(np.unique(users)) < folds:
+        print("Not enough labelled history to train.")
+        return []
+    print(f"linear_rule@builtin: ROC AUC {linear_rule_auc(matrix, labels):.3f}")
+
+    saved = []
+    for kind in kinds:
+        start = time.perf_counter()
+        scores = cross_validate_model(kind, matrix, labels, users, folds, workers)
+        model_type, params = MODEL_TYPES[kind]
+        model = model_type.fit(matrix, labels, **params)
+        model.metadata.update({
+            'trained_at': datetime.now().isoformat(timespec='seconds'), 'rows': int(len(labels)),
+            'users': int(len(np.unique(users))),
+            'label': f'next survey within {LABEL_HORIZON_DAYS} days has stress_level >= {HIGH_STRESS_LEVEL}',
+            'cv_folds': folds, **scores,
+        })
+        saved.append(save_model(model))
+        print(f"{saved[-1]}: ROC AUC {scores['roc_auc']:.3f}, log loss {scores['log_loss']:.3f} "
+              f"({folds}-fold CV by user), trained in {time.perf_counter() - start:.2f} s")
+    return saved
+
+def main():
+    parser = argparse.ArgumentParser(description="Train burnout models from survey, profile and Fitbit history.")
+    parser.add_argument('--models', nargs='+', choices=list(MODEL_TYPES), default=list(MODEL_TYPES))
+    parser.add_argument('--folds', type=int, default=CV_FOLDS, help="Cross-validation folds (grouped by user).")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Parallel cross-validation fits.")
+    parser.add_argument('--max-train-rows', type=int, default=None,
+                        help="Train on a random subset of users covering about this many user-days.")
+    parser.add_argument('--chunk-users', type=int, default=CHUNK_USERS, help="Users read per block.")
+    args = parser.parse_args()
+    train_models(args.models, args.folds, args.workers, args.max_train_rows, args.chunk_users)
+
+if __name__ == "__main__":
+    main()
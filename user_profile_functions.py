@@ -1,26 +1,27 @@
-import sqlite3
+from datetime import date
+import numpy as np
+from burnout_model_functions import (calculate_age, calculate_age_batch, job_stress_levels, profile_score,
+                                     profile_score_batch)
+from database_functions import unit_of_work
 
 # -------------------- User Profile --------------------
 
 def save_user_profile(dob, gender, family_size, num_pets, city, education, job, remote_percentage,name):
     """Saves the user profile to the database."""
-    conn = sqlite3.connect('user_data.db')
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM user_profile')
-    cursor.execute('''
-        INSERT INTO user_profile (dob, gender, family_size, num_pets, city, education, job, remote_percentage, name)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (dob, gender, family_size, num_pets, city, education, remote_percentage, job, name))
-    conn.commit()
-    conn.close()
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM user_profile')
+        cursor.execute('''
+            INSERT INTO user_profile (dob, gender, family_size, num_pets, city, education, job, remote_percentage, name)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (dob, gender, family_size, num_pets, city, education, remote_percentage, job, name))
 
 def load_user_profile():
     """Loads the user profile from the database."""
-    conn = sqlite3.connect('user_data.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM user_profile LIMIT 1')
-    row = cursor.fetchone()
-    conn.close()
+    with unit_of_work() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM user_profile LIMIT 1')
+        row = cursor.fetchone()
     if row:
         return {
             'dob': row[1],
@@ -33,4 +34,70 @@ def load_user_profile():
             'job':row[8],
             'name':row[9],
         }
-    return None
\ No newline at end of file
+    return None
+# -------------------- Profile Score --------------------
+# The profile part of the burnout score only changes when the profile is edited or the
+# user has a birthday, so it is computed when the profile is saved and stored with the
+# day it expires. main_page then only adds the daily survey terms; the nightly job
+# refreshes the scores of everyone whose birthday it is.
+
+def next_birthday(dob, today):
+    """Returns the first day after today on which calculate_age(dob) changes."""
+    for year in (today.year, today.year + 1):
+        try:
+            birthday = date(year, dob.month, dob.day)
+        except ValueError:
+            birthday = date(year, 3, 1)  # 29 February birthdays count from 1 March in other years
+        if birthday > today:
+            return birthday
+
+def _profile_inputs(profile):
+    """Returns the profile_score arguments for a user_profile dict."""
+    return (profile['gender'], job_stress_levels.get(profile['job'], 5), profile['education'], profile['city'],
+            profile['family_size'], profile['num_pets'], profile['remote_percentage'])
+
+def store_profile_score(user_id, profile, today=None):
+    """Computes and stores the profile part of the user's score; returns (profile_score, valid_until, age)."""
+    today = today or date.today()
+    dob = profile['dob'] if isinstance(profile['dob'], date) else date.fromisoformat(profile['dob'])
+    age = calculate_age(dob, today)
+    score = profile_score(age, *_profile_inputs(profile))
+    valid_until = next_birthday(dob, today).isoformat()
+    with unit_of_work() as conn:
+        conn.execute('''
+            INSERT OR REPLACE INTO user_profile_scores (user_id, profile_score, age, valid_until, computed_at)
+            VALUES (?, ?, ?, ?, DATETIME('now'))
+        ''', (user_id, score, age, valid_until))
+    return score, valid_until, age
+
+def refresh_profile_scores(today=None, chunk_size=10_000):
+    """Stores the profile score of every user whose score is missing or expired; returns how many."""
+    today = today or date.today()
+    refreshed, after_user_id = 0, 0
+    while True:
+        with unit_of_work(immediate=True) as conn:
+            rows = conn.execute('''
+                SELECT p.user_id, p.dob, p.gender, p.job, p.education, p.city, p.family_size, p.num_pets,
+                       p.remote_percentage
+                FROM user_profile p
+                LEFT JOIN user_profile_scores s ON s.user_id = p.user_id
+                WHERE p.user_id > ? AND (s.user_id IS NULL OR s.valid_until <= ?)
+                ORDER BY p.user_id
+                LIMIT ?
+            ''', (after_user_id, today.isoformat(), chunk_size)).fetchall()
+            if not rows:
+                return refreshed
+            after_user_id = rows[-1][0]
+            columns = dict(zip(['user_id', 'dob', 'gender', 'job', 'education', 'city', 'family_size', 'num_pets',
+                                'remote_percentage'], zip(*rows)))
+            ages = calculate_age_batch(columns['dob'], today)
+            valid = ~np.isnan(ages)  # profiles without a valid date of birth cannot be scored
+            columns = {name: [value for value, keep in zip(values, valid) if keep] for name, values in columns.items()}
+            scores = profile_score_batch({**columns, 'age': ages[valid]})
+            conn.executemany('''
+                INSERT OR REPLACE INTO user_profile_scores (user_id, profile_score, age, valid_until, computed_at)
+                VALUES (?, ?, ?, ?, DATETIME('now'))
+            ''', [(user_id, score, int(age), next_birthday(date.fromisoformat(dob), today).isoformat())
+                  for user_id, score, age, dob in zip(columns['user_id'], scores.tolist(), ages[valid].tolist(),
+                                                      columns['dob'])])
+            refreshed += len(scores)